@@ -1,82 +1,130 @@
+# En premier : limites de threads BLAS/OpenMP posées avant le chargement de numpy
+from chatbot.runtime import runtime
 from http.client import responses as http_responses
+import hmac
+import ipaddress
+import json
+import math
 import os
 import re
+import tempfile
+import time
+import unicodedata
 from urllib.parse import unquote
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from waitress import serve
-from chatbot.data_processing import load_data, preprocess_text, vectorizer, tfidf_matrix, categories
-from chatbot.embeddings_utils import ensemble_similarity, get_best_match_with_fasttext, get_best_match_with_word2vec
+from chatbot.data_processing import tfidf_matrix, categories
 from chatbot.models import nb_classifier, knn_classifier, nb_score, nb_f1, best_knn_score, best_knn_f1, best_n_neighbors
-from chatbot.chatbot_logic import get_response, save_new_question, search_in_index
-from sklearn.metrics.pairwise import cosine_similarity
-from chatbot.self_learning import get_well_rated_questions, check_for_duplicates, integrate_candidates, predict_category, integrate_questions, get_learning_status, update_models
+from chatbot.chatbot_logic import get_response, get_responses_batch, get_quick_response, iter_response, normalize_query, save_new_question, save_rating, search_in_index
+from chatbot.singleflight import SingleFlight
+from chatbot.batching import InferenceScheduler
+from chatbot.chat_store import ChatStore
+from chatbot.retrieval import partitioned_index
+from chatbot.autocomplete import autocomplete_index, autocomplete_suggestions
+from chatbot.spelling import spell_corrector
+from chatbot.config import batch_max_size, batch_max_wait_ms, admin_token, http_cache_metrics_seconds, trust_proxy, \
+    chat_max_length
+from chatbot.profiling import profiler, profile_call
+from chatbot.self_learning import integrate_candidates, get_learning_status, update_models
+from chatbot.candidate_queue import candidate_queue
+from chatbot.kb_import import start_import, get_import, detect_format
+from chatbot.kb_store import DATA_PATH
+from chatbot.evaluation import start_evaluation
+from chatbot.gap_analysis import get_gap_report, start_gap_analysis
+from chatbot.file_server import file_server
+from chatbot.generation import current_generation
+from chatbot.http_cache import cached_json, file_signature, time_bucket, response_cache
+from chatbot.admission import admission, AdmissionRejected
+from chatbot.result_cache import result_cache
+from chatbot.maintenance import maintenance
 import pandas as pd
 import datetime
 
+# Bibliothèques déjà chargées (variables d'environnement définies avant le démarrage)
+runtime.apply()
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# File to store chat sessions persistently
-CHAT_FILE = "data/chat_sessions.csv"
+# Sessions de chat persistées dans SQLite (import unique de l'ancien CSV)
+chat_store = ChatStore()
+# Popularité des suggestions d'autocomplétion : réponses déjà données (messages archivés compris)
+answer_counts = chat_store.answer_counts()
+for answer, count in maintenance.archived('chat_messages').get('answers', {}).items():
+    answer_counts[answer] = answer_counts.get(answer, 0) + count
+autocomplete_index.set_answer_counts(answer_counts)
+# Compaction et archivage des journaux en arrière-plan
+maintenance.start(chat_store)
+# Manifeste de files/ : premier parcours ici, mises à jour en arrière-plan
+file_server.start()
+# File des candidates à l'auto-apprentissage : ouverte avant le premier retour
+candidate_queue.start()
+
+# Les requêtes identiques simultanées partagent un seul calcul de get_response
+chat_flight = SingleFlight()
+# Regroupe les requêtes concurrentes distinctes en appels vectorisés (si activé)
+inference_scheduler = InferenceScheduler(
+    profiler.wrap(get_responses_batch), batch_max_size, batch_max_wait_ms) if batch_max_size > 1 else None
+
+
+def compute_response(user_input):
+    # Les raccourcis et mots-clés ne prennent pas de place d'inférence et n'attendent pas de lot
+    quick = get_quick_response(user_input)
+    if quick is not None:
+        admission.record_cheap()
+        return quick
+    # Réponse déjà calculée par ce worker ou un autre : pas de place d'inférence non plus
+    key = normalize_query(user_input)
+    cached = result_cache.get(key)
+    if cached is not None:
+        admission.record_cheap()
+        return cached
+    with admission.inference_slot():
+        if inference_scheduler is not None:
+            response = inference_scheduler.submit(user_input)
+        else:
+            response = get_response(user_input)
+    result_cache.put(key, response)
+    return response
+
+
+def client_address():
+    if trust_proxy and request.headers.get('X-Forwarded-For'):
+        return request.headers['X-Forwarded-For'].split(',')[0].strip()
+    return request.remote_addr
+
+
+def rejected_response(e):
+    response = jsonify({"status": "error", "message": e.reason})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+    return response
+
 
 
 def load_chat_sessions():
     try:
-        if os.path.exists(CHAT_FILE):
-            df = pd.read_csv(CHAT_FILE, encoding='utf-8')
-            sessions = []
-            for session_id, group in df.groupby('session_id'):
-                messages = []
-                for _, row in group.iterrows():
-                    bot_response = {
-                        "answer": row['bot_answer'],
-                        "url": row['bot_url'],
-                        "similarity": row['bot_similarity'],
-                        "category": row['bot_category'],
-                        "is_shortcut": row['bot_is_shortcut'] == 'True',
-                        "method": row['bot_method'] if pd.notna(row['bot_method']) else None
-                    }
-                    messages.append({
-                        "user": row['user_message'],
-                        "bot": bot_response,
-                        "timestamp": row['timestamp']
-                    })
-                sessions.append({
-                    "id": session_id,
-                    "date": group['date'].iloc[0],
-                    "messages": messages
-                })
-            return sessions
-        return []
+        return chat_store.load_all()
     except Exception as e:
         print(f"Error loading chat sessions: {e}")
         return []
 
 
-def save_chat_sessions(sessions):
+def is_admin_request():
+    """
+    Routes d'administration : en-tête X-Admin-Token égal à CHATBOT_ADMIN_TOKEN ; sans
+    jeton configuré, seulement les requêtes directes depuis la machine elle-même
+    (boucle locale, sans X-Forwarded-For : une requête relayée par un proxy est refusée).
+    """
+    if admin_token:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+    if request.headers.get('X-Forwarded-For'):
+        return False
     try:
-        os.makedirs(os.path.dirname(CHAT_FILE), exist_ok=True)
-        rows = []
-        for session in sessions:
-            for msg in session['messages']:
-                row = {
-                    "session_id": session['id'],
-                    "date": session['date'],
-                    "user_message": msg['user'],
-                    "bot_answer": msg['bot']['answer'] if msg['bot'] else None,
-                    "bot_url": msg['bot']['url'] if msg['bot'] else None,
-                    "bot_similarity": msg['bot']['similarity'] if msg['bot'] else None,
-                    "bot_category": msg['bot']['category'] if msg['bot'] else None,
-                    "bot_is_shortcut": str(msg['bot']['is_shortcut']) if msg['bot'] else None,
-                    "bot_method": msg['bot'].get('method', 'shortcut') if msg['bot'] else None,
-                    "timestamp": msg['timestamp']
-                }
-                rows.append(row)
-        df = pd.DataFrame(rows)
-        df.to_csv(CHAT_FILE, index=False, encoding='utf-8')
-    except Exception as e:
-        print(f"Error saving chat sessions: {e}")
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
 
 
 @app.route('/')
@@ -84,74 +132,208 @@ def index():
     return jsonify({"status": "success", "message": "Welcome to Chatbot ISET API"})
 
 
+def parse_chat_request():
+    """Valide le corps d'une requête de chat ; renvoie (entrée, session_id, source, erreur)."""
+    data = request.json
+    user_input = data.get('message')
+    session_id = data.get('session_id')
+    input_source = data.get('source', 'text')  # 'voice' or 'text'
+
+    if not user_input or not isinstance(user_input, str):
+        return None, None, None, (jsonify({"status": "error", "message": "Message is required"}), 400)
+
+    # Clean transcribed input (remove excessive whitespace). Toute question de la base
+    # (apostrophes typographiques, parenthèses, deux-points...) doit pouvoir être renvoyée
+    # telle quelle depuis une suggestion ou une alternative : seuls les caractères de
+    # contrôle et les messages trop longs sont refusés
+    user_input = re.sub(r'\s+', ' ', user_input.strip())
+    if len(user_input) > chat_max_length:
+        return None, None, None, (jsonify({"status": "error", "message": "Message too long"}), 400)
+    if any(unicodedata.category(c) in ('Cc', 'Cs') for c in user_input):
+        return None, None, None, (jsonify({"status": "error", "message": "Invalid characters in input"}), 400)
+    return user_input, session_id, input_source, None
+
+
+def record_chat(user_input, session_id, response):
+    """Ajoute l'échange à la session (créée si besoin) ; renvoie (session_id, chat_entry)."""
+    timestamp = datetime.datetime.now().isoformat()
+    chat_entry = {
+        "user": user_input,
+        "bot": response,
+        "timestamp": timestamp
+    }
+
+    if session_id:
+        try:
+            session_id = int(session_id)
+        except ValueError:
+            session_id = None
+    session_id = chat_store.append_message(session_id, chat_entry)
+    autocomplete_index.record_answer(response['answer'])
+
+    if response['similarity'] < 0.8 and not response.get('is_shortcut', False):
+        save_new_question(user_input, response['answer'])
+    return session_id, chat_entry
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat_api():
     try:
-        data = request.json
-        user_input = data.get('message')
-        session_id = data.get('session_id')
-        input_source = data.get('source', 'text')  # 'voice' or 'text'
-
-        if not user_input:
-            return jsonify({"status": "error", "message": "Message is required"}), 400
-
-        # Clean transcribed input (remove excessive whitespace, invalid characters)
-        user_input = re.sub(r'\s+', ' ', user_input.strip())
-        if not re.match(r'^[\w\s.,!?\'"/-]+$', user_input):
-            return jsonify({"status": "error", "message": "Invalid characters in input"}), 400
+        user_input, session_id, input_source, error = parse_chat_request()
+        if error:
+            return error
+        admission.check_rate(session_id, client_address())
 
         print(f"Processing {input_source} input: {user_input}")
-        response = get_response(user_input)
-        timestamp = datetime.datetime.now().isoformat()
-        chat_entry = {
-            "user": user_input,
-            "bot": response,
-            "timestamp": timestamp
-        }
-
-        sessions = load_chat_sessions()
-        current_session = None
-        if session_id:
-            try:
-                session_id = int(session_id)
-                current_session = next(
-                    (s for s in sessions if s['id'] == session_id), None)
-            except ValueError:
-                session_id = None
-
-        if not current_session:
-            session_id = max([s['id'] for s in sessions], default=0) + 1
-            current_session = {
-                "id": session_id,
-                "date": timestamp,
-                "messages": []
-            }
-            sessions.insert(0, current_session)
-        current_session['messages'].append(chat_entry)
-
-        save_chat_sessions(sessions)
-        if response['similarity'] < 0.8 and not response.get('is_shortcut', False):
-            save_new_question(user_input, response['answer'])
+        profile_report = None
+        if profiler.enabled and request.headers.get('X-Debug-Profile') == '1' and is_admin_request():
+            # Profil de cette requête seule, sans regroupement avec les requêtes identiques
+            response, profile_report = profile_call(compute_response, user_input)
+        else:
+            with profiler.track():
+                # Copie par appelant : le résultat partagé ne doit pas être modifié
+                response = dict(chat_flight.do(normalize_query(user_input), compute_response, user_input))
+        session_id, chat_entry = record_chat(user_input, session_id, response)
 
-        return jsonify({
+        result = {
             "status": "success",
             "response": response,
             "session_id": session_id,
             "chat_entry": chat_entry
-        })
+        }
+        if profile_report is not None:
+            result["profile"] = profile_report
+        return jsonify(result)
+    except AdmissionRejected as e:
+        return rejected_response(e)
     except Exception as e:
         print(f"Error in chat API: {e}")
         return jsonify({"status": "error", "message": "Internal server error"}), 500
 
 
+def iter_cached(response):
+    yield "final", response
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_api():
+    """
+    Variante de /api/chat en JSON lines : un événement "partial" par étape de la
+    cascade, puis un événement "final" (avec session_id et chat_entry).
+    Si le client se déconnecte, le serveur ferme le générateur et les étapes
+    restantes ne sont pas exécutées.
+    """
+    try:
+        user_input, session_id, input_source, error = parse_chat_request()
+        if error:
+            return error
+        admission.check_rate(session_id, client_address())
+        quick = get_quick_response(user_input) is not None
+        cached = None if quick else result_cache.get(normalize_query(user_input))
+        cheap = quick or cached is not None
+        if cheap:
+            admission.record_cheap()
+        else:
+            # Place rendue à la fermeture de la réponse (fin du flux ou client déconnecté)
+            admission.acquire()
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    except Exception as e:
+        print(f"Error in chat stream API: {e}")
+        return jsonify({"status": "error", "message": "Internal server error"}), 500
+    started = time.monotonic()
+
+    print(f"Streaming {input_source} input: {user_input}")
+
+    def generate():
+        # Réponse en cache : directement l'événement final
+        stages = iter_cached(cached) if cached is not None else iter_response(user_input)
+        try:
+            while True:
+                # Seul le calcul des étapes est suivi, pas l'envoi au client
+                with profiler.track():
+                    stage = next(stages, None)
+                if stage is None:
+                    break
+                event, response = stage
+                if event == "final":
+                    if not cheap:
+                        result_cache.put(normalize_query(user_input), response)
+                    new_session_id, chat_entry = record_chat(user_input, session_id, response)
+                    yield json.dumps({"event": "final", "status": "success", "response": response,
+                                      "session_id": new_session_id, "chat_entry": chat_entry}, default=str) + "\n"
+                else:
+                    yield json.dumps({"event": event, "response": response}, default=str) + "\n"
+        except Exception as e:
+            print(f"Error in chat stream API: {e}")
+            yield json.dumps({"event": "error", "status": "error", "message": "Internal server error"}) + "\n"
+        finally:
+            stages.close()
+
+    response = Response(generate(), mimetype='application/x-ndjson', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    if not cheap:
+        response.call_on_close(lambda: admission.release(time.monotonic() - started))
+    return response
+
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    """
+    Suggestions de questions de la base pour le texte en cours de saisie (q),
+    classées par popularité ; aucune inférence, appelable à chaque frappe.
+    """
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+        return jsonify({"status": "success", "suggestions": autocomplete_suggestions(query, limit)})
+    except Exception as e:
+        print(f"Error in autocomplete: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors de l'autocomplétion."}), 500
+
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """
+    Capture un profil des requêtes de chat pendant seconds secondes (défaut 10, max 60).
+    format=collapsed : piles repliées (texte, pour flamegraph) ; format=pstats :
+    fichier .prof (pstats.Stats). Nécessite CHATBOT_PROFILING=1.
+    """
+    if not profiler.enabled:
+        return jsonify({"status": "error", "message": "Profilage désactivé (CHATBOT_PROFILING=1)."}), 404
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Accès refusé."}), 403
+    try:
+        seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), 60)
+        fmt = request.args.get('format', 'collapsed')
+        if fmt not in ('collapsed', 'pstats'):
+            return jsonify({"status": "error", "message": "Format inconnu (collapsed ou pstats)."}), 400
+        try:
+            profile = profiler.capture(seconds, fmt)
+        except RuntimeError as e:
+            return jsonify({"status": "error", "message": str(e)}), 409
+        if fmt == 'pstats':
+            return Response(profile, mimetype='application/octet-stream', headers={
+                "Content-Disposition": "attachment; filename=chatbot.prof"})
+        return Response(profile, mimetype='text/plain')
+    except Exception as e:
+        print(f"Error capturing profile: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors du profilage."}), 500
+
+
 @app.route('/metrics')
+@cached_json(lambda: (time_bucket(http_cache_metrics_seconds), current_generation(), file_signature('data/ratings.csv'),
+                     maintenance.signature()))
 def metrics():
     try:
-        ratings_summary = {"utile": 0, "non_utile": 0}
+        archived = maintenance.archived('ratings')
+        ratings_summary = {"utile": archived.get('positive', 0), "non_utile": archived.get('negative', 0)}
         if os.path.exists('data/ratings.csv'):
-            ratings = pd.read_csv('data/ratings.csv', encoding='utf-8')
-            ratings_summary["utile"] = len(ratings[ratings['rating'] == True])
-            ratings_summary["non_utile"] = len(
+            ratings = pd.read_csv('data/ratings.csv', encoding='utf-8', usecols=['rating'])
+            ratings_summary["utile"] += len(ratings[ratings['rating'] == True])
+            ratings_summary["non_utile"] += len(
                 ratings[ratings['rating'] == False])
 
         return jsonify({
@@ -160,7 +342,22 @@ def metrics():
             "best_knn_score": best_knn_score,
             "best_knn_f1": best_knn_f1,
             "best_n_neighbors": best_n_neighbors,
-            "ratings_summary": ratings_summary
+            "ratings_summary": ratings_summary,
+            "runtime": {
+                "coalescing": chat_flight.stats(),
+                "batching": inference_scheduler.stats() if inference_scheduler else None,
+                "partitions": partitioned_index.stats(),
+                "autocomplete": autocomplete_index.stats(),
+                "spelling": spell_corrector.stats(),
+                "profiling": profiler.stats(),
+                "candidates": candidate_queue.stats(),
+                "downloads": file_server.stats(),
+                "http_cache": response_cache.stats(),
+                "admission": admission.stats(),
+                "result_cache": result_cache.stats(),
+                "threads": runtime.stats(),
+                "maintenance": maintenance.stats()
+            }
         })
     except Exception as e:
         print(f"Error generating metrics: {e}")
@@ -168,6 +365,7 @@ def metrics():
 
 
 @app.route('/about')
+@cached_json(lambda: 1, max_age=3600)
 def about():
     return jsonify({
         "title": "Chatbot ISET SFAX",
@@ -176,7 +374,7 @@ def about():
             "Traitement du langage naturel avec NLTK",
             "Classification avec Naive Bayes et KNN",
             "Embeddings avec TF-IDF, Word2Vec, et FastText",
-            "Moteur de recherche avec Whoosh",
+            "Moteur de recherche BM25 en mémoire",
             "Support multilingue (français et anglais)",
             "Suggestions proactives selon le contexte",
             "Auto-apprentissage basé sur les nouvelles questions",
@@ -192,18 +390,7 @@ def rate_response():
     try:
         data = request.json
         save_new_question(data.get('question'), None, data.get('rating'))
-        rating_entry = {
-            "question": data.get('question'),
-            "rating": data.get('rating'),
-            "timestamp": pd.Timestamp.now().isoformat()
-        }
-        if os.path.exists('data/ratings.csv'):
-            df = pd.read_csv('data/ratings.csv', encoding='utf-8')
-            df = pd.concat([df, pd.DataFrame([rating_entry])],
-                           ignore_index=True)
-        else:
-            df = pd.DataFrame([rating_entry])
-        df.to_csv('data/ratings.csv', index=False, encoding='utf-8')
+        save_rating(data.get('question'), data.get('rating'))
         return jsonify({"status": "success"})
     except Exception as e:
         print(f"Error saving rating: {e}")
@@ -211,16 +398,18 @@ def rate_response():
 
 
 @app.route('/report', methods=['GET'])
+@cached_json(lambda: (current_generation(), file_signature('data/new_questions.csv'), maintenance.signature()))
 def generate_report():
     try:
         from chatbot.config import shortcuts
         from sklearn.model_selection import cross_val_score
-        shortcut_stats = {shortcut: 0 for shortcut in shortcuts.keys()}
+        archived = maintenance.archived('new_questions').get('shortcuts', {})
+        shortcut_stats = {shortcut: archived.get(shortcut, 0) for shortcut in shortcuts.keys()}
         if os.path.exists('data/new_questions.csv'):
             questions = pd.read_csv(
-                'data/new_questions.csv', encoding='utf-8')['question'].tolist()
+                'data/new_questions.csv', encoding='utf-8', usecols=['question'])['question'].tolist()
             for shortcut in shortcuts.keys():
-                shortcut_stats[shortcut] = questions.count(shortcut)
+                shortcut_stats[shortcut] += questions.count(shortcut)
         return jsonify({
             "modeles": {
                 "naive_bayes": {"accuracy": nb_score, "f1_score": nb_f1, "cv_scores": cross_val_score(nb_classifier, tfidf_matrix, categories, cv=5).tolist()},
@@ -235,78 +424,43 @@ def generate_report():
 
 @app.route('/embeddings-metrics')
 def embeddings_metrics():
+    """
+    Rapport d'évaluation des méthodes pour la génération courante des modèles.
+    S'il n'est pas encore calculé, l'évaluation est lancée en arrière-plan et la
+    route répond 202 avec sa progression (à interroger de nouveau).
+    """
     try:
-        test_questions = []
-        if os.path.exists('data/test_questions.csv'):
-            test_questions = pd.read_csv(
-                'data/test_questions.csv', encoding='utf-8')['question'].tolist()
-
-        if not test_questions:
-            test_questions = [
-                "Quelles sont les horaires d'ouverture de la bibliothèque?",
-                "Comment s'inscrire pour la nouvelle année?",
-                "Où puis-je trouver les résultats des examens?",
-                "Quand commence la période d'inscription?",
-                "Comment contacter l'administration?",
-                "Quels sont les programmes disponibles à l'ISET?"
-            ]
-
-        questions, responses, _, _ = load_data()
-        results = []
-        for question in test_questions:
-            processed_input = preprocess_text(question)
-            input_tfidf = vectorizer.transform([processed_input])
-
-            tfidf_similarities = cosine_similarity(input_tfidf, tfidf_matrix)
-            tfidf_best_idx = tfidf_similarities.argmax()
-            tfidf_similarity = float(tfidf_similarities[0, tfidf_best_idx])
-
-            w2v_idx, w2v_sim = get_best_match_with_word2vec(question)
-            ft_idx, ft_sim = get_best_match_with_fasttext(question)
-            ens_idx, ens_sim = ensemble_similarity(question)
-
-            result = {
-                'question': question,
-                'tfidf': {'response': responses[tfidf_best_idx], 'similarity': float(tfidf_similarity)},
-                # Convertir
-                'word2vec': {'response': responses[w2v_idx], 'similarity': float(w2v_sim)},
-                # Convertir
-                'fasttext': {'response': responses[ft_idx], 'similarity': float(ft_sim)},
-                'ensemble': {'response': responses[ens_idx], 'similarity': float(ens_sim)},
-            }
-            results.append(result)
-
-        methods = ['tfidf', 'word2vec', 'fasttext', 'ensemble']
-        # similarities = [[r[m]['similarity'] for r in results] for m in methods]
-        similarities = [[float(r[m]['similarity']) for r in results]
-                        for m in methods]  # Convertir toutes les similarités
-        method_counts = {}
-        for r in results:
-            best_method = max(methods, key=lambda m: r[m]['similarity'])
-            method_counts[best_method] = method_counts.get(best_method, 0) + 1
-
-        return jsonify({
-            "results": results,
-            "similarities": similarities,
-            "method_counts": method_counts
-        })
+        path, job = start_evaluation()
+        if path is not None:
+            with open(path, encoding='utf-8') as f:
+                return Response(f.read(), mimetype='application/json')
+        if job.status == 'error':
+            return jsonify({"status": "error", "message": "Erreur lors de la génération des métriques d'embeddings.",
+                            "job": job.to_dict()}), 500
+        return jsonify({"status": "running", "job": job.to_dict()}), 202
     except Exception as e:
         print(f"Error generating embeddings metrics: {e}")
         return jsonify({"status": "error", "message": "Erreur lors de la génération des métriques d'embeddings."}), 500
 
 
+@app.route('/embeddings-metrics', methods=['POST'])
+def refresh_embeddings_metrics():
+    """Relance l'évaluation même si le rapport de la génération courante existe."""
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Accès refusé."}), 403
+    try:
+        _, job = start_evaluation(force=True)
+        return jsonify({"status": "running", "job": job.to_dict()}), 202
+    except Exception as e:
+        print(f"Error starting embeddings evaluation: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors du lancement de l'évaluation."}), 500
+
+
 @app.route('/new_chat', methods=['POST'])
 def new_chat():
     try:
-        sessions = load_chat_sessions()
-        new_session = {
-            "id": max([s['id'] for s in sessions], default=0) + 1,
-            "date": datetime.datetime.now().isoformat(),
-            "messages": []
-        }
-        sessions.insert(0, new_session)
-        save_chat_sessions(sessions)
-        return jsonify({"status": "success", "session_id": new_session['id']})
+        session_id = chat_store.create_session(datetime.datetime.now().isoformat())
+        return jsonify({"status": "success", "session_id": session_id})
     except Exception as e:
         print(f"Error creating new chat: {e}")
         return jsonify({"status": "error", "message": "Erreur lors de la création d'une nouvelle session."}), 500
@@ -319,10 +473,7 @@ def delete_chat():
         session_id = data.get('session_id')
         if not session_id:
             return jsonify({"status": "error", "message": "session_id manquant."}), 400
-        sessions = load_chat_sessions()
-        sessions = [
-            session for session in sessions if session['id'] != int(session_id)]
-        save_chat_sessions(sessions)
+        chat_store.delete_session(int(session_id))
         return jsonify({"status": "success"})
     except Exception as e:
         print(f"Error deleting chat: {e}")
@@ -330,6 +481,7 @@ def delete_chat():
 
 
 @app.route('/get_sessions', methods=['GET'])
+@cached_json(lambda: chat_store.version(), private=True)
 def get_sessions():
     try:
         sessions = load_chat_sessions()
@@ -339,7 +491,53 @@ def get_sessions():
         return jsonify({"status": "error", "message": "Erreur lors de la récupération des sessions."}), 500
 
 
+@app.route('/sessions', methods=['GET'])
+def list_sessions():
+    """
+    Liste paginée des sessions (résumés : id, date, premier message, nombre de messages).
+    Paramètres : limit (défaut 20, max 100) et cursor (renvoyé par la page précédente).
+    """
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        cursor = request.args.get('cursor', type=int)
+        sessions, next_cursor = chat_store.list_sessions(limit=limit, cursor=cursor)
+        return jsonify({"sessions": sessions, "next_cursor": next_cursor})
+    except Exception as e:
+        print(f"Error listing sessions: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors de la récupération des sessions."}), 500
+
+
+@app.route('/sessions/<int:session_id>/messages', methods=['GET'])
+def session_messages(session_id):
+    """
+    Messages d'une session, lus et envoyés au fil de l'eau depuis le stockage.
+    Paramètres : after (id du dernier message déjà reçu) et limit (optionnel).
+    La réponse contient next_after pour demander la suite.
+    """
+    try:
+        session = chat_store.get_session(session_id)
+        if session is None:
+            return jsonify({"status": "error", "message": "Session introuvable."}), 404
+        after = request.args.get('after', type=int)
+        limit = request.args.get('limit', type=int)
+    except Exception as e:
+        print(f"Error getting session messages: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors de la récupération des messages."}), 500
+
+    def generate():
+        last_id = after
+        yield '{"session": %s, "messages": [' % json.dumps(session)
+        for i, message in enumerate(chat_store.iter_messages(session_id, after=after, limit=limit)):
+            last_id = message["id"]
+            yield (',' if i else '') + json.dumps(message, default=str)
+        yield '], "next_after": %s}' % json.dumps(last_id)
+
+    return Response(generate(), mimetype='application/json')
+
+
 @app.route('/api/self-learning/status', methods=['GET'])
+@cached_json(lambda: [file_signature(path) for path in (DATA_PATH, 'data/ratings.csv', 'data/new_questions.csv')]
+             + [maintenance.signature()])
 def self_learning_status():
     """
     Route pour obtenir le statut actuel du système d'auto-apprentissage
@@ -355,48 +553,28 @@ def self_learning_status():
 @app.route('/api/self-learning/candidates', methods=['GET'])
 def get_candidates():
     """
-    Route pour obtenir les questions candidates pour l'intégration
+    Route pour obtenir les questions candidates pour l'intégration (paginée)
+
+    Paramètres : limit (10 par défaut, 100 au plus) et cursor (next_cursor de la page précédente)
     """
     try:
-        # Récupérer les questions bien notées (limitées à 10)
-        candidates = get_well_rated_questions(limit=10)
-        print(f"Nombre de candidates récupérées: {len(candidates)}")
-        print(f"Candidates:\n{candidates}")
+        limit = min(max(request.args.get('limit', default=10, type=int), 1), 100)
+        cursor = request.args.get('cursor', type=int)
+        candidates, next_cursor, pending = candidate_queue.page(limit=limit, cursor=cursor)
+        print(f"Nombre de candidates récupérées: {len(candidates)} ({pending} en attente de notation)")
 
-        if candidates.empty:
-            return jsonify({"status": "info", "message": "Aucune question bien notée n'est disponible pour l'intégration.", "candidates": []})
-
-        # Charger les questions existantes pour vérifier les doublons
-        questions, _, urls, _ = load_data()
-
-        # Vérifier les doublons
-        non_duplicate_indices = check_for_duplicates(
-            candidates['question'].tolist(), questions)
-        filtered_candidates = candidates.iloc[non_duplicate_indices].reset_index(
-            drop=True)
-
-        if filtered_candidates.empty:
-            return jsonify({"status": "info", "message": "Toutes les questions bien notées sont déjà présentes dans la base de données.", "candidates": []})
-
-        # Prédire les catégories pour chaque question
-        categories = []
-        confidences = []
-        for question in filtered_candidates['question']:
-            category, confidence = predict_category(question)
-            categories.append(category)
-            confidences.append(float(confidence))
-
-        # Ajouter les catégories prédites et les URL (vides pour l'instant)
-        filtered_candidates['category'] = categories
-        filtered_candidates['confidence'] = confidences
-        filtered_candidates['url'] = '/auto-learning'  # URL par défaut
-
-        # Convertir à JSON et renvoyer
-        candidates_json = filtered_candidates.to_dict(orient='records')
+        if not candidates and cursor is None:
+            return jsonify({"status": "info", "message": "Aucune question bien notée n'est disponible pour l'intégration.",
+                            "candidates": [], "pending": pending})
+
+        for candidate in candidates:
+            candidate['url'] = '/auto-learning'  # URL par défaut
         return jsonify({
             "status": "success",
-            "candidates": candidates_json,
-            "total": len(candidates_json)
+            "candidates": candidates,
+            "total": candidate_queue.count_ready(),
+            "next_cursor": next_cursor,
+            "pending": pending
         })
 
     except Exception as e:
@@ -404,17 +582,57 @@ def get_candidates():
         return jsonify({"status": "error", "message": f"Erreur lors de la récupération des candidats: {str(e)}"}), 500
 
 
+@app.route('/api/self-learning/gaps', methods=['GET'])
+def get_gaps():
+    """
+    Plus grands groupes de questions non résolues que la base couvre mal (limit, 10
+    par défaut). Les questions arrivées depuis la dernière analyse sont regroupées
+    en arrière-plan ; "job" donne alors sa progression (rapport mis à jour ensuite).
+    """
+    try:
+        limit = min(max(request.args.get('limit', default=10, type=int), 1), 100)
+        report, job = get_gap_report(limit)
+        return jsonify({"status": "success", "report": report, "job": job.to_dict() if job else None})
+    except Exception as e:
+        print(f"Error getting knowledge-base gaps: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors de l'analyse des lacunes."}), 500
+
+
+@app.route('/api/self-learning/gaps', methods=['POST'])
+def reset_gaps():
+    """Regroupe de nouveau toutes les questions depuis le début (nouveaux centres)."""
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Accès refusé."}), 403
+    try:
+        job = start_gap_analysis(reset=True)
+        return jsonify({"status": "running", "job": job.to_dict()}), 202
+    except Exception as e:
+        print(f"Error starting gap analysis: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors du lancement de l'analyse des lacunes."}), 500
+
+
+@app.route('/admin/maintenance', methods=['POST'])
+def run_maintenance():
+    """Lance tout de suite une passe de compaction et d'archivage des journaux (arrière-plan)."""
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Accès refusé."}), 403
+    try:
+        maintenance.trigger()
+        return jsonify({"status": "running", "maintenance": maintenance.stats()}), 202
+    except Exception as e:
+        print(f"Error starting maintenance: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors du lancement de la maintenance."}), 500
+
+
 @app.route('/api/download/<filename>', methods=['GET'])
 def download_file(filename):
     try:
-        files_dir = os.path.join(os.path.dirname(__file__), 'files')
         filename = unquote(filename)
-        file_path = os.path.join(files_dir, filename)
-        print(f"Requested file: {filename}, Path: {file_path}, Exists: {os.path.exists(file_path)}")
-        print(f"Files in directory: {os.listdir(files_dir)}")
-        if not os.path.exists(file_path):
+        # Manifeste en mémoire : pas d'accès disque pour un 304
+        response = file_server.serve(filename, request)
+        if response is None:
             return jsonify({"status": "error", "message": f"Fichier {filename} non trouvé."}), 404
-        return send_from_directory(files_dir, filename, as_attachment=True)
+        return response
     except Exception as e:
         print(f"Error downloading file: {e}")
         return jsonify({"status": "error", "message": "Erreur lors du téléchargement du fichier."}), 500
@@ -456,6 +674,59 @@ def integrate_candidates_endpoint():
         return jsonify({"status": "error", "message": f"Erreur: {str(e)}"}), 500
 
 
+@app.route('/api/kb/import', methods=['POST'])
+def kb_import():
+    """
+    Import en masse dans la base de connaissances (fichier CSV ou JSONL envoyé dans le champ 'file')
+
+    Champs facultatifs : dry_run ('1'), chunk_size, near_duplicate_threshold (0 : doublons exacts seulement).
+    L'import tourne en arrière-plan ; sa progression est lue sur /api/kb/import/<id>.
+    """
+    try:
+        if not is_admin_request():
+            return jsonify({"status": "error", "message": "Accès refusé."}), 403
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({"status": "error", "message": "Aucun fichier fourni (champ 'file')."}), 400
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        if fmt not in ('csv', 'jsonl'):
+            return jsonify({"status": "error", "message": f"Format inconnu: {fmt}"}), 400
+        fd, path = tempfile.mkstemp(suffix='.' + fmt, prefix='kb_upload_')
+        os.close(fd)
+        upload.save(path)
+        try:
+            job = start_import(path, fmt=fmt, dry_run=request.form.get('dry_run') == '1',
+                               chunk_size=max(request.form.get('chunk_size', default=5000, type=int), 100),
+                               near_duplicate_threshold=request.form.get('near_duplicate_threshold', default=0.9, type=float),
+                               remove_source=True)
+        except RuntimeError as e:
+            os.remove(path)
+            return jsonify({"status": "error", "message": str(e)}), 409
+        return jsonify({"status": "success", "job": job.to_dict()}), 202
+    except Exception as e:
+        print(f"Error starting KB import: {e}")
+        return jsonify({"status": "error", "message": f"Erreur lors de l'import: {str(e)}"}), 500
+
+
+@app.route('/api/kb/import/<job_id>', methods=['GET'])
+def kb_import_status(job_id):
+    try:
+        if not is_admin_request():
+            return jsonify({"status": "error", "message": "Accès refusé."}), 403
+        job = get_import(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": "Import inconnu."}), 404
+        return jsonify({"status": "success", "job": job.to_dict()})
+    except Exception as e:
+        print(f"Error getting KB import status: {e}")
+        return jsonify({"status": "error", "message": "Erreur lors de la lecture de l'import."}), 500
+
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    if not admin_token:
+        print("CHATBOT_ADMIN_TOKEN non défini : routes d'administration limitées aux requêtes locales directes")
+    if os.getenv('CHATBOT_SERVER', 'flask') == 'waitress':
+        serve(app, host='0.0.0.0', port=port, threads=runtime.server_threads)
+    else:
+        app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,104 @@
+"""
+Contrôle d'admission de /api/chat (chatbot.admission) face à un client qui inonde.
+
+En processus (client de test Flask, sessions dans une base temporaire, rien
+n'est ajouté à new_questions.csv), pendant --duration secondes :
+- un client défaillant (une session, une adresse) envoie --flood-rate requêtes
+  par seconde sur --flood-threads threads, sans tenir compte des réponses,
+  comme une boucle de saisie vocale bloquée (le client de test tourne dans le
+  même processus : un débit fixe évite qu'il ne mesure surtout son propre coût) ;
+- --users utilisateurs normaux (chacun sa session et son adresse) envoient une
+  question toutes les --interval secondes, dont un quart de raccourcis.
+Le scénario est joué sans puis avec contrôle d'admission ; le rapport donne les
+latences des utilisateurs normaux, les codes reçus par chacun et les compteurs
+du contrôleur.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_admission [--duration 10] [--users 4] [--flood-rate 50]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    from chatbot.admission import AdmissionController
+    from chatbot.chat_store import ChatStore
+    from chatbot.data_processing import questions
+
+
+def run(duration, users, flood_threads, flood_rate, interval, controller):
+    app.admission = controller
+    stop = time.monotonic() + duration
+    codes = {"flood": collections.Counter(), "users": collections.Counter()}
+    latencies = []
+    lock = threading.Lock()
+
+    def flood():
+        client = app.app.test_client()
+        rng = random.Random()
+        next_send = time.monotonic()
+        while time.monotonic() < stop:
+            next_send += flood_threads / flood_rate
+            time.sleep(max(0.0, next_send - time.monotonic()))
+            response = client.post('/api/chat', json={"message": rng.choice(questions).rstrip('?'), "session_id": 1},
+                                   environ_base={'REMOTE_ADDR': '10.0.0.1'})
+            with lock:
+                codes["flood"][response.status_code] += 1
+
+    def user(index):
+        client = app.app.test_client()
+        rng = random.Random(index)
+        while time.monotonic() < stop:
+            message = '/horaires' if rng.random() < 0.25 else rng.choice(questions)
+            start = time.perf_counter()
+            response = client.post('/api/chat', json={"message": message, "session_id": 100 + index},
+                                   environ_base={'REMOTE_ADDR': f'10.0.1.{index}'})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                codes["users"][response.status_code] += 1
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=flood) for _ in range(flood_threads)]
+    threads += [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return codes, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--flood-threads', type=int, default=8)
+    parser.add_argument('--flood-rate', type=float, default=50, help="requêtes par seconde du client défaillant")
+    parser.add_argument('--interval', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.chat_store = ChatStore(os.path.join(tmp, 'chat.db'), legacy_csv='')
+        app.save_new_question = lambda *a, **k: None
+        for label, controller in [("sans contrôle", AdmissionController(enabled=False)),
+                                  ("avec contrôle", AdmissionController(max_concurrent=os.cpu_count() or 1))]:
+            codes, latencies = run(args.duration, args.users, args.flood_threads, args.flood_rate, args.interval, controller)
+            print(f"{label} : utilisateurs p50 {np.percentile(latencies, 50):.0f} ms, "
+                  f"p99 {np.percentile(latencies, 99):.0f} ms, codes {dict(codes['users'])} ; "
+                  f"client défaillant {dict(codes['flood'])}")
+            if controller.enabled:
+                stats = controller.stats()
+                print("  " + ", ".join(f"{k}={stats[k]}" for k in ("admitted", "cheap", "rejected_session",
+                                                                   "rejected_ip", "shed_queue_full", "shed_latency")))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Contrôle d'admission (chatbot.admission) et micro-batching (chatbot.batching) ensemble.
+
+Des clients en boucle fermée appellent app.compute_response avec des questions
+distinctes (cache de résultats désactivé, comme bench_batching), pendant
+--duration secondes, pour chaque configuration :
+- sans lot, une place par cascade (référence) ;
+- lots de --max-batch, une place par cascade (ancien réglage : une place est
+  gardée pendant submit, les lots ne dépassent pas le nombre de places) ;
+- lots de --max-batch, places du runtime (RuntimeConfig.inference_slots : de
+  quoi remplir un lot par cascade) ;
+- lots de --max-batch, sans contrôle d'admission.
+Le rapport donne le débit, les latences p50/p99 des requêtes admises, la
+taille moyenne des lots et les refus (503).
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_admission_batching [--clients 32] [--duration 10] [--max-batch 16]
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    from benchmarks.bench_batching import make_queries
+    from chatbot.admission import AdmissionController, AdmissionRejected
+    from chatbot.batching import InferenceScheduler
+    from chatbot.chatbot_logic import get_responses_batch
+    from chatbot.result_cache import ResultCache
+    from chatbot.runtime import RuntimeConfig, runtime
+
+
+def run(queries, clients, duration):
+    latencies, rejected = [], []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        local, shed = [], 0
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                app.compute_response(queries[i % len(queries)])
+                local.append(time.perf_counter() - start)
+            except AdmissionRejected as e:
+                shed += 1
+                time.sleep(min(e.retry_after, 0.05))
+            i += clients
+        with lock:
+            latencies.extend(local)
+            rejected.append(shed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / duration, np.percentile(latencies, 50), np.percentile(latencies, 99), sum(rejected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    queries = make_queries(2000)
+    app.result_cache = ResultCache(enabled=False)
+    slots = RuntimeConfig(runtime.cores, runtime.server_workers, request_threads=runtime.request_threads,
+                          batch_size=args.max_batch).inference_slots
+    configurations = [
+        ("sans lot, une place par cascade", 1, AdmissionController(max_concurrent=runtime.request_threads)),
+        (f"lots de {args.max_batch}, une place par cascade", args.max_batch,
+         AdmissionController(max_concurrent=runtime.request_threads)),
+        (f"lots de {args.max_batch}, {slots} places (inference_slots)", args.max_batch,
+         AdmissionController(max_concurrent=slots)),
+        (f"lots de {args.max_batch}, sans contrôle", args.max_batch, AdmissionController(enabled=False)),
+    ]
+    print(f"{args.clients} clients, {runtime.request_threads} cascade(s) simultanée(s) par processus")
+    print(f"{'configuration':<44} {'req/s':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} {'lot moyen':>9} {'503':>6}")
+    for label, max_batch, controller in configurations:
+        app.admission = controller
+        app.inference_scheduler = InferenceScheduler(
+            get_responses_batch, max_batch, args.max_wait_ms) if max_batch > 1 else None
+        throughput, p50, p99, rejected = run(queries, args.clients, args.duration)
+        avg_batch = app.inference_scheduler.stats()['avg_batch_size'] if app.inference_scheduler else 1.0
+        print(f"{label:<44} {throughput:>7.1f} {p50:>9.1f} {p99:>9.1f} {avg_batch:>9.1f} {rejected:>6}")
+
+
+if __name__ == '__main__':
+    main()
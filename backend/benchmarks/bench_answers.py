@@ -0,0 +1,136 @@
+"""
+Benchmark de la recherche regroupée par réponse (chatbot.retrieval).
+
+1. Mémoire des réponses : liste Python d'une réponse par question contre
+   réponses dédupliquées du magasin (codes int32 + table de chaînes).
+2. Étape TF-IDF sur des questions de la base dégradées (un mot sur trois
+   supprimé) : parcours exact de toutes les lignes contre première passe sur les
+   centroïdes des réponses ; une requête est correcte si la réponse trouvée est
+   celle de la question d'origine.
+3. Classement au niveau des réponses (top_answers) : rappel@k avec agrégation
+   max et moyenne des paraphrases.
+4. Réserve de la cascade (POOL_SIZE par méthode, d'où viennent les
+   alternatives) : réponses distinctes parmi les lignes de top_matches contre
+   top_answers, première ligne identique et latence par requête.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_answers [--queries 500] [--candidates 4 8 16]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import kb, questions, responses, categories, preprocess_text, vectorizer, tfidf_matrix
+    from chatbot.models import nb_classifier
+    from chatbot.retrieval import PartitionedIndex, partitioned_index
+    from chatbot.chatbot_logic import POOL_SIZE
+
+
+def make_queries(count, seed=11):
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(questions)), min(count, len(questions))):
+        words = questions[i].split()
+        queries.append((' '.join(w for j, w in enumerate(words) if j % 3 != 1), i))
+    return queries
+
+
+def response_memory():
+    as_list = responses.tolist()
+    list_bytes = sys.getsizeof(as_list) + sum(sys.getsizeof(r) for r in as_list)
+    base = os.path.join(kb.store_dir, 'answer')
+    store_bytes = sum(os.path.getsize(base + suffix) for suffix in ('.bin', '.idx.npy', '.codes.npy', '.digest.npy'))
+    return list_bytes, store_bytes
+
+
+def build_index(centroid_first_pass, candidates):
+    index = PartitionedIndex(partitioned_index.min_confidence, partitioned_index.max_categories,
+                             centroid_first_pass, candidates)
+    index.add(categories, np.arange(len(categories)), np.asarray(kb.answer_ids[:len(categories)]),
+              {"tfidf": tfidf_matrix})
+    return index
+
+
+def match_run(index, query_tfidf, routes, targets):
+    answer_ids = np.asarray(kb.answer_ids)
+    latencies, correct = [], 0
+    for i in range(query_tfidf.shape[0]):
+        start = time.perf_counter()
+        idx, _ = index.best_match('tfidf', query_tfidf[i], routes[i])
+        latencies.append(time.perf_counter() - start)
+        correct += answer_ids[idx] == answer_ids[targets[i]]
+    return correct / len(targets), np.mean(latencies) * 1000, index.stats()['avg_rows_scanned']
+
+
+def recall_run(index, query_tfidf, routes, targets, k, how):
+    answer_ids = np.asarray(kb.answer_ids)
+    rows, _ = index.top_answers('tfidf', query_tfidf, routes, k=k, how=how)
+    found = np.where(rows >= 0, answer_ids[np.maximum(rows, 0)], -1)
+    return np.mean((found == answer_ids[targets][:, None]).any(axis=1))
+
+
+def pool_run(index, query_tfidf, routes, search):
+    """Réserve d'une méthode de la cascade : réponses distinctes, première ligne et latence moyenne."""
+    answer_ids = np.asarray(kb.answer_ids)
+    distinct, first, latencies = [], [], []
+    for i in range(query_tfidf.shape[0]):
+        start = time.perf_counter()
+        rows, _ = search('tfidf', query_tfidf[i], [routes[i]], POOL_SIZE)
+        latencies.append(time.perf_counter() - start)
+        rows = rows[0][rows[0] >= 0]
+        distinct.append(len(set(answer_ids[rows].tolist())))
+        first.append(rows[0])
+    return np.mean(distinct), np.array(first), np.mean(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[4, 8, 16])
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    targets = [target for _, target in queries]
+    query_tfidf = vectorizer.transform([preprocess_text(q) for q, _ in queries])
+    probas = nb_classifier.predict_proba(query_tfidf)
+
+    list_bytes, store_bytes = response_memory()
+    print(f"{len(questions)} questions, {len(kb.answers)} réponses distinctes")
+    print(f"Mémoire des réponses : liste {list_bytes / 1024:.0f} Kio, magasin dédupliqué {store_bytes / 1024:.0f} Kio")
+
+    for label, routed in [('global', False), ('routé', True)]:
+        exact = build_index(False, 0)
+        routes = [exact.route(p, nb_classifier.classes_) if routed else None for p in probas]
+        print(f"\nÉtape TF-IDF ({label})")
+        print(f"{'mode':<14} {'exactitude':>10} {'moy (ms)':>9} {'lignes notées':>14}")
+        accuracy, mean, scanned = match_run(exact, query_tfidf, routes, targets)
+        print(f"{'exact':<14} {accuracy:>10.1%} {mean:>9.3f} {scanned:>14.0f}")
+        for candidates in args.candidates:
+            accuracy, mean, scanned = match_run(build_index(True, candidates), query_tfidf, routes, targets)
+            print(f"{'centroïdes ' + str(candidates):<14} {accuracy:>10.1%} {mean:>9.3f} {scanned:>14.0f}")
+
+    print("\nRappel au niveau des réponses (top_answers, global)")
+    print(f"{'agrégation':<10} {'@1':>7} {'@3':>7} {'@5':>7}")
+    exact = build_index(False, 0)
+    for how in ('max', 'mean'):
+        recalls = [recall_run(exact, query_tfidf, [None] * len(targets), targets, k, how) for k in (1, 3, 5)]
+        print(f"{how:<10} " + ' '.join(f"{r:>7.1%}" for r in recalls))
+
+    print(f"\nRéserve de la cascade ({POOL_SIZE} par méthode, TF-IDF routé)")
+    routes = [exact.route(p, nb_classifier.classes_) for p in probas]
+    rows_distinct, rows_first, rows_ms = pool_run(exact, query_tfidf, routes, exact.top_matches)
+    answers_distinct, answers_first, answers_ms = pool_run(exact, query_tfidf, routes, exact.top_answers)
+    print(f"{'recherche':<12} {'réponses distinctes':>19} {'moy (ms)':>9}")
+    print(f"{'top_matches':<12} {rows_distinct:>19.2f} {rows_ms:>9.3f}")
+    print(f"{'top_answers':<12} {answers_distinct:>19.2f} {answers_ms:>9.3f}")
+    print(f"première ligne identique : {np.mean(rows_first == answers_first):.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark de l'autocomplétion (chatbot.autocomplete).
+
+Simule la saisie de questions de la base caractère par caractère et mesure, pour
+chaque frappe, la latence de autocomplete_suggestions ; indique aussi après
+combien de caractères la question visée apparaît dans les suggestions, et le
+coût d'un ajout incrémental à l'index.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_autocomplete [--questions 300] [--limit 8]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions
+    from chatbot.autocomplete import PrefixIndex, autocomplete_index, autocomplete_suggestions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    targets = rng.sample(range(len(questions)), min(args.questions, len(questions)))
+    latencies, found_at = [], []
+    for row in targets:
+        question = questions[row]
+        found = None
+        for n in range(1, len(question) + 1):
+            start = time.perf_counter()
+            suggestions = autocomplete_suggestions(question[:n], args.limit)
+            latencies.append(time.perf_counter() - start)
+            if found is None and any(s['question'] == question for s in suggestions):
+                found = n
+        found_at.append(found)
+
+    latencies = np.array(latencies) * 1000
+    print(f"{autocomplete_index.stats()['keys']} clés pour {len(questions)} questions")
+    print(f"{len(latencies)} frappes : moy {latencies.mean():.3f} ms, p50 {np.percentile(latencies, 50):.3f} ms, "
+          f"p99 {np.percentile(latencies, 99):.3f} ms, max {latencies.max():.3f} ms")
+    hits = [n for n in found_at if n is not None]
+    print(f"Question visée suggérée : {len(hits) / len(found_at):.1%}, "
+          f"après {np.median(hits):.0f} caractères en médiane" if hits else "Question visée jamais suggérée")
+
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.add(np.arange(len(questions)), list(questions), np.arange(len(questions)), list(questions))
+    build_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    index.add(np.arange(len(questions), len(questions) + 10), [questions[i] for i in targets[:10]],
+              np.arange(10), [''] * 10)
+    add_ms = (time.perf_counter() - start) * 1000
+    print(f"Construction complète {build_ms:.1f} ms, ajout incrémental de 10 questions {add_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark du micro-batching (chatbot.batching) sous charge concurrente synthétique.
+
+Des clients en boucle fermée envoient des questions distinctes (paraphrases
+tronquées de la base) ; on mesure le débit et les latences p50/p99 pour chaque
+combinaison max_batch × max_wait_ms. max_batch=1 correspond à l'appel direct de
+get_response, sans ordonnanceur.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_batching [--clients 16] [--duration 10]
+"""
+import argparse
+import contextlib
+import io
+import random
+import threading
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.chatbot_logic import get_response, get_responses_batch
+    from chatbot.data_processing import questions
+from chatbot.batching import InferenceScheduler
+
+
+def make_queries(count, seed=42):
+    rng = random.Random(seed)
+    picked = [questions[i] for i in rng.sample(range(len(questions)), min(count, len(questions)))]
+    # Troncature aléatoire : une partie des requêtes descend dans les étapes d'embeddings
+    truncated = []
+    for q in picked:
+        words = q.split()
+        truncated.append(' '.join(words[:rng.randint(min(2, len(words)), len(words))]))
+    return truncated
+
+
+def run_load(call, queries, clients, duration):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        local = []
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            call(queries[i % len(queries)])
+            local.append(time.perf_counter() - start)
+            i += clients
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / duration, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[1, 5, 20])
+    args = parser.parse_args()
+
+    queries = make_queries(2000)
+    print(f"{'max_batch':>9} {'max_wait_ms':>11} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'lot moyen':>9}")
+    for max_batch in args.max_batch:
+        for max_wait_ms in ([0] if max_batch == 1 else args.max_wait_ms):
+            if max_batch == 1:
+                call, scheduler = get_response, None
+            else:
+                scheduler = InferenceScheduler(get_responses_batch, max_batch, max_wait_ms)
+                call = scheduler.submit
+            throughput, p50, p99 = run_load(call, queries, args.clients, args.duration)
+            avg_batch = scheduler.stats()['avg_batch_size'] if scheduler else 1.0
+            print(f"{max_batch:>9} {max_wait_ms:>11} {throughput:>8.1f} {p50:>9.1f} {p99:>9.1f} {avg_batch:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark du dernier recours de get_response : index BM25 en mémoire
+(chatbot.bm25) contre l'ancien chemin Whoosh (QueryParser sur le texte brut,
+nouveau searcher à chaque appel).
+
+Les requêtes sont des questions de la base dégradées (mots supprimés) ; une
+réponse est correcte si elle renvoie la même réponse que la question d'origine.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_bm25 [--queries 1000]
+"""
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+import numpy as np
+from whoosh.fields import Schema, TEXT, STORED
+from whoosh.index import create_in
+from whoosh.qparser import QueryParser
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions, responses, preprocess_text, bm25_index
+
+
+def make_queries(count, seed=7):
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(questions)), min(count, len(questions))):
+        words = questions[i].split()
+        if len(words) > 3:
+            words = [w for w in words if rng.random() > 0.3] or words[:1]
+        queries.append((' '.join(words), i))
+    return queries
+
+
+def whoosh_search(ix, query):
+    with ix.searcher() as searcher:
+        query_obj = QueryParser("question", ix.schema).parse(query)
+        results = searcher.search(query_obj, limit=1)
+        return results[0]['rid'] if results else None
+
+
+def bm25_search(query):
+    results = bm25_index.search(preprocess_text(query).split(), k=1)
+    return results[0][0] if results else None
+
+
+def run(name, search, queries):
+    latencies, correct, errors = [], 0, 0
+    for query, target in queries:
+        start = time.perf_counter()
+        try:
+            rid = search(query)
+        except Exception:
+            rid, errors = None, errors + 1
+        latencies.append(time.perf_counter() - start)
+        if rid is not None and responses[rid] == responses[target]:
+            correct += 1
+    latencies = np.array(latencies) * 1000
+    print(f"{name:<8} {np.mean(latencies):>10.3f} {np.percentile(latencies, 99):>10.3f} "
+          f"{correct / len(queries):>10.1%} {errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        ix = create_in(tmp, Schema(question=TEXT(stored=True), rid=STORED))
+        writer = ix.writer()
+        for rid, question in enumerate(questions):
+            writer.add_document(question=question, rid=rid)
+        writer.commit()
+
+        print(f"{len(questions)} questions indexées, {len(queries)} requêtes")
+        print(f"{'méthode':<8} {'moy (ms)':>10} {'p99 (ms)':>10} {'exactitude':>10} {'erreurs':>8}")
+        run('whoosh', lambda q: whoosh_search(ix, q), queries)
+        # preprocess_text est inclus dans la mesure BM25 (dans get_response il est déjà calculé)
+        run('bm25', bm25_search, queries)
+
+
+if __name__ == '__main__':
+    main()
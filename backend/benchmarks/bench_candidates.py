@@ -0,0 +1,119 @@
+"""
+File des candidates à l'auto-apprentissage (chatbot.candidate_queue) contre
+l'ancienne route /api/self-learning/candidates.
+
+Génère un journal synthétique (new_questions.csv et ratings.csv, questions de la
+base légèrement modifiées) dans un répertoire temporaire, puis mesure :
+- l'ancienne route : fusion des CSV, check_for_duplicates et predict_category
+  question par question, à chaque appel ;
+- la file : import initial et notation par lots (une fois), puis lecture d'une page,
+  y compris juste après une rafale de nouvelles entrées (la page ne les note pas,
+  elle les compte ; le thread de notation s'en charge) ;
+- la prédiction de catégories seule : predict_category en boucle contre
+  predict_categories par lots.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_candidates [--questions 5000] [--rated 0.3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions, load_data, preprocess_text
+    from chatbot.self_learning import get_well_rated_questions, check_for_duplicates, predict_category
+    from chatbot.candidate_queue import CandidateQueue, predict_categories
+
+
+def write_log(count, rated, rng):
+    words = [w for q in questions for w in q.split()]
+    asked = []
+    for _ in range(count):
+        base = questions[rng.randrange(len(questions))].split()
+        base.insert(rng.randrange(len(base) + 1), rng.choice(words))
+        asked.append(' '.join(base))
+    now = pd.Timestamp.now().isoformat()
+    pd.DataFrame({"question": asked, "response": [f"réponse {i}" for i in range(count)],
+                  "rating": None, "timestamp": now}).to_csv('data/new_questions.csv', index=False, encoding='utf-8')
+    rated_questions = rng.sample(asked, int(count * rated))
+    pd.DataFrame({"question": rated_questions, "rating": True, "timestamp": now}).to_csv(
+        'data/ratings.csv', index=False, encoding='utf-8')
+    return asked
+
+
+def old_route(limit=10):
+    # Corps de l'ancienne route, sans la sérialisation JSON
+    candidates = get_well_rated_questions(limit=limit)
+    existing, _, _, _ = load_data()
+    kept = candidates.iloc[check_for_duplicates(candidates['question'].tolist(), existing)]
+    return [predict_category(q) for q in kept['question']]
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=5000)
+    parser.add_argument('--rated', type=float, default=0.3, help="part des questions bien notées")
+    parser.add_argument('--sample', type=int, default=500, help="questions pour la prédiction seule")
+    parser.add_argument('--burst', type=int, default=2000, help="nouvelles entrées avant la dernière page")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs('data')
+            asked = write_log(args.questions, args.rated, rng)
+            with contextlib.redirect_stdout(io.StringIO()):
+                old_ms, _ = timed(old_route, repeat=3)
+
+                queue = CandidateQueue(os.path.join(tmp, 'candidates.db'))
+                import_ms, _ = timed(queue._conn)
+                score_ms, scored = timed(queue.refresh)
+                page_ms, (page, _, _) = timed(lambda: queue.page(limit=10), repeat=50)
+                deep_cursor = queue.page(limit=500)[1]
+                deep_ms, _ = timed(lambda: queue.page(limit=10, cursor=deep_cursor), repeat=50)
+                record_ms, _ = timed(lambda: queue.record(rng.choice(asked), rating=True), repeat=200)
+                conn = queue._conn()
+                conn.execute("BEGIN IMMEDIATE")
+                for i in range(args.burst):
+                    queue.record(f"{rng.choice(asked)} ({i})", answer=f"réponse {i}", rating=True)
+                conn.execute("COMMIT")
+                burst_ms, (_, _, pending) = timed(lambda: queue.page(limit=10))
+        finally:
+            os.chdir(cwd)
+
+    print(f"Journal : {args.questions} questions, {int(args.questions * args.rated)} bien notées, "
+          f"{queue.count_ready()} candidates prêtes")
+    print(f"Ancienne route (10 candidates)       : {old_ms:>9.1f} ms par appel")
+    print(f"File : import initial                 : {import_ms:>9.1f} ms (une fois)")
+    print(f"File : notation de {scored:>5} entrées     : {score_ms:>9.1f} ms (une fois, par lots)")
+    print(f"File : page de {len(page)} candidates        : {page_ms:>9.3f} ms")
+    print(f"File : page après 500 candidates      : {deep_ms:>9.3f} ms")
+    print(f"File : enregistrement d'un retour     : {record_ms:>9.3f} ms")
+    print(f"File : page après {args.burst} nouvelles entrées : {burst_ms:>9.3f} ms ({pending} en attente de notation)")
+
+    raw = rng.sample(asked, min(args.sample, len(asked)))
+    loop_ms, loop = timed(lambda: [predict_category(q) for q in raw])
+    batch_ms, _ = timed(lambda: predict_categories([preprocess_text(q) for q in raw]))
+    categories, _ = predict_categories([preprocess_text(q) for q in raw])
+    agreement = np.mean([c == category for c, (category, _) in zip(categories, loop)])
+    print(f"Prédiction de {len(raw)} catégories : boucle {loop_ms:.1f} ms, lots {batch_ms:.1f} ms "
+          f"(accord {agreement:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Téléchargements (/api/download/<filename>) : manifeste en mémoire
+(chatbot.file_server) contre l'ancienne route.
+
+Crée --files fichiers PDF factices de --size Kio dans un répertoire temporaire,
+puis mesure avec le client de test Flask (sans réseau) le temps par requête :
+- une route vide, pour le coût fixe du client de test ;
+- ancienne route : listdir, deux exists, impressions puis send_from_directory ;
+- nouvelle route : premier téléchargement (200), téléchargement répété avec
+  If-None-Match (304), plage de 1 Kio (206) et variante gzip ;
+- la requête suivant la modification de tous les fichiers, et le parcours qui
+  les ré-empreinte : il se fait dans le thread du serveur de fichiers, plus
+  dans celui de la requête.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_downloads [--requests 2000] [--files 20] [--size 200]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+from flask import Flask, jsonify, request, send_from_directory
+from chatbot.file_server import FileServer, precompress
+
+
+def old_app(files_dir):
+    app = Flask(__name__)
+
+    @app.route('/api/download/<filename>')
+    def download_file(filename):
+        # Corps de l'ancienne route
+        file_path = os.path.join(files_dir, filename)
+        print(f"Requested file: {filename}, Path: {file_path}, Exists: {os.path.exists(file_path)}")
+        print(f"Files in directory: {os.listdir(files_dir)}")
+        if not os.path.exists(file_path):
+            return jsonify({"status": "error", "message": f"Fichier {filename} non trouvé."}), 404
+        return send_from_directory(files_dir, filename, as_attachment=True)
+    return app
+
+
+def new_app(files_dir):
+    app = Flask(__name__)
+    server = FileServer(files_dir)
+    server.start()
+
+    @app.route('/empty/<filename>')
+    def empty(filename):
+        return ''
+
+    @app.route('/api/download/<filename>')
+    def download_file(filename):
+        response = server.serve(filename, request)
+        if response is None:
+            return jsonify({"status": "error", "message": f"Fichier {filename} non trouvé."}), 404
+        return response
+    app.file_server = server
+    return app
+
+
+def timed(client, names, count, headers=None, prefix='/api/download'):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            name = names[i % len(names)]
+            response = client.get(f'{prefix}/{name}', headers=headers(name) if headers else None)
+            response.get_data()  # corps lu comme par un client
+            response.close()
+    return (time.perf_counter() - start) / count * 1e6, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--size', type=int, default=200, help="taille des fichiers (Kio)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as files_dir:
+        names = []
+        for i in range(args.files):
+            name = f'document_{i}.pdf'
+            # Contenu à moitié compressible, comme un PDF avec du texte
+            chunk = b'%PDF-1.4 attestation ' * 8 + bytes(rng.randrange(256) for _ in range(256))
+            with open(os.path.join(files_dir, name), 'wb') as f:
+                f.write((chunk * (args.size * 1024 // len(chunk) + 1))[:args.size * 1024])
+            names.append(name)
+        precompress(files_dir)
+
+        old_client = old_app(files_dir).test_client()
+        new_server = new_app(files_dir)
+        new_client = new_server.test_client()
+        etags = {name: new_client.get(f'/api/download/{name}').headers['ETag'] for name in names}
+
+        runs = [
+            ("ancienne route (200)", old_client, None),
+            ("manifeste (200)", new_client, None),
+            ("manifeste If-None-Match (304)", new_client, lambda name: {'If-None-Match': etags[name]}),
+            ("manifeste Range 1 Kio (206)", new_client, lambda name: {'Range': 'bytes=0-1023'}),
+            ("manifeste gzip (200)", new_client, lambda name: {'Accept-Encoding': 'gzip'}),
+        ]
+        print(f"{args.files} fichiers de {args.size} Kio, {args.requests} requêtes par mesure")
+        micros, _ = timed(new_client, names, args.requests, prefix='/empty')
+        print(f"{'route vide (coût du client de test)':<32}: {micros:>8.1f} µs/requête")
+        for label, client, headers in runs:
+            micros, response = timed(client, names, args.requests, headers)
+            length = int(response.headers.get('Content-Length') or 0)
+            print(f"{label:<32}: {micros:>8.1f} µs/requête, statut {response.status_code}, {length:>7} octets")
+
+        for name in names:
+            os.utime(os.path.join(files_dir, name))
+        micros, _ = timed(new_client, names, 1)
+        start = time.perf_counter()
+        new_server.file_server.refresh()
+        print(f"{'requête après modification':<32}: {micros:>8.1f} µs ; parcours avec ré-empreinte de "
+              f"{len(names)} fichiers : {(time.perf_counter() - start) * 1000:.1f} ms (thread d'arrière-plan)")
+
+
+if __name__ == '__main__':
+    main()
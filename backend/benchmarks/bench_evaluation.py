@@ -0,0 +1,87 @@
+"""
+Évaluation de /embeddings-metrics (chatbot.evaluation) contre l'ancienne boucle.
+
+Génère --questions questions de test (questions de la base dégradées, un mot sur
+trois supprimé) et mesure :
+- l'ancienne route : pour chaque question, TF-IDF, Word2Vec, FastText puis
+  ensemble_similarity (qui refait les deux recherches d'embeddings), mesurée
+  sur --old-sample questions et extrapolée ;
+- l'évaluation par lots, avec 1 puis --workers threads.
+Vérifie que les réponses et similarités sont les mêmes sur l'échantillon.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_evaluation [--questions 5000] [--old-sample 300]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions, responses, preprocess_text, vectorizer
+    from chatbot.embeddings_utils import get_best_match_with_word2vec, get_best_match_with_fasttext, ensemble_similarity
+    from chatbot.evaluation import EmbeddingsEvaluation
+    from chatbot.retrieval import partitioned_index
+    from sklearn.metrics.pairwise import cosine_similarity
+
+
+def make_questions(count, seed=17):
+    rng = random.Random(seed)
+    test_questions = []
+    for _ in range(count):
+        words = questions[rng.randrange(len(questions))].split()
+        test_questions.append(' '.join(w for j, w in enumerate(words) if j % 3 != 1))
+    return test_questions
+
+
+def old_loop(test_questions):
+    # Corps de l'ancienne route, sans load_data ni la sérialisation JSON
+    tfidf_matrix = partitioned_index.global_scope["tfidf"]
+    results = []
+    for question in test_questions:
+        tfidf_similarities = cosine_similarity(vectorizer.transform([preprocess_text(question)]), tfidf_matrix)
+        tfidf_best_idx = tfidf_similarities.argmax()
+        w2v_idx, w2v_sim = get_best_match_with_word2vec(question)
+        ft_idx, ft_sim = get_best_match_with_fasttext(question)
+        ens_idx, ens_sim = ensemble_similarity(question)
+        results.append({
+            'tfidf': (responses[tfidf_best_idx], float(tfidf_similarities[0, tfidf_best_idx])),
+            'word2vec': (responses[w2v_idx], float(w2v_sim)),
+            'fasttext': (responses[ft_idx], float(ft_sim)),
+            'ensemble': (responses[ens_idx], float(ens_sim)),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=5000)
+    parser.add_argument('--old-sample', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    test_questions = make_questions(args.questions)
+    sample = test_questions[:args.old_sample]
+    start = time.perf_counter()
+    old = old_loop(sample)
+    old_s = (time.perf_counter() - start) / len(sample) * len(test_questions)
+    print(f"{len(test_questions)} questions de test, base de {partitioned_index.global_scope['rows'].size} lignes")
+    print(f"Ancienne boucle      : {old_s:>7.1f} s (extrapolé depuis {len(sample)} questions)")
+
+    for workers in sorted({1, args.workers}):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            report = EmbeddingsEvaluation(test_questions, 'bench', workers=workers).compute()
+            elapsed = time.perf_counter() - start
+        print(f"Par lots, {workers:>2} thread(s) : {elapsed:>7.1f} s ({old_s / elapsed:.0f}x)")
+
+    same = np.mean([all(r[m]['response'] == o[m][0] and np.isclose(r[m]['similarity'], o[m][1])
+                        for m in o) for r, o in zip(report['results'], old)])
+    print(f"Accord avec l'ancienne boucle : {same:.1%} ; répartition {report['method_counts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Microbenchmarks des fonctions chaudes de chatbot, avec seuils de régression.
+
+Fixtures : pour chaque taille de base de --kb-sizes ('full' : toute la base), un
+répertoire contenant un data/data_option1.csv tiré de la vraie base (échantillon,
+ou variantes des questions au-delà de sa taille). Chaque taille est mesurée dans
+un processus lancé dans ce répertoire : les modules y construisent leurs index et
+entraînent leurs modèles (chemins relatifs data/ et models/), comme le serveur.
+Les fonctions qui dépendent de l'historique (save_new_question, load_chat_sessions,
+c'est-à-dire ChatStore.load_all) sont mesurées pour chaque taille de
+--history-sizes, sur un journal et des sessions générés.
+
+Une mesure est le temps par appel (meilleure de --repeat répétitions timeit,
+nombre d'appels ajusté à au moins 0,2 s) sur des questions de la fixture prises
+tour à tour. Elle est comparée à benchmarks/baselines/functions.json : une
+fonction régresse si elle dépasse sa référence de plus de --tolerance (ou de la
+clé "tolerance" de l'entrée) et d'au moins --min-delta-us. Les fonctions en
+régression sont mesurées une seconde fois ; si la régression se confirme, le code
+de sortie est 1. --save enregistre comme références la meilleure de deux mesures
+complètes (à refaire sur la machine de comparaison). Aucun accès réseau :
+ressources NLTK locales, modèles entraînés sur les fixtures (réutilisés avec
+--fixtures).
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_functions [--kb-sizes 1000,2500,full] [--history-sizes 1000,100000]
+                                         [--only preprocess_text,knn_predict] [--tolerance 0.3] [--save]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BACKEND_DIR, 'data', 'data_option1.csv')
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines', 'functions.json')
+KB_FUNCTIONS = ['preprocess_text', 'vectorizer_transform', 'tfidf_cosine', 'get_document_vector_w2v',
+                'get_document_vector_fasttext', 'get_best_match_with_word2vec', 'get_best_match_with_fasttext',
+                'ensemble_similarity', 'knn_predict', 'knn_kneighbors', 'search_in_index']
+HISTORY_FUNCTIONS = ['save_new_question', 'load_chat_sessions']
+SUFFIXES = ["", " ?", " svp", " s'il vous plaît", " merci"]
+
+
+def measure(function, inputs, repeat):
+    """Temps par appel (µs), meilleur de repeat répétitions, entrées prises tour à tour."""
+    # Premier passage hors mesure (caches, allocations), mémoire libérée des chargements précédents
+    for item in inputs:
+        function(item)
+    gc.collect()
+    items = itertools.cycle(inputs)
+    timer = timeit.Timer(lambda: function(next(items)))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def write_history(size, questions, rng):
+    """data/new_questions.csv de size lignes et data/chat_history_<size>.db de size messages."""
+    asked = [questions[i] for i in rng.integers(len(questions), size=size)]
+    timestamps = (pd.Timestamp.now() - pd.to_timedelta(np.arange(size)[::-1], unit='s')).map(pd.Timestamp.isoformat)
+    pd.DataFrame({"question": asked, "response": "Désolé, je n'ai pas compris.", "rating": None,
+                  "timestamp": timestamps}).to_csv('data/new_questions.csv', index=False, encoding='utf-8')
+    from chatbot.chat_store import ChatStore
+    path = f'data/chat_history_{size}.db'
+    if os.path.exists(path):
+        os.remove(path)
+    store = ChatStore(path, legacy_csv='')
+    conn = store._conn()
+    sessions = max(1, size // 20)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO sessions (id, date, first_message, message_count) VALUES (?, ?, ?, ?)",
+                     [(s + 1, timestamps[s * 20 % size], asked[s * 20 % size], 0) for s in range(sessions)])
+    conn.executemany(
+        "INSERT INTO messages (session_id, user_message, bot_answer, bot_url, bot_similarity, bot_category, "
+        "bot_is_shortcut, bot_method, timestamp) VALUES (?, ?, 'Réponse', NULL, 0.9, 'general', 0, 'tfidf', ?)",
+        [(i // 20 % sessions + 1, asked[i], timestamps[i]) for i in range(size)])
+    conn.execute("UPDATE sessions SET message_count = (SELECT COUNT(*) FROM messages WHERE session_id = sessions.id)")
+    conn.execute("COMMIT")
+    return store
+
+
+def child(kb_size, history_sizes, only, queries, repeat):
+    """Mesures dans le répertoire de la fixture ; résultats en JSON sur la dernière ligne."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from chatbot.data_processing import preprocess_text, vectorizer, questions, word2vec_model, fasttext_model
+        from chatbot.embeddings_utils import (get_document_vector_w2v, get_document_vector_fasttext,
+                                              get_best_match_with_word2vec, get_best_match_with_fasttext,
+                                              ensemble_similarity)
+        from chatbot.models import knn_classifier
+        from chatbot.retrieval import partitioned_index
+        from chatbot.chatbot_logic import search_in_index, save_new_question
+
+    rng = np.random.default_rng(0)
+    texts = [questions[int(i)] + SUFFIXES[i % len(SUFFIXES)] for i in rng.choice(len(questions), queries)]
+    processed = [preprocess_text(t) for t in texts]
+    tfidf_rows = [vectorizer.transform([p]) for p in processed]
+    dense_rows = [row.toarray() for row in tfidf_rows]
+    functions = {
+        'preprocess_text': (preprocess_text, texts),
+        'vectorizer_transform': (lambda p: vectorizer.transform([p]), processed),
+        'tfidf_cosine': (lambda row: partitioned_index.best_match('tfidf', row, None), tfidf_rows),
+        'get_document_vector_w2v': (lambda t: get_document_vector_w2v(t, word2vec_model), texts),
+        'get_document_vector_fasttext': (lambda t: get_document_vector_fasttext(t, fasttext_model), texts),
+        'get_best_match_with_word2vec': (get_best_match_with_word2vec, texts),
+        'get_best_match_with_fasttext': (get_best_match_with_fasttext, texts),
+        'ensemble_similarity': (ensemble_similarity, texts),
+        'knn_predict': (knn_classifier.predict, dense_rows),
+        'knn_kneighbors': (lambda row: knn_classifier.kneighbors(row, n_neighbors=1), dense_rows),
+        'search_in_index': (lambda i: search_in_index(texts[i], processed[i]), range(queries)),
+    }
+    results = {}
+    for name, (function, inputs) in functions.items():
+        if name in only:
+            results[f'{name}[kb={kb_size}]'] = measure(function, inputs, repeat)
+    for size in history_sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = write_history(size, texts, rng)
+            save_new_question(texts[0], None)  # premier appel : amorçage de la file des candidates
+        if 'save_new_question' in only:
+            results[f'save_new_question[history={size}]'] = measure(
+                lambda t: save_new_question(t, "Désolé, je n'ai pas compris."), texts, repeat)
+        if 'load_chat_sessions' in only:
+            results[f'load_chat_sessions[history={size}]'] = measure(lambda _: store.load_all(), [None], repeat)
+    print(json.dumps(results))
+
+
+def write_fixture(directory, kb, size):
+    """data/data_option1.csv de size lignes : échantillon de la base, complété de variantes au-delà."""
+    path = os.path.join(directory, 'data', 'data_option1.csv')
+    if os.path.exists(path) and len(pd.read_csv(path, encoding='utf-8', usecols=['id'])) == size:
+        return  # fixture réutilisée, modèles déjà entraînés compris
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if size <= len(kb):
+        fixture = kb.sample(size, random_state=0).sort_index()
+    else:
+        rng = np.random.default_rng(0)
+        extra = kb.sample(size - len(kb), replace=True, random_state=0).copy()
+        words = ' '.join(kb['question']).split()
+        extra['question'] = [f"{q} {words[i]}" for q, i in zip(extra['question'], rng.integers(len(words), size=len(extra)))]
+        fixture = pd.concat([kb, extra], ignore_index=True)
+    fixture = fixture.assign(id=np.arange(1, size + 1, dtype=float))
+    fixture.to_csv(path, index=False, encoding='utf-8')
+
+
+def run_child(directory, kb_size, history_sizes, only, queries, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])))
+    command = [sys.executable, '-m', 'benchmarks.bench_functions', '--child', '--kb-sizes', str(kb_size),
+               '--history-sizes', ','.join(map(str, history_sizes)), '--only', ','.join(only),
+               '--queries', str(queries), '--repeat', str(repeat)]
+    process = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(f"échec des mesures pour kb={kb_size} :\n{process.stderr[-2000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def machine():
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def measure_all(root, kb, kb_sizes, history_sizes, only, args):
+    results = {}
+    for i, size in enumerate(kb_sizes):
+        directory = os.path.join(root, f'kb_{size}')
+        write_fixture(directory, kb, size)
+        # Historique indépendant de la base : mesuré une fois, avec la première fixture
+        print(f"mesures kb={size}...", flush=True)
+        results.update(run_child(directory, size, history_sizes if i == 0 else [], only, args.queries, args.repeat))
+    return results
+
+
+def regressions(results, references, tolerance, min_delta_us):
+    """Clés plus lentes que leur référence au-delà de leur tolérance et d'au moins min_delta_us."""
+    return [key for key, value in results.items() if key in references
+            and value > references[key]["us"] * (1 + references[key].get("tolerance", tolerance))
+            and value - references[key]["us"] >= min_delta_us]
+
+
+def report(results, references, tolerance, regressed):
+    print(f"{'fonction':<48} {'référence':>12} {'mesure':>12} {'rapport':>8}")
+    for key, value in results.items():
+        reference = references.get(key)
+        if reference is None:
+            print(f"{key:<48} {'-':>12} {value:>10.1f}µs {'':>8}  nouvelle")
+            continue
+        ratio = value / reference["us"]
+        limit = reference.get("tolerance", tolerance)
+        status = f"RÉGRESSION (> +{limit:.0%})" if key in regressed else ("plus rapide" if ratio < 1 - limit else "ok")
+        print(f"{key:<48} {reference['us']:>10.1f}µs {value:>10.1f}µs {ratio:>7.2f}x  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kb-sizes', default='1000,2500,full')
+    parser.add_argument('--history-sizes', default='1000,100000')
+    parser.add_argument('--only', default=','.join(KB_FUNCTIONS + HISTORY_FUNCTIONS))
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--min-delta-us', type=float, default=2.0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="enregistrer les mesures comme références")
+    parser.add_argument('--fixtures', help="répertoire des fixtures à garder et réutiliser (temporaire sinon)")
+    parser.add_argument('--child', action='store_true')
+    args = parser.parse_args()
+    only = [name for name in args.only.split(',') if name]
+    history_sizes = [int(h) for h in args.history_sizes.split(',') if h]
+    if args.child:
+        child(int(args.kb_sizes), history_sizes, only, args.queries, args.repeat)
+        return
+
+    kb = pd.read_csv(DATA_PATH, encoding='utf-8')
+    kb_sizes = [len(kb) if size == 'full' else int(size) for size in args.kb_sizes.split(',')]
+    unknown = set(only) - set(KB_FUNCTIONS + HISTORY_FUNCTIONS)
+    if unknown:
+        sys.exit(f"fonctions inconnues : {', '.join(sorted(unknown))}")
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    references = baseline.get("results", {})
+    with contextlib.ExitStack() as stack:
+        root = args.fixtures or stack.enter_context(tempfile.TemporaryDirectory())
+        results = measure_all(root, kb, kb_sizes, history_sizes, only, args)
+        if args.save:
+            # Références : meilleure de deux mesures complètes
+            again = measure_all(root, kb, kb_sizes, history_sizes, only, args)
+            results = {key: min(value, again.get(key, value)) for key, value in results.items()}
+        regressed = regressions(results, references, args.tolerance, args.min_delta_us)
+        if regressed and not args.save:
+            # Une régression doit se reproduire : nouvelle mesure des fonctions concernées, la meilleure est gardée
+            print(f"{len(regressed)} régression(s) possible(s), nouvelle mesure...", flush=True)
+            again = measure_all(root, kb, kb_sizes, history_sizes, sorted({key.split('[')[0] for key in regressed}),
+                                args)
+            for key in regressed:
+                results[key] = min(results[key], again.get(key, results[key]))
+            regressed = regressions(results, references, args.tolerance, args.min_delta_us)
+
+    if baseline and baseline.get("machine") != machine():
+        print(f"attention : références mesurées sur {baseline.get('machine')}, machine courante {machine()}")
+    report(results, references, args.tolerance, regressed)
+
+    if args.save:
+        entries = baseline.get("results", {})
+        for key, value in results.items():
+            entries[key] = dict(entries.get(key, {}), us=round(value, 2))
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"machine": machine(), "results": dict(sorted(entries.items()))}, f, indent=2,
+                      ensure_ascii=False)
+            f.write('\n')
+        print(f"références enregistrées dans {os.path.relpath(args.baseline)}")
+    elif regressed:
+        print(f"{len(regressed)} régression(s) au-delà de la tolérance")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Analyse des lacunes (chatbot.gap_analysis) sur un gros journal de questions.
+
+Écrit un faux data/new_questions.csv de --rows lignes dans un répertoire
+temporaire : des questions de la base légèrement modifiées (couvertes) et, pour
+--gap-share des lignes, des questions sur des sujets absents de la base (lacunes
+injectées). Mesure :
+- l'analyse complète (débit, mémoire maximale du processus) ;
+- une analyse incrémentale après l'ajout de --append lignes ;
+- la part des sujets injectés retrouvés parmi les 10 premières lacunes.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_gaps [--rows 100000] [--append 2000] [--gap-share 0.2]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import resource
+import tempfile
+import time
+import pandas as pd
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions
+    from chatbot.gap_analysis import GapAnalysis
+
+GAP_TOPICS = {
+    "parking": ["Où garer ma voiture sur le parking de l'institut", "Le parking est-il payant pour les étudiants",
+                "Combien de places de parking pour les voitures"],
+    "objets perdus": ["J'ai perdu mon téléphone dans une salle", "Où récupérer un objet perdu",
+                      "Quelqu'un a trouvé mes clés"],
+    "cantine": ["Quel est le menu de la cantine aujourd'hui", "La cantine accepte-t-elle la carte bancaire",
+                "Prix du repas à la cantine"],
+}
+NOISE = ["", " svp", " merci", " stp", " ?", " s'il vous plaît", " rapidement"]
+
+
+def synthetic_rows(count, gap_share, start, rng):
+    rows = []
+    topics = list(GAP_TOPICS)
+    for i in range(count):
+        if rng.random() < gap_share:
+            question = rng.choice(GAP_TOPICS[rng.choice(topics)])
+        else:
+            question = rng.choice(questions)
+        rows.append({"question": question + rng.choice(NOISE), "response": "Désolé, je n'ai pas compris.",
+                     "rating": None, "timestamp": (start + pd.Timedelta(seconds=i)).isoformat()})
+    return pd.DataFrame(rows)
+
+
+def found_topics(report):
+    found = set()
+    for gap in report["gaps"][:10]:
+        text = ' '.join(gap["questions"]).lower()
+        found.update(topic for topic, samples in GAP_TOPICS.items()
+                     if any(sample.lower() in text for sample in samples))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--append', type=int, default=2000)
+    parser.add_argument('--gap-share', type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    start = pd.Timestamp('2025-01-01')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'new_questions.csv')
+        state_path = os.path.join(tmp, 'gap_clusters.joblib')
+        synthetic_rows(args.rows, args.gap_share, start, rng).to_csv(path, index=False, encoding='utf-8')
+        print(f"{args.rows} lignes ({os.path.getsize(path) / 1e6:.1f} Mo), {args.gap_share:.0%} sur "
+              f"{len(GAP_TOPICS)} sujets absents de la base")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with contextlib.redirect_stdout(io.StringIO()):
+            job = GapAnalysis(path=path, state_path=state_path).run()
+        elapsed = job.finished_at - job.started_at
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"analyse complète : {elapsed:.1f} s ({job.rows / elapsed:.0f} questions/s), "
+              f"mémoire max {rss_before:.0f} -> {rss_after:.0f} Mio, état {os.path.getsize(state_path) / 1e6:.1f} Mo")
+
+        more = synthetic_rows(args.append, args.gap_share, start + pd.Timedelta(days=30), rng)
+        more.to_csv(path, mode='a', header=False, index=False, encoding='utf-8')
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            job = GapAnalysis(path=path, state_path=state_path).run()
+        print(f"analyse incrémentale : {job.rows} nouvelles lignes en {time.perf_counter() - begin:.2f} s")
+
+        report = job.state.report()
+        found = found_topics(report)
+        print(f"{report['uncovered_clusters']} groupes peu couverts sur {report['clusters']} ; sujets injectés "
+              f"retrouvés dans les 10 premières lacunes : {len(found)}/{len(GAP_TOPICS)} ({', '.join(sorted(found))})")
+        for gap in report["gaps"][:5]:
+            print(f"  {gap['size']:>6} questions, couverture {gap['coverage']:.2f}, {gap['category']} : "
+                  f"{gap['questions'][0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Cache HTTP des routes de tableau de bord (chatbot.http_cache).
+
+Remplit un magasin de chats temporaire (--sessions sessions de --messages
+messages), puis simule les interrogations périodiques des pages React avec le
+client de test Flask. Pour chaque route :
+- sans cache : la route d'origine (non décorée), appelée directement, donc
+  sans le coût fixe du client de test (~0,3 ms) compté dans les deux autres ;
+- cache, 200 : premier appel d'un client (corps mis en cache, compressé si
+  accepté) ;
+- cache, 304 : appel suivant avec If-None-Match, données inchangées.
+Le rapport donne le temps par appel et les octets transférés.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_http_cache [--polls 200] [--sessions 300] [--messages 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    from chatbot.chat_store import ChatStore
+
+ROUTES = ['/about', '/metrics', '/report', '/api/self-learning/status', '/get_sessions']
+
+
+def fill_store(store, sessions, messages):
+    for s in range(sessions):
+        session_id = None
+        for m in range(messages):
+            session_id = store.append_message(session_id, {
+                "user": f"Comment obtenir une attestation de stage ? ({s}, {m})",
+                "bot": {"answer": "Vous pouvez télécharger le fichier attestation_stage.pdf ici.",
+                        "url": "/api/download/attestation_stage.pdf", "similarity": 0.92,
+                        "category": "documents", "is_shortcut": False, "method": "tfidf"},
+                "timestamp": f"2025-06-{1 + s % 28:02d}T10:{m % 60:02d}:00"})
+
+
+def timed(fn, polls):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(polls):
+            response = fn()
+            size = len(response.get_data())
+    return (time.perf_counter() - start) / polls * 1000, response, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.chat_store = ChatStore(os.path.join(tmp, 'chat_sessions.db'), os.path.join(tmp, 'absent.csv'))
+        fill_store(app.chat_store, args.sessions, args.messages)
+        client = app.app.test_client()
+        print(f"{args.sessions} sessions de {args.messages} messages, {args.polls} appels par mesure")
+        for route in ROUTES:
+            view = app.app.view_functions[app.app.url_map.bind('').match(route)[0]]
+            with app.app.test_request_context(route):
+                uncached_ms, _, uncached_size = timed(lambda: app.app.make_response(view.__wrapped__()), args.polls)
+            gzip_ms, response, gzip_size = timed(lambda: client.get(route, headers={'Accept-Encoding': 'gzip'}),
+                                                 args.polls)
+            etag = response.headers['ETag']
+            revalidate_ms, response, _ = timed(lambda: client.get(route, headers={'If-None-Match': etag}), args.polls)
+            print(f"{route:<26}: sans cache {uncached_ms:>7.2f} ms {uncached_size:>8} o | cache 200 gzip "
+                  f"{gzip_ms:>6.2f} ms {gzip_size:>7} o | 304 {revalidate_ms:>5.2f} ms (statut {response.status_code})")
+        print(app.response_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Import en masse dans la base de connaissances (chatbot.kb_import).
+
+Génère un fichier de --rows lignes : nouvelles questions (mots de la base
+recombinés), copies de questions de la base, doublons internes au fichier et
+lignes invalides. L'import est exécuté sur une copie de data/ dans un
+répertoire temporaire (la vraie base n'est pas modifiée), en simulation puis
+réellement ; le rapport donne le débit, les rejets par motif, la croissance du
+pic de RSS et la latence d'une requête après l'import.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_kb_import [--rows 100000] [--format csv|jsonl]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import pandas as pd
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions, responses, categories, get_knowledge_base
+    from chatbot.chatbot_logic import get_response
+    from chatbot.kb_import import ImportJob
+
+
+def write_file(path, rows, fmt, rng):
+    words = sorted({w for q in questions for w in q.split()})
+    category_values = sorted(set(categories))
+    records = []
+    for i in range(rows):
+        kind = rng.random()
+        if kind < 0.1:
+            j = rng.randrange(len(questions))
+            records.append((categories[j], questions[j], responses[j], ''))
+        elif kind < 0.15 and records:
+            records.append(records[rng.randrange(len(records))])
+        elif kind < 0.17:
+            records.append((rng.choice(category_values), '', 'réponse', ''))
+        else:
+            question = ' '.join(rng.choice(words) for _ in range(rng.randint(4, 10))) + f' {i}'
+            records.append((rng.choice(category_values), question, f"Réponse importée {i % 500}", '/import'))
+    frame = pd.DataFrame(records, columns=['category', 'question', 'answer', 'url'])
+    if fmt == 'jsonl':
+        frame.to_json(path, orient='records', lines=True, force_ascii=False)
+    else:
+        frame.to_csv(path, index=False, encoding='utf-8')
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    cwd = os.getcwd()
+    kb_rows = len(get_knowledge_base())
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree('data', os.path.join(tmp, 'data'), ignore=shutil.ignore_patterns('*.db*'))
+        os.makedirs(os.path.join(tmp, 'models'))
+        path = os.path.join(tmp, f'import.{args.format}')
+        write_file(path, args.rows, args.format, rng)
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                get_response(questions[0])
+            for dry_run in (True, False):
+                rss_before = peak_rss_mib()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    job = ImportJob(path, args.format, args.chunk_size, dry_run=dry_run).run()
+                elapsed = time.perf_counter() - start
+                report = job.to_dict()
+                print(f"{'simulation' if dry_run else 'import    '} : {elapsed:>6.1f} s, "
+                      f"{report['rows_read'] / elapsed:>7.0f} lignes/s, {report['accepted']} retenues, "
+                      f"rejets {report['rejected']}, pic RSS +{peak_rss_mib() - rss_before:.0f} Mio")
+            print(f"Base : {kb_rows} -> {len(get_knowledge_base())} lignes, génération {report['generation']}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                for q in rng.sample(list(questions), 50):
+                    get_response(q)
+            print(f"get_response après import : {(time.perf_counter() - start) / 50 * 1000:.1f} ms")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark du chargement de la base de connaissances : pd.read_csv + iterrows
+contre le magasin en colonnes (chatbot.kb_store), à 5k et 100k lignes.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_kb_loader [--sizes 5000 100000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from chatbot.kb_store import KnowledgeBase, DATA_PATH
+
+
+def make_fixture(size, path):
+    base = pd.read_csv(DATA_PATH, encoding='utf-8')
+    repeats = size // len(base) + 1
+    data = pd.concat([base] * repeats, ignore_index=True).head(size).copy()
+    # Questions distinctes, réponses volontairement dupliquées comme dans la base réelle
+    data['id'] = range(1, len(data) + 1)
+    data['question'] = data['question'] + ' #' + data['id'].astype(str)
+    data.to_csv(path, index=False, encoding='utf-8')
+
+
+def load_with_iterrows(path):
+    data = pd.read_csv(path, encoding='utf-8')
+    questions, responses, urls, categories = [], [], [], []
+    for _, row in data.iterrows():
+        questions.append(row['question'])
+        responses.append(row['answer'])
+        urls.append(row['url'])
+        categories.append(row['category'])
+    return questions, responses, urls, categories
+
+
+def load_with_store(path, store_dir):
+    kb = KnowledgeBase.open(path, store_dir)
+    return kb.questions, kb.responses, kb.urls, kb.categories.tolist()
+
+
+def measure(fn, *args):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'lignes':>8} {'méthode':<22} {'temps (ms)':>11} {'tas retenu (Mo)':>16} {'pic (Mo)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            csv_path = os.path.join(tmp, f'kb_{size}.csv')
+            store_dir = os.path.join(tmp, f'store_{size}')
+            make_fixture(size, csv_path)
+
+            start = time.perf_counter()
+            KnowledgeBase.open(csv_path, store_dir)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            rows = [
+                ('read_csv + iterrows', measure(load_with_iterrows, csv_path)),
+                ('kb_store (mmap)', measure(load_with_store, csv_path, store_dir)),
+            ]
+            for name, (elapsed, retained, peak) in rows:
+                print(f"{size:>8} {name:<22} {elapsed * 1000:>11.1f} {retained / 1e6:>16.2f} {peak / 1e6:>10.2f}")
+            print(f"{size:>8} {'(construction unique)':<22} {build_ms:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Maintenance des journaux (chatbot.maintenance) sur de gros new_questions.csv et ratings.csv.
+
+Écrit dans un répertoire temporaire deux journaux de --rows lignes étalées sur
+--days jours (questions de la base, reprises telles quelles ou avec un détail
+propre à chaque ligne, quelques questions inconnues répétées et des raccourcis),
+puis mesure :
+- l'ajout d'une ligne : ancienne réécriture complète (lecture, concat, to_csv)
+  et ajout en fin de fichier (LogFile.append) ;
+- la lecture des lecteurs (/metrics, statut d'auto-apprentissage) avant et
+  après une passe de maintenance (--retention-days, --max-rows) ;
+- la passe elle-même, pendant qu'un thread ajoute des lignes en continu : durée,
+  latence maximale d'un ajout, lignes ajoutées toutes retrouvées ;
+- la taille des fichiers chauds et des archives, et les totaux (journal + agrégats)
+  inchangés.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_maintenance [--rows 500000] [--days 365] [--retention-days 30]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions
+    from chatbot.config import shortcuts
+    from chatbot.maintenance import LogFile, Maintenance, new_questions_totals, ratings_totals
+
+UNKNOWN = ["Où garer ma voiture", "Menu de la cantine", "J'ai perdu mes clés", "Horaires de la piscine"]
+
+
+def synthetic_logs(directory, count, days, rng):
+    now = pd.Timestamp.now()
+    offsets = np.sort(rng.uniform(0, days * 86400, count))[::-1]
+    timestamps = [(now - pd.Timedelta(seconds=float(s))).isoformat() for s in offsets]
+    pool = rng.choice(len(questions), 2000)
+    asked, responses, ratings = [], [], []
+    for i in range(count):
+        draw = rng.random()
+        if draw < 0.2:
+            asked.append(UNKNOWN[rng.integers(len(UNKNOWN))])
+            responses.append("Désolé, je n'ai pas compris.")
+        elif draw < 0.25:
+            asked.append(list(shortcuts)[rng.integers(len(shortcuts))])
+            responses.append(None)
+        elif draw < 0.6:
+            asked.append(questions[int(pool[rng.integers(len(pool))])] + random.choice(["", " ?", " svp"]))
+            responses.append("Réponse générée")
+        else:
+            # Question libre, jamais répétée à l'identique
+            asked.append(f"{questions[int(pool[rng.integers(len(pool))])]} (cas {i})")
+            responses.append("Réponse générée")
+        ratings.append(bool(rng.random() < 0.7))
+    paths = os.path.join(directory, 'new_questions.csv'), os.path.join(directory, 'ratings.csv')
+    pd.DataFrame({"question": asked, "response": responses, "rating": None, "timestamp": timestamps}).to_csv(
+        paths[0], index=False, encoding='utf-8')
+    pd.DataFrame({"question": asked, "rating": ratings, "timestamp": timestamps}).to_csv(
+        paths[1], index=False, encoding='utf-8')
+    return paths
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def readers(new_questions_path, ratings_path, maintenance):
+    """Totaux lus comme /metrics et le statut d'auto-apprentissage (journal + agrégats archivés)."""
+    ratings = pd.read_csv(ratings_path, encoding='utf-8', usecols=['rating'])
+    archived = maintenance.archived('ratings')
+    count = len(pd.read_csv(new_questions_path, encoding='utf-8', usecols=['question']))
+    return (int((ratings['rating'] == True).sum()) + archived.get('positive', 0),
+            int((ratings['rating'] == False).sum()) + archived.get('negative', 0),
+            count + maintenance.archived('new_questions').get('rows', 0))
+
+
+def size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--days', type=float, default=365)
+    parser.add_argument('--retention-days', type=float, default=30)
+    parser.add_argument('--max-rows', type=int, default=100000)
+    parser.add_argument('--append-rate', type=float, default=200, help="ajouts/s pendant la maintenance")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        new_questions_path, ratings_path = synthetic_logs(tmp, args.rows, args.days, rng)
+        new_questions_log = LogFile(new_questions_path, ['question', 'response', 'rating', 'timestamp'],
+                                    ['question', 'response', 'rating'], new_questions_totals)
+        ratings_log = LogFile(ratings_path, ['question', 'rating', 'timestamp'], ['question', 'rating'],
+                              ratings_totals)
+        maintenance = Maintenance([new_questions_log, ratings_log], archive_dir=os.path.join(tmp, 'archive'),
+                                  retention_days=args.retention_days, max_rows=args.max_rows)
+        print(f"{args.rows} lignes sur {args.days:.0f} jours : new_questions.csv "
+              f"{size(new_questions_path) / 1e6:.1f} Mo, ratings.csv {size(ratings_path) / 1e6:.1f} Mo")
+
+        row = {"question": "question de test", "rating": True, "timestamp": pd.Timestamp.now().isoformat()}
+
+        def rewrite():
+            df = pd.read_csv(ratings_path, encoding='utf-8')
+            pd.concat([df, pd.DataFrame([row])], ignore_index=True).to_csv(ratings_path, index=False, encoding='utf-8')
+
+        print(f"ajout d'un retour : réécriture complète {timed(rewrite, 1):.0f} ms, "
+              f"ajout en fin de fichier {timed(lambda: ratings_log.append(row), 20):.2f} ms")
+        before = readers(new_questions_path, ratings_path, maintenance)
+        read_before = timed(lambda: readers(new_questions_path, ratings_path, maintenance))
+
+        appended, latencies = [], []
+        stop = threading.Event()
+
+        def appender():
+            i = 0
+            while not stop.is_set():
+                entry = {"question": f"ajout concurrent {i}", "rating": True,
+                         "timestamp": pd.Timestamp.now().isoformat()}
+                start = time.perf_counter()
+                ratings_log.append(entry)
+                latencies.append(time.perf_counter() - start)
+                appended.append(entry["question"])
+                i += 1
+                time.sleep(1 / args.append_rate)
+
+        thread = threading.Thread(target=appender)
+        thread.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = maintenance.run()
+        stop.set()
+        thread.join()
+        for name in ('new_questions', 'ratings'):
+            part = report[name]
+            print(f"{name} : {part['rows']} lignes -> {part['kept']} gardées, {part['archived']} archivées, "
+                  f"{part['dropped']} retirées (doublons, questions de la base)")
+        kept = set(pd.read_csv(ratings_path, encoding='utf-8', usecols=['question'])['question'])
+        print(f"passe de maintenance : {report['elapsed_seconds']:.1f} s ; {len(appended)} ajouts concurrents, "
+              f"latence max {max(latencies) * 1000:.1f} ms (p50 {np.median(latencies) * 1000:.2f} ms), "
+              f"{sum(q in kept for q in appended)}/{len(appended)} retrouvés")
+
+        after = readers(new_questions_path, ratings_path, maintenance)
+        read_after = timed(lambda: readers(new_questions_path, ratings_path, maintenance))
+        print(f"fichiers chauds : new_questions.csv {size(new_questions_path) / 1e6:.1f} Mo, "
+              f"ratings.csv {size(ratings_path) / 1e6:.1f} Mo ; archives {size(maintenance.archive_dir) / 1e6:.1f} Mo")
+        print(f"lecteurs : {read_before:.0f} ms -> {read_after:.0f} ms")
+        concurrent = (len(appended), 0, 0)
+        expected = tuple(b + c for b, c in zip(before, concurrent))
+        print(f"totaux (utiles, non utiles, nouvelles questions) : avant {before}, après {after} "
+              f"({'identiques' if after == expected else 'DIFFÉRENTS, attendus ' + str(expected)}, "
+              f"ajouts concurrents compris)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de la recherche partitionnée par catégorie (chatbot.retrieval).
+
+1. Impact sur l'exactitude : get_response sur des questions de la base dégradées
+   (un mot sur trois supprimé), recherche globale contre routage Naive Bayes ;
+   une réponse est correcte si elle est identique à celle de la question d'origine.
+2. Passage à l'échelle : latence de l'étape TF-IDF quand la base est répliquée
+   (x1, x4, x10), globale contre routée.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_partitions [--queries 500]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+import numpy as np
+import scipy.sparse as sp
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.chatbot_logic import get_response
+    from chatbot.data_processing import kb, questions, responses, categories, preprocess_text, vectorizer, tfidf_matrix
+    from chatbot.models import nb_classifier
+    from chatbot.retrieval import PartitionedIndex, partitioned_index
+
+GLOBAL_ONLY = 1.01  # probabilité cumulée jamais atteinte : toujours la recherche globale
+
+
+def make_queries(count, seed=11):
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(questions)), min(count, len(questions))):
+        words = questions[i].split()
+        queries.append((' '.join(w for j, w in enumerate(words) if j % 3 != 1), i))
+    return queries
+
+
+def accuracy_run(queries, min_confidence):
+    partitioned_index.min_confidence = min_confidence
+    latencies, correct = [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query, target in queries:
+            start = time.perf_counter()
+            response = get_response(query)
+            latencies.append(time.perf_counter() - start)
+            correct += response['answer'] == responses[target]
+    latencies = np.array(latencies) * 1000
+    return correct / len(queries), np.mean(latencies), np.percentile(latencies, 99)
+
+
+def scaling_run(queries, factor, min_confidence):
+    index = PartitionedIndex(min_confidence, partitioned_index.max_categories)
+    n = tfidf_matrix.shape[0]
+    index.add(list(categories) * factor, np.arange(n * factor), np.tile(np.asarray(kb.answer_ids[:n]), factor),
+              {"tfidf": sp.vstack([tfidf_matrix] * factor, format='csr')})
+    query_tfidf = vectorizer.transform([preprocess_text(q) for q, _ in queries])
+    routes = [index.route(p, nb_classifier.classes_) for p in nb_classifier.predict_proba(query_tfidf)]
+    latencies = []
+    for i in range(query_tfidf.shape[0]):
+        start = time.perf_counter()
+        index.best_match('tfidf', query_tfidf[i], routes[i])
+        latencies.append(time.perf_counter() - start)
+    return n * factor, np.mean(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--factors', type=int, nargs='+', default=[1, 4, 10])
+    args = parser.parse_args()
+    queries = make_queries(args.queries)
+    configured = partitioned_index.min_confidence
+
+    print("Exactitude de get_response")
+    print(f"{'mode':<10} {'exactitude':>10} {'moy (ms)':>9} {'p99 (ms)':>9}")
+    for name, min_confidence in [('global', GLOBAL_ONLY), ('routé', configured)]:
+        accuracy, mean, p99 = accuracy_run(queries, min_confidence)
+        print(f"{name:<10} {accuracy:>10.1%} {mean:>9.2f} {p99:>9.2f}")
+    partitioned_index.min_confidence = configured
+    print(f"Part des requêtes routées : {partitioned_index.stats()['routed_ratio']:.1%}")
+
+    print("\nLatence de l'étape TF-IDF selon la taille de la base")
+    print(f"{'lignes':>8} {'global (ms)':>12} {'routé (ms)':>11}")
+    for factor in args.factors:
+        rows, global_ms = scaling_run(queries, factor, GLOBAL_ONLY)
+        _, routed_ms = scaling_run(queries, factor, configured)
+        print(f"{rows:>8} {global_ms:>12.3f} {routed_ms:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
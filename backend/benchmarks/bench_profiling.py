@@ -0,0 +1,75 @@
+"""
+Coût du profilage (chatbot.profiling) sur get_response.
+
+Compare la latence de get_response nue, entourée de track() avec le profilage
+désactivé, activé sans capture, pendant une capture échantillonnée et pendant
+une capture cProfile.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_profiling [--queries 300]
+"""
+import argparse
+import contextlib
+import io
+import marshal
+import random
+import threading
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.chatbot_logic import get_response
+    from chatbot.data_processing import questions
+from chatbot.profiling import Profiler
+
+
+def run(queries, profiler=None):
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            start = time.perf_counter()
+            if profiler is None:
+                get_response(query)
+            else:
+                with profiler.track():
+                    get_response(query)
+            latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(4)
+    queries = [questions[i] for i in rng.sample(range(len(questions)), args.queries)]
+    run(queries[:20])  # préchauffage
+
+    rows = [('nu', run(queries)),
+            ('désactivé', run(queries, Profiler(enabled=False))),
+            ('activé', run(queries, Profiler(enabled=True)))]
+    for fmt in ('collapsed', 'pstats'):
+        profiler = Profiler(enabled=True)
+        result, stop = {}, threading.Event()
+        capture = threading.Thread(target=lambda: result.update(profile=profiler.capture(3600, fmt, stop)))
+        capture.start()
+        while capture.is_alive() and not profiler.stats()['capturing']:
+            time.sleep(0.01)
+        rows.append((f'capture {fmt}', run(queries, profiler)))
+        stop.set()
+        capture.join()
+        if fmt == 'collapsed':
+            print(f"Capture échantillonnée : {profiler.stats()['samples']} échantillons, "
+                  f"{len(result['profile'].splitlines())} piles distinctes")
+        else:
+            print(f"Capture cProfile : {len(marshal.loads(result['profile']))} fonctions")
+
+    print(f"{'mode':<18} {'moy (ms)':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, latencies in rows:
+        print(f"{name:<18} {latencies.mean():>9.3f} {np.percentile(latencies, 50):>9.3f} "
+              f"{np.percentile(latencies, 99):>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
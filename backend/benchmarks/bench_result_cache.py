@@ -0,0 +1,105 @@
+"""
+Cache des réponses à deux niveaux (chatbot.result_cache) avec plusieurs workers.
+
+Simule --workers workers (chacun son LRU de niveau 1) qui reçoivent à tour de
+rôle --requests questions tirées de la base selon une loi de Zipf (quelques
+questions très demandées, une longue traîne). Trois configurations :
+- sans cache : chaque requête exécute la cascade ;
+- niveau 1 seul : chaque worker ne profite que de ses propres calculs ;
+- niveaux 1 + 2 : les workers partagent un fichier SQLite (WAL) temporaire.
+Le rapport donne le nombre de cascades exécutées, les taux de succès par niveau
+et le temps moyen par requête ; puis le coût d'un accès à chaque niveau.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_result_cache [--requests 2000] [--workers 4] [--zipf 1.3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.chatbot_logic import get_response, normalize_query
+    from chatbot.data_processing import questions
+    from chatbot.result_cache import ResultCache, SQLiteResultStore
+
+
+def workload(count, zipf, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = rng.permutation(len(questions))
+    ranks = np.minimum(rng.zipf(zipf, count) - 1, len(questions) - 1)
+    return [questions[int(popularity[r])] for r in ranks]
+
+
+def replay(queries, caches):
+    cascades = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, query in enumerate(queries):
+            cache = caches[i % len(caches)] if caches else None
+            key = normalize_query(query)
+            if cache is not None and cache.get(key) is not None:
+                continue
+            response = get_response(query)
+            cascades += 1
+            if cache is not None:
+                cache.put(key, response)
+    return cascades, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def tier_rates(caches):
+    local = sum(c.local_hits for c in caches)
+    shared = sum(c.shared_hits for c in caches)
+    misses = sum(c.shared_misses for c in caches)
+    lookups = local + shared + misses
+    return f"niveau 1 {local / lookups:.1%}, niveau 2 {shared / lookups:.1%}"
+
+
+def access_costs(store, count=2000):
+    cache = ResultCache(store, local_size=10, namespace=lambda: "bench")
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = get_response(questions[0])
+    cache.put("q", response)
+    start = time.perf_counter()
+    for _ in range(count):
+        cache.get("q")
+    local_us = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    for _ in range(count):
+        cache.clear_local()
+        cache.get("q")
+    shared_us = (time.perf_counter() - start) / count * 1e6
+    return local_us, shared_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--zipf', type=float, default=1.3)
+    parser.add_argument('--local-size', type=int, default=256)
+    args = parser.parse_args()
+
+    queries = workload(args.requests, args.zipf)
+    print(f"{args.requests} requêtes, {len(set(queries))} questions distinctes, {args.workers} workers")
+    cascades, ms = replay(queries, [])
+    print(f"{'sans cache':<16}: {cascades:>5} cascades, {ms:>7.2f} ms/requête")
+
+    local_only = [ResultCache(None, args.local_size) for _ in range(args.workers)]
+    cascades, ms = replay(queries, local_only)
+    print(f"{'niveau 1 seul':<16}: {cascades:>5} cascades, {ms:>7.2f} ms/requête ({tier_rates(local_only)})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'result_cache.db')
+        shared = [ResultCache(SQLiteResultStore(path), args.local_size) for _ in range(args.workers)]
+        cascades, ms = replay(queries, shared)
+        print(f"{'niveaux 1 + 2':<16}: {cascades:>5} cascades, {ms:>7.2f} ms/requête ({tier_rates(shared)})")
+        local_us, shared_us = access_costs(SQLiteResultStore(path))
+        print(f"accès : niveau 1 {local_us:.1f} µs, niveau 2 (SQLite) {shared_us:.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Rejeu d'un journal de requêtes sans correction orthographique, avec la
+correction sans garde (vocabulaire des questions seul, ancien comportement) et
+avec la correction de chatbot.spelling (mots valides laissés tels quels) :
+répartition des étapes de la cascade qui répondent, et nombre de requêtes qui
+passent d'une étape tardive (Word2Vec, FastText, ensemble, KNN, BM25, aucune) à
+la première étape TF-IDF.
+
+Au niveau des mots, pour les deux correcteurs : part des fautes de frappe
+synthétiques ramenées au mot d'origine (le gain), et taux de fausses
+corrections, c'est-à-dire la part de mots valides absents des questions (mots
+des réponses de la base) qui sont réécrits.
+
+Le journal est lu dans le stockage des sessions (data/chat_sessions.db) et dans
+data/new_questions.csv ; s'il est vide, ou avec --synthetic, des questions de la
+base reçoivent une faute de frappe (suppression, insertion, substitution ou
+inversion) dans un de leurs mots, et l'exactitude est mesurée par rapport à la
+réponse de la question d'origine.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_spelling [--synthetic] [--queries 500] [--words 2000]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import random
+import time
+import pandas as pd
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot import chatbot_logic
+    from chatbot.chatbot_logic import get_response
+    from chatbot.chat_store import ChatStore, CHAT_DB
+    from chatbot.config import shortcuts, spelling_max_edit_distance
+    from chatbot.data_processing import questions, responses
+    from chatbot.spelling import SpellCorrector, WORD_RE, spell_corrector
+
+STAGES = ['tfidf', 'word2vec', 'fasttext', 'ensemble', 'knn', 'index_search', 'no_match']
+LETTERS = 'abcdefghijklmnopqrstuvwxyzéèà'
+
+
+def logged_queries(limit):
+    queries = []
+    if os.path.exists(CHAT_DB):
+        store = ChatStore()
+        for summary in store.list_sessions(limit=100000)[0]:
+            queries.extend(m["user"] for m in store.iter_messages(summary["id"]) if m["user"])
+    if os.path.exists('data/new_questions.csv'):
+        queries.extend(pd.read_csv('data/new_questions.csv', encoding='utf-8')['question'].dropna().astype(str))
+    queries = [q for q in queries if not q.startswith('/')]
+    return [(q, None) for q in queries[:limit]]
+
+
+def add_typo(word, rng):
+    i = rng.randrange(len(word))
+    kind = rng.choice(['delete', 'insert', 'replace', 'swap'])
+    if kind == 'delete':
+        return word[:i] + word[i + 1:]
+    if kind == 'insert':
+        return word[:i] + rng.choice(LETTERS) + word[i:]
+    if kind == 'replace':
+        return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+    i = min(i, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def synthetic_queries(count, seed=3):
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(questions)), len(questions)):
+        words = questions[i].split()
+        long_words = [j for j, w in enumerate(words) if len(w) >= 6 and w.isalpha()]
+        if not long_words:
+            continue
+        j = rng.choice(long_words)
+        words[j] = add_typo(words[j], rng)
+        queries.append((' '.join(words), i))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def unguarded_corrector():
+    """Correcteur sur le seul vocabulaire des questions et des raccourcis, sans mots valides protégés."""
+    corrector = SpellCorrector(spelling_max_edit_distance)
+    corrector.add_text(questions)
+    corrector.add_text([command.lstrip('/').replace('_', ' ') for command in shortcuts])
+    corrector.add_text(shortcuts.values())
+    return corrector
+
+
+def typo_words(count, seed=5):
+    """Paires (mot avec une faute, mot d'origine) tirées des mots longs des questions."""
+    rng = random.Random(seed)
+    words = sorted({w for q in questions for w in WORD_RE.findall(q.lower()) if len(w) >= 6})
+    return [(add_typo(word, rng), word) for word in rng.sample(words, min(count, len(words)))]
+
+
+def valid_words(corrector, count, seed=5):
+    """Mots des réponses absents du vocabulaire de correction : valides, mais inconnus des questions."""
+    known = {w for q in questions for w in WORD_RE.findall(q.lower())}
+    words = sorted({w for r in responses for w in WORD_RE.findall(str(r).lower())
+                    if len(w) >= corrector.min_word_length} - known)
+    return random.Random(seed).sample(words, min(count, len(words)))
+
+
+def word_level(corrector, typos, valid):
+    restored = sum(corrector.correct_word(typo) == word for typo, word in typos)
+    rewritten = sum(corrector.correct_word(word) != word for word in valid)
+    return restored / len(typos), rewritten / len(valid)
+
+
+def replay(queries, corrector, enabled=True):
+    chatbot_logic.spell_corrector = corrector
+    corrector.enabled = enabled
+    methods, correct, start = [], 0, time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query, target in queries:
+            response = get_response(query)
+            methods.append(response['method'])
+            correct += target is not None and response['answer'] == responses[target]
+    return methods, correct, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', action='store_true')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--words', type=int, default=2000)
+    args = parser.parse_args()
+
+    queries = [] if args.synthetic else logged_queries(args.queries)
+    source = 'journal'
+    if not queries:
+        queries, source = synthetic_queries(args.queries), 'synthétique'
+    print(f"{len(queries)} requêtes ({source}), vocabulaire {spell_corrector.stats()['vocabulary']} mots")
+
+    unguarded = unguarded_corrector()
+    before, correct_before, ms_before = replay(queries, spell_corrector, enabled=False)
+    loose, correct_loose, ms_loose = replay(queries, unguarded)
+    after, correct_after, ms_after = replay(queries, spell_corrector)
+    counts = [collections.Counter(methods) for methods in (before, loose, after)]
+
+    print(f"{'étape':<13} {'sans':>6} {'sans garde':>11} {'avec garde':>11}")
+    for stage in STAGES:
+        print(f"{stage:<13} {counts[0][stage]:>6} {counts[1][stage]:>11} {counts[2][stage]:>11}")
+    for label, methods in (("sans garde", loose), ("avec garde", after)):
+        moved = sum(b != 'tfidf' and a == 'tfidf' for b, a in zip(before, methods))
+        lost = sum(b == 'tfidf' and a != 'tfidf' for b, a in zip(before, methods))
+        print(f"{label} : passées d'une étape tardive à TF-IDF {moved} ; sorties de TF-IDF {lost}")
+    print(f"Latence moyenne : {ms_before:.2f} ms sans correction, {ms_loose:.2f} ms sans garde, "
+          f"{ms_after:.2f} ms avec garde")
+    if source == 'synthétique':
+        print(f"Exactitude : {correct_before / len(queries):.1%} sans correction, "
+              f"{correct_loose / len(queries):.1%} sans garde, {correct_after / len(queries):.1%} avec garde")
+
+    typos, valid = typo_words(args.words), valid_words(spell_corrector, args.words)
+    print(f"Mots : {len(typos)} fautes de frappe, {len(valid)} mots valides absents des questions")
+    for label, corrector in (("sans garde", unguarded), ("avec garde", spell_corrector)):
+        restored, false_rate = word_level(corrector, typos, valid)
+        print(f"{label} : fautes corrigées {restored:.1%}, fausses corrections {false_rate:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Matrice processus serveur x threads BLAS (chatbot.runtime) sur les calculs d'une requête.
+
+Le parent exporte dans un répertoire temporaire les matrices servies (TF-IDF,
+Word2Vec, FastText), le classifieur KNN et --queries questions encodées, puis,
+pour chaque combinaison de --workers et --threads, lance autant de processus
+que de workers. Chaque processus limite BLAS/OpenMP au nombre de threads
+demandé (variables d'environnement et threadpoolctl, comme chatbot.runtime),
+puis enchaîne pendant --duration secondes les calculs numériques de la cascade
+pour une requête : produit TF-IDF, KNN (predict et kneighbors, force brute
+cosinus) et produits Word2Vec/FastText, avec request_threads threads de requêtes.
+Le rapport donne le débit total et les latences p50/p99 par combinaison, et la
+meilleure combinaison (débit maximal à p99 au plus 1,5 fois le meilleur p99).
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_threads [--workers 1,2,4] [--threads 1,2,4] [--duration 10]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import scipy.sparse as sp
+
+
+def export(directory, count):
+    with contextlib.redirect_stdout(io.StringIO()):
+        from chatbot.data_processing import (questions, preprocess_texts, vectorizer, document_vector, word2vec_model,
+                                             fasttext_model)
+        from chatbot.models import knn_classifier
+        from chatbot.retrieval import partitioned_index
+    scope = partitioned_index.global_scope
+    rng = np.random.default_rng(0)
+    processed = preprocess_texts([questions[int(i)] for i in rng.choice(len(questions), count)])
+    sp.save_npz(os.path.join(directory, 'kb_tfidf.npz'), scope["tfidf"].tocsr())
+    sp.save_npz(os.path.join(directory, 'q_tfidf.npz'), vectorizer.transform(processed).tocsr())
+    np.savez(os.path.join(directory, 'dense.npz'), kb_w2v=scope["word2vec"], kb_ft=scope["fasttext"],
+             q_w2v=np.array([document_vector(p.split(), word2vec_model) for p in processed]),
+             q_ft=np.array([document_vector(p.split(), fasttext_model) for p in processed]))
+    with open(os.path.join(directory, 'knn.pkl'), 'wb') as f:
+        pickle.dump(knn_classifier, f)
+
+
+def child(directory, workers, threads, duration):
+    from chatbot.runtime import RuntimeConfig
+    config = RuntimeConfig(server_workers=workers, blas_threads=threads)
+    config.apply()
+    kb_tfidf = sp.load_npz(os.path.join(directory, 'kb_tfidf.npz'))
+    q_tfidf = sp.load_npz(os.path.join(directory, 'q_tfidf.npz'))
+    dense = np.load(os.path.join(directory, 'dense.npz'))
+    with open(os.path.join(directory, 'knn.pkl'), 'rb') as f:
+        knn = pickle.load(f)
+
+    def request(i):
+        i %= q_tfidf.shape[0]
+        query = q_tfidf[i]
+        (query @ kb_tfidf.T).toarray().argmax()
+        query_dense = query.toarray()
+        knn.predict(query_dense)
+        knn.kneighbors(query_dense, n_neighbors=1)
+        (dense["kb_w2v"] @ dense["q_w2v"][i]).argmax()
+        (dense["kb_ft"] @ dense["q_ft"][i]).argmax()
+
+    request(0)  # premier appel (initialisations) hors mesure
+    print("ready", flush=True)
+    sys.stdin.readline()
+    latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def loop(offset):
+        i = offset
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            request(i)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            i += config.request_threads
+
+    pool = [threading.Thread(target=loop, args=(t,)) for t in range(config.request_threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    print(json.dumps({"latencies": latencies, "request_threads": config.request_threads}), flush=True)
+
+
+def run(directory, workers, threads, duration):
+    env = dict(os.environ, **{name: str(threads) for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                                                              'MKL_NUM_THREADS')})
+    command = [sys.executable, '-m', 'benchmarks.bench_threads', '--child', directory,
+               '--workers', str(workers), '--threads', str(threads), '--duration', str(duration)]
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True, env=env) for _ in range(workers)]
+    for process in processes:
+        while process.stdout.readline().strip() != "ready":
+            pass
+    for process in processes:
+        process.stdin.write("go\n")
+        process.stdin.flush()
+    latencies = []
+    for process in processes:
+        result = json.loads(process.stdout.readline())
+        latencies.extend(result["latencies"])
+        process.wait()
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / duration, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', default='1,2,4')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--child')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, int(args.workers), int(args.threads), args.duration)
+        return
+
+    from chatbot.runtime import runtime
+    print(f"cœurs disponibles : {runtime.cores} (quota cgroup : {runtime.stats()['cgroup_limit']})")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        export(directory, args.queries)
+        for workers in [int(w) for w in args.workers.split(',')]:
+            for threads in [int(t) for t in args.threads.split(',')]:
+                throughput, p50, p99 = run(directory, workers, threads, args.duration)
+                results[(workers, threads)] = throughput, p99
+                print(f"workers {workers} x threads BLAS {threads} : {throughput:>7.1f} req/s, "
+                      f"p50 {p50:>6.2f} ms, p99 {p99:>6.2f} ms")
+    best_p99 = min(p99 for _, p99 in results.values())
+    workers, threads = max((key for key, (_, p99) in results.items() if p99 <= 1.5 * best_p99),
+                           key=lambda key: results[key][0])
+    print(f"meilleure combinaison : {workers} workers x {threads} threads BLAS "
+          f"(CHATBOT_SERVER_WORKERS={workers} CHATBOT_BLAS_THREADS={threads})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Top-k multi-candidats (PartitionedIndex.top_matches) contre l'argmax d'origine.
+
+Sur des questions de la base dégradées (un mot sur trois supprimé), pour chaque
+méthode (TF-IDF creux, Word2Vec et FastText denses), recherche globale :
+- argmax : produit complet puis argmax, comme avant ;
+- top-k : top_matches avec k lignes par requête (argpartition / top-k creux).
+Le rapport donne la latence par requête, l'accord du premier résultat avec
+l'argmax (même ligne et même similarité) et la part des requêtes ayant une
+autre réponse à moins de --margin du meilleur score (quasi-égalité), puis la
+part des réponses de get_response accompagnées d'alternatives.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_topk [--queries 500] [--k 9]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+import numpy as np
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.chatbot_logic import get_response
+    from chatbot.data_processing import questions, preprocess_text, vectorizer, word2vec_model, fasttext_model, document_vector
+    from chatbot.retrieval import partitioned_index, merge_by_answer, _similarities
+    from sklearn.preprocessing import normalize
+
+
+def make_queries(count, seed=13):
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(questions)), min(count, len(questions))):
+        words = questions[i].split()
+        queries.append(' '.join(w for j, w in enumerate(words) if j % 3 != 1))
+    return queries
+
+
+def argmax_matches(name, queries):
+    # Ancien PartitionedIndex.best_matches, recherche globale
+    queries = normalize(queries)
+    rows, sims = [], []
+    for scope in partitioned_index._scopes(None):
+        scope_sims = _similarities(queries, scope[name])
+        best = scope_sims.argmax(axis=1)
+        rows.append(scope["rows"][best])
+        sims.append(scope_sims[np.arange(len(best)), best])
+    return rows[0], sims[0]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=9)
+    parser.add_argument('--margin', type=float, default=0.1)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    processed = [preprocess_text(q) for q in queries]
+    inputs = {
+        "tfidf": vectorizer.transform(processed),
+        "word2vec": np.array([document_vector(p.split(), word2vec_model) for p in processed]),
+        "fasttext": np.array([document_vector(p.split(), fasttext_model) for p in processed]),
+    }
+    print(f"{len(queries)} requêtes, k={args.k}, marge {args.margin}")
+    for name, matrix in inputs.items():
+        # Une requête à la fois, comme iter_response
+        argmax_s, argmax_results = timed(lambda: [argmax_matches(name, matrix[i:i + 1]) for i in range(len(queries))])
+        topk_s, topk_results = timed(lambda: [partitioned_index.top_matches(name, matrix[i:i + 1], [None], args.k)
+                                              for i in range(len(queries))])
+        same = np.mean([old_rows[0] == rows[0, 0] and np.isclose(old_sims[0], sims[0, 0])
+                        for (old_rows, old_sims), (rows, sims) in zip(argmax_results, topk_results)])
+        near_ties = np.mean([len([s for _, s, _ in merge_by_answer({name: (rows[0], sims[0])})
+                                  if s >= sims[0, 0] - args.margin]) > 1 for rows, sims in topk_results])
+        print(f"{name:<9}: argmax {argmax_s / len(queries) * 1000:.3f} ms, top-{args.k} "
+              f"{topk_s / len(queries) * 1000:.3f} ms par requête, accord top-1 {same:.1%}, "
+              f"quasi-égalités {near_ties:.1%}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [get_response(q) for q in queries]
+    with_alternatives = [r for r in results if r.get("alternatives")]
+    print(f"get_response : {len(with_alternatives) / len(results):.1%} des réponses avec alternatives "
+          f"({np.mean([len(r['alternatives']) for r in with_alternatives]) if with_alternatives else 0:.1f} en moyenne)")
+
+
+if __name__ == '__main__':
+    main()
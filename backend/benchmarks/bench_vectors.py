@@ -0,0 +1,122 @@
+"""
+Rapport de fidélité des exports d'embeddings (chatbot.serving_vectors).
+
+Pour Word2Vec et FastText, compare le modèle gensim complet aux exports float32
+et int8 :
+- accord top-1 : la question de la base la plus proche (cosinus des vecteurs de
+  document) est-elle la même qu'avec le modèle complet ? Mesuré sur les
+  questions de la base et sur des questions avec une faute de frappe (mots hors
+  vocabulaire, reconstruits par n-grammes pour FastText) ;
+- exactitude sur les questions avec faute : la question trouvée a les mêmes
+  jetons que la question d'origine (les buckets FastText jamais entraînés, bruit
+  d'initialisation dans le modèle complet, sont absents des exports) ;
+- temps de chargement et RSS d'un processus neuf après chargement ;
+- taille sur disque.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_vectors [--queries 1000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import numpy as np
+from gensim.models import Word2Vec, FastText
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from chatbot.data_processing import questions, preprocess_text, word2vec_model_path, fasttext_model_path
+    from chatbot.serving_vectors import export_vectors, export_dir, load_serving_model, QUANTIZE_MODES
+    from benchmarks.bench_spelling import add_typo
+
+MODELS = {'word2vec': (word2vec_model_path, Word2Vec), 'fasttext': (fasttext_model_path, FastText)}
+
+# Exécuté dans un processus neuf pour mesurer le chargement seul
+LOAD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+name, path, mode = sys.argv[1:4]
+if mode == 'full':
+    from gensim.models import Word2Vec, FastText
+    model = (Word2Vec if name == 'word2vec' else FastText).load(path)
+else:
+    from chatbot.serving_vectors import load_serving_model
+    model = load_serving_model(name, path, mode)
+elapsed = time.perf_counter() - start
+rss = next(int(l.split()[1]) for l in open('/proc/self/status') if l.startswith('VmRSS'))
+print(json.dumps({"load_s": elapsed, "rss_mib": rss / 1024}))
+"""
+
+
+def load_figures(name, path, mode):
+    out = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, name, path, mode],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def disk_size(name, path, mode):
+    if mode == 'full':
+        files = [f for f in os.listdir(os.path.dirname(path)) if f.startswith(os.path.basename(path))]
+        return sum(os.path.getsize(os.path.join(os.path.dirname(path), f)) for f in files)
+    out_dir = export_dir(name, mode)
+    return sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+
+
+def document_vectors(wv, vector_size, token_lists):
+    vectors = np.zeros((len(token_lists), vector_size), dtype=np.float32)
+    for i, tokens in enumerate(token_lists):
+        word_vectors = [wv[t] for t in tokens if t in wv]
+        if word_vectors:
+            vectors[i] = np.mean(word_vectors, axis=0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top1(query_vectors, kb_vectors):
+    return (query_vectors @ kb_vectors.T).argmax(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    kb_tokens = [preprocess_text(q).split() for q in questions]
+    sample = rng.sample(range(len(questions)), min(args.queries, len(questions)))
+    query_sets = {
+        'base': [kb_tokens[i] for i in sample],
+        'fautes': [preprocess_text(' '.join(add_typo(w, rng) if len(w) >= 6 else w for w in questions[i].split())).split()
+                   for i in sample]
+    }
+
+    print(f"{'modèle':<9} {'mode':<8} {'accord base':>11} {'accord fautes':>13} {'exact. fautes':>13} "
+          f"{'charg. (s)':>10} {'RSS (Mio)':>10} {'disque (Mio)':>12}")
+    for name, (path, model_class) in MODELS.items():
+        full = model_class.load(path)
+        reference_kb = document_vectors(full.wv, full.vector_size, kb_tokens)
+        reference = {k: top1(document_vectors(full.wv, full.vector_size, tokens), reference_kb)
+                     for k, tokens in query_sets.items()}
+        for mode in ('full',) + QUANTIZE_MODES:
+            if mode == 'full':
+                found = reference
+            else:
+                export_vectors(full, path, name, mode)
+                wv = load_serving_model(name, path, mode).wv
+                kb_vectors = document_vectors(wv, wv.vector_size, kb_tokens)
+                found = {k: top1(document_vectors(wv, wv.vector_size, tokens), kb_vectors)
+                         for k, tokens in query_sets.items()}
+            agreement = {k: np.mean(found[k] == reference[k]) for k in query_sets}
+            accuracy = np.mean([kb_tokens[j] == kb_tokens[i] for j, i in zip(found['fautes'], sample)])
+            figures = load_figures(name, path, mode)
+            print(f"{name:<9} {mode:<8} {agreement['base']:>11.1%} {agreement['fautes']:>13.1%} {accuracy:>13.1%} "
+                  f"{figures['load_s']:>10.3f} {figures['rss_mib']:>10.0f} "
+                  f"{disk_size(name, path, mode) / 1024 / 1024:>12.1f}")
+        del full
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Rejeu de trafic et génération de charge sur /api/chat.
+
+Les messages utilisateurs horodatés sont extraits des sessions de chat
+(data/chat_sessions.db, ou l'ancien data/chat_sessions.csv) et de
+data/new_questions.csv, puis renvoyés à l'application :
+- en processus (client de test Flask ; les sessions sont écrites dans une base
+  temporaire et rien n'est ajouté à new_questions.csv), ou en HTTP (--url) vers
+  une instance démarrée à part ;
+- en boucle ouverte (par défaut) : chaque requête part à son horodatage d'origine
+  divisé par --speed, que les précédentes aient répondu ou non ; la latence est
+  mesurée depuis l'instant prévu, attente comprise ;
+- en boucle fermée (--closed) : --concurrency clients enchaînent les requêtes
+  sans attendre.
+
+Rapport : débit, latences p50/p90/p99/max, erreurs par code HTTP et répartition
+des méthodes de réponse (tfidf, word2vec, ..., shortcut).
+
+Usage (depuis backend/) :
+    python -m benchmarks.replay [--source auto|chat|new_questions|all] [--speed 10]
+        [--concurrency 8] [--closed] [--url http://localhost:5000] [--limit 1000]
+        [--synthetic 500 --rate 20] [--json rapport.json]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from chatbot.chat_store import ChatStore, CHAT_DB, LEGACY_CHAT_FILE
+
+NEW_QUESTIONS_FILE = 'data/new_questions.csv'
+
+
+def chat_messages():
+    """(horodatage, message, session) des sessions de chat."""
+    if os.path.exists(CHAT_DB):
+        conn = ChatStore(CHAT_DB)._conn()
+        rows = conn.execute("SELECT timestamp, user_message, session_id FROM messages ORDER BY id").fetchall()
+        return [(ts, text, session) for ts, text, session in rows if text]
+    if os.path.exists(LEGACY_CHAT_FILE):
+        df = pd.read_csv(LEGACY_CHAT_FILE, encoding='utf-8', usecols=['timestamp', 'user_message', 'session_id'])
+        df = df.dropna(subset=['user_message'])
+        return list(zip(df['timestamp'], df['user_message'].astype(str), df['session_id']))
+    return []
+
+
+def new_question_messages():
+    if not os.path.exists(NEW_QUESTIONS_FILE):
+        return []
+    df = pd.read_csv(NEW_QUESTIONS_FILE, encoding='utf-8').dropna(subset=['question'])
+    return [(ts, text, None) for ts, text in zip(df['timestamp'], df['question'].astype(str))]
+
+
+def synthetic_messages(count, rate, seed=1):
+    """Questions de la base (tronquées) avec des arrivées de Poisson à rate requêtes/s."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from chatbot.data_processing import questions
+    rng = random.Random(seed)
+    start, t, messages = pd.Timestamp('2025-09-01 08:00:00'), 0.0, []
+    for _ in range(count):
+        t += rng.expovariate(rate)
+        words = questions[rng.randrange(len(questions))].split()
+        text = ' '.join(words[:rng.randint(min(2, len(words)), len(words))])
+        messages.append(((start + pd.Timedelta(seconds=t)).isoformat(), text, None))
+    return messages
+
+
+def logged_messages(source):
+    if source == 'auto':
+        return chat_messages() or new_question_messages()
+    if source == 'chat':
+        return chat_messages()
+    if source == 'new_questions':
+        return new_question_messages()
+    return chat_messages() + new_question_messages()
+
+
+def build_trace(messages, limit=None, max_gap=5.0):
+    """
+    Trace triée par horodatage : liste de (décalage en secondes, message, session)
+
+    Les silences de plus de max_gap secondes (nuits, week-ends) sont raccourcis à max_gap.
+    """
+    frame = pd.DataFrame(messages, columns=['timestamp', 'message', 'session'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], errors='coerce', format='ISO8601')
+    frame = frame.dropna(subset=['timestamp']).sort_values('timestamp', kind='stable')
+    if limit:
+        frame = frame.head(limit)
+    gaps = frame['timestamp'].diff().dt.total_seconds().fillna(0).clip(upper=max_gap)
+    offsets = gaps.cumsum().tolist()
+    return list(zip(offsets, frame['message'].tolist(), frame['session'].tolist()))
+
+
+class InProcessTarget:
+    """Application chargée dans ce processus, appelée par le client de test Flask."""
+
+    def __init__(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as app_module
+        self._tmp = tempfile.TemporaryDirectory()
+        # Le rejeu ne doit ni toucher aux vraies sessions ni alimenter l'auto-apprentissage
+        app_module.chat_store = ChatStore(os.path.join(self._tmp.name, 'replay.db'), legacy_csv='')
+        app_module.save_new_question = lambda *args, **kwargs: None
+        self.app = app_module.app
+        self._local = threading.local()
+
+    def post(self, payload):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = client.post('/api/chat', json=payload)
+        return res.status_code, res.get_json(silent=True)
+
+
+class HttpTarget:
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/') + '/api/chat'
+        self.timeout = timeout
+
+    def post(self, payload):
+        req = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={"Content-Type": "application/json"}, method='POST')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as res:
+                return res.status, json.loads(res.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = collections.Counter()
+        self.methods = collections.Counter()
+        self.lags = []
+
+    def record(self, latency, status, body, lag=0.0):
+        method = ((body or {}).get('response') or {}).get('method') if status == 200 else None
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            self.lags.append(lag)
+            if method:
+                self.methods[method] += 1
+
+
+def send(target, recorder, message, session, sessions, scheduled=None):
+    # Les sessions d'origine sont rejouées comme des sessions distinctes de la cible
+    payload = {"message": message, "session_id": sessions.get(session)}
+    start = time.perf_counter()
+    try:
+        status, body = target.post(payload)
+    except Exception:
+        status, body = 'exception', None
+    end = time.perf_counter()
+    if session is not None and body and body.get('session_id'):
+        sessions[session] = body['session_id']
+    if scheduled is None:
+        recorder.record(end - start, status, body)
+    else:
+        recorder.record(end - scheduled, status, body, lag=start - scheduled)
+
+
+def run_open_loop(target, trace, speed, concurrency, recorder):
+    sessions = {}
+    origin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, message, session in trace:
+            scheduled = origin + offset / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, target, recorder, message, session, sessions, scheduled)
+    return time.perf_counter() - origin
+
+
+def run_closed_loop(target, trace, concurrency, recorder):
+    sessions = {}
+    pending = iter(trace)
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            _, message, session = item
+            send(target, recorder, message, session, sessions)
+
+    origin = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - origin
+
+
+def build_report(recorder, elapsed, args, trace):
+    latencies = np.array(recorder.latencies) * 1000
+    total = len(latencies)
+    errors = sum(count for status, count in recorder.statuses.items() if status != 200)
+    return {
+        "mode": "closed" if args.closed else "open",
+        "target": args.url or "in-process",
+        "speed": None if args.closed else args.speed,
+        "concurrency": args.concurrency,
+        "requests": total,
+        "trace_seconds": trace[-1][0] if trace else 0.0,
+        "elapsed_seconds": elapsed,
+        "offered_rps": None if args.closed or not trace or not trace[-1][0] else total / (trace[-1][0] / args.speed),
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max())
+        } if total else None,
+        "max_dispatch_lag_ms": float(max(recorder.lags) * 1000) if recorder.lags else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "statuses": {str(status): count for status, count in recorder.statuses.items()},
+        "methods": dict(recorder.methods.most_common())
+    }
+
+
+def print_report(report):
+    print(f"{report['requests']} requêtes en {report['elapsed_seconds']:.1f} s "
+          f"(boucle {'fermée' if report['mode'] == 'closed' else 'ouverte'}, cible {report['target']}, "
+          f"concurrence {report['concurrency']}" + (f", vitesse x{report['speed']:g}" if report['speed'] else "") + ")")
+    print(f"Débit : {report['throughput_rps']:.1f} req/s"
+          + (f" (offert {report['offered_rps']:.1f} req/s)" if report['offered_rps'] else ""))
+    if report['latency_ms']:
+        latency = report['latency_ms']
+        print(f"Latence (ms) : p50 {latency['p50']:.1f}, p90 {latency['p90']:.1f}, "
+              f"p99 {latency['p99']:.1f}, max {latency['max']:.1f}")
+    if report['mode'] == 'open':
+        print(f"Retard maximal de départ : {report['max_dispatch_lag_ms']:.1f} ms")
+    print(f"Erreurs : {report['error_rate']:.2%} {report['statuses']}")
+    print("Méthodes :")
+    for method, count in report['methods'].items():
+        print(f"  {method:<14} {count:>6} {count / report['requests']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', choices=['auto', 'chat', 'new_questions', 'all'], default='auto')
+    parser.add_argument('--synthetic', type=int, default=0, help="nombre de requêtes synthétiques (sans journal)")
+    parser.add_argument('--rate', type=float, default=10.0, help="requêtes/s de la trace synthétique")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--max-gap', type=float, default=5.0, help="silence maximal conservé (s)")
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--closed', action='store_true')
+    parser.add_argument('--url')
+    parser.add_argument('--json', help="fichier où écrire le rapport")
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.synthetic, args.rate) if args.synthetic else logged_messages(args.source)
+    trace = build_trace(messages, args.limit, args.max_gap)
+    if not trace:
+        print("Aucun message à rejouer (utiliser --synthetic N sans journal).")
+        return
+
+    target = HttpTarget(args.url) if args.url else InProcessTarget()
+    recorder = Recorder()
+    if args.closed:
+        elapsed = run_closed_loop(target, trace, args.concurrency, recorder)
+    else:
+        elapsed = run_open_loop(target, trace, args.speed, args.concurrency, recorder)
+    report = build_report(recorder, elapsed, args, trace)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
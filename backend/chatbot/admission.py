@@ -0,0 +1,214 @@
+"""
+Module de contrôle d'admission devant l'inférence (/api/chat)
+
+- Débit : un seau à jetons par session et un par adresse IP (rate jetons par
+  seconde, au plus burst). Les seaux sont gardés dans une table LRU bornée à
+  max_keys entrées ; un seau évincé repart plein, ce qui ne fait qu'oublier un
+  client inactif.
+- Concurrence : au plus max_concurrent requêtes d'inférence à la fois (par
+  défaut une par cascade, ou un lot complet par cascade avec le micro-batching :
+  une place par requête, pas par lot, sinon les lots plafonnent au nombre de
+  cœurs). Les requêtes suivantes attendent une place dans la limite de
+  latency_budget_ms ; une requête dont l'attente estimée (file x durée moyenne
+  d'une requête / places) dépasse ce budget, ou qui arrive quand max_queue
+  requêtes attendent déjà, est refusée tout de suite plutôt que de faire
+  attendre tout le monde.
+- Priorité : les chemins sans modèle (raccourcis, mots-clés) ne prennent pas
+  de place et ne font jamais la queue.
+
+Les refus lèvent AdmissionRejected : 429 (débit) ou 503 (surcharge), avec le
+délai conseillé pour Retry-After.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from chatbot.config import (admission_enabled, admission_session_rate, admission_session_burst, admission_ip_rate,
+                            admission_ip_burst, admission_max_concurrent, admission_max_queue,
+                            admission_latency_budget_ms)
+from chatbot.runtime import runtime
+
+# Poids de la dernière mesure dans la durée moyenne d'une cascade
+SERVICE_TIME_ALPHA = 0.1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Seaux à jetons indexés par clé, dans une table LRU de taille bornée."""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # clé -> [jetons, instant de la dernière mise à jour]
+        self.evicted = 0
+
+    def take(self, key, now, cost=1.0):
+        """
+        Retire cost jetons du seau de key s'il en a assez
+
+        Returns:
+            float: 0 si la requête passe, sinon le délai (s) avant d'avoir assez de jetons
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate if self.rate > 0 else math.inf
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    def __init__(self, enabled=True, session_rate=2.0, session_burst=10, ip_rate=20.0, ip_burst=60,
+                 max_concurrent=4, max_queue=64, latency_budget_ms=2000, max_keys=10000):
+        self.enabled = enabled
+        self.sessions = TokenBuckets(session_rate, session_burst, max_keys)
+        self.ips = TokenBuckets(ip_rate, ip_burst, max_keys)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget_ms / 1000
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = None  # durée moyenne (s) d'une cascade, None avant la première
+        self.admitted = 0
+        self.cheap = 0
+        self.rejected_session = 0
+        self.rejected_ip = 0
+        self.shed_queue_full = 0
+        self.shed_latency = 0
+        self.max_waiting = 0
+        self.wait_total = 0.0
+
+    def check_rate(self, session_id, ip):
+        """
+        Débite les seaux de la session (si connue) et de l'adresse IP
+
+        Raises:
+            AdmissionRejected: 429 si l'un des deux seaux est vide
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if session_id is not None:
+                wait = self.sessions.take(str(session_id), now)
+                if wait:
+                    self.rejected_session += 1
+                    raise AdmissionRejected(429, "Trop de requêtes pour cette session.", wait)
+            wait = self.ips.take(ip, now)
+            if wait:
+                self.rejected_ip += 1
+                raise AdmissionRejected(429, "Trop de requêtes depuis cette adresse.", wait)
+
+    def record_cheap(self):
+        with self._lock:
+            self.cheap += 1
+
+    def _estimated_wait(self):
+        if self.service_time is None:
+            return 0.0
+        return (self.waiting + 1) * self.service_time / self.max_concurrent
+
+    def acquire(self):
+        """
+        Prend une place d'inférence, en attendant au plus le budget de latence
+
+        Raises:
+            AdmissionRejected: 503 si la file est pleine ou si l'attente dépasserait le budget
+        """
+        if not self.enabled:
+            return
+        start = time.monotonic()
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.shed_queue_full += 1
+                    raise AdmissionRejected(503, "Serveur surchargé, réessayez dans un instant.",
+                                            self._estimated_wait())
+                if self._estimated_wait() > self.latency_budget:
+                    self.shed_latency += 1
+                    raise AdmissionRejected(503, "Serveur surchargé, réessayez dans un instant.",
+                                            self._estimated_wait())
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+                deadline = start + self.latency_budget
+                try:
+                    while self.in_flight >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed_latency += 1
+                            raise AdmissionRejected(503, "Serveur surchargé, réessayez dans un instant.",
+                                                    self._estimated_wait())
+                        self._slots.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            self.wait_total += time.monotonic() - start
+
+    def release(self, service_time=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight -= 1
+            if service_time is not None:
+                self.service_time = service_time if self.service_time is None else (
+                    (1 - SERVICE_TIME_ALPHA) * self.service_time + SERVICE_TIME_ALPHA * service_time)
+            self._slots.notify()
+
+    @contextmanager
+    def inference_slot(self):
+        """Place d'inférence pour la durée du bloc (voir acquire)."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "max_concurrent": self.max_concurrent,
+                "admitted": self.admitted,
+                "cheap": self.cheap,
+                "rejected_session": self.rejected_session,
+                "rejected_ip": self.rejected_ip,
+                "shed_queue_full": self.shed_queue_full,
+                "shed_latency": self.shed_latency,
+                "avg_wait_ms": self.wait_total / self.admitted * 1000 if self.admitted else 0.0,
+                "avg_service_ms": self.service_time * 1000 if self.service_time is not None else None,
+                "tracked_sessions": len(self.sessions),
+                "tracked_ips": len(self.ips),
+                "evicted_buckets": self.sessions.evicted + self.ips.evicted
+            }
+
+
+admission = AdmissionController(admission_enabled, admission_session_rate, admission_session_burst, admission_ip_rate,
+                                admission_ip_burst, admission_max_concurrent or runtime.inference_slots,
+                                admission_max_queue, admission_latency_budget_ms)
@@ -0,0 +1,174 @@
+"""
+Module d'autocomplétion des questions
+
+Index de préfixes précalculé sur les questions de la base : chaque question
+normalisée (minuscules, sans accents ni ponctuation) produit une clé par début de
+mot, et les clés sont gardées triées dans une liste où un préfixe se cherche par
+dichotomie (bisect). Les suggestions sont classées par popularité de leur réponse
+dans l'historique des chats, sans aucun modèle.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+import numpy as np
+from chatbot.data_processing import kb, questions, responses, categories
+
+MIN_QUERY_CHARS = 2
+# Les suggestions commençant au début de la question passent avant la popularité
+START_BONUS = 1e12
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text)).strip()
+
+
+def _word_suffixes(text):
+    """Clés d'une question : le texte à partir de chaque début de mot."""
+    return [text[m.start():] for m in re.finditer(r'\S+', text)]
+
+
+class PrefixIndex:
+    def __init__(self, min_query_chars=MIN_QUERY_CHARS):
+        self.min_query_chars = min_query_chars
+        self._lock = threading.Lock()  # écrivains seulement
+        # Instantané publié d'un seul bloc à chaque ajout (suggest le lit une fois, sans verrou) :
+        # (clés triées, ligne de chaque clé, clé en début de question, réponse de chaque ligne,
+        # longueur de chaque ligne, popularité de chaque réponse)
+        self._snapshot = ([], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64),
+                          np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+        self._answer_codes = {}  # texte de réponse -> identifiant
+        self.queries = 0
+
+    def add(self, row_ids, texts, answer_ids, answer_texts):
+        """
+        Indexe des questions de la base
+
+        Args:
+            row_ids (array): Indices des lignes dans la base (croissants, à la suite des précédents)
+            texts (list): Questions
+            answer_ids (array): Identifiant de réponse de chaque ligne
+            answer_texts (list): Texte de la réponse de chaque ligne
+        """
+        new_keys, new_rows, new_starts, lengths = [], [], [], []
+        for row, text in zip(row_ids, texts):
+            normalized = normalize_text(text)
+            lengths.append(len(normalized))
+            for i, key in enumerate(_word_suffixes(normalized)):
+                new_keys.append(key)
+                new_rows.append(row)
+                new_starts.append(i == 0)
+        answer_ids = np.asarray(answer_ids, dtype=np.int64)
+        with self._lock:
+            old_keys, old_rows, old_starts, old_answers, old_lengths, popularity = self._snapshot
+            keys = old_keys + new_keys
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            key_rows = np.concatenate([old_rows, np.asarray(new_rows, dtype=np.int64)])[order]
+            key_starts = np.concatenate([old_starts, np.asarray(new_starts, dtype=bool)])[order]
+            row_answers = np.concatenate([old_answers, answer_ids])
+            row_lengths = np.concatenate([old_lengths, np.asarray(lengths, dtype=np.int64)])
+            for answer_id, answer in zip(answer_ids.tolist(), answer_texts):
+                self._answer_codes.setdefault(answer, answer_id)
+            if len(answer_ids) and answer_ids.max() >= len(popularity):
+                popularity = np.pad(popularity, (0, int(answer_ids.max()) + 1 - len(popularity)))
+            self._snapshot = ([keys[i] for i in order], key_rows, key_starts, row_answers, row_lengths, popularity)
+
+    def set_answer_counts(self, counts):
+        """Initialise la popularité depuis {texte de réponse: nombre de fois donnée}."""
+        with self._lock:
+            snapshot = self._snapshot
+            popularity = np.zeros_like(snapshot[5])
+            for answer, count in counts.items():
+                code = self._answer_codes.get(answer)
+                if code is not None:
+                    popularity[code] += count
+            self._snapshot = snapshot[:5] + (popularity,)
+
+    def record_answer(self, answer):
+        """Compte une réponse donnée par le chatbot."""
+        code = self._answer_codes.get(answer)
+        if code is not None:
+            with self._lock:
+                # Sur place : un compteur lu une frappe en retard ne change rien au classement
+                self._snapshot[5][code] += 1
+
+    def suggest(self, query, limit=8):
+        """
+        Questions de la base contenant un mot commençant par le texte saisi
+
+        Args:
+            query (str): Texte en cours de saisie
+            limit (int): Nombre maximal de suggestions
+
+        Returns:
+            list: Indices des lignes, les plus pertinentes d'abord
+        """
+        prefix = normalize_text(query)
+        if len(prefix) < self.min_query_chars:
+            return []
+        keys, key_rows, key_starts, row_answers, row_lengths, popularity = self._snapshot
+        self.queries += 1
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\U0010ffff', lo)
+        if lo == hi:
+            return []
+        rows = key_rows[lo:hi]
+        # Popularité entière puis longueur (questions courtes d'abord) comme départage
+        scores = key_starts[lo:hi] * START_BONUS + popularity[row_answers[rows]] - row_lengths[rows] / 1e4
+        # Marge pour les doublons (une question peut avoir plusieurs clés dans l'intervalle)
+        top = min(len(scores), limit * 4)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        suggestions, seen = [], set()
+        for row in rows[best].tolist():
+            if row in seen:
+                continue
+            seen.add(row)
+            suggestions.append(row)
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+    def stats(self):
+        keys, _, _, row_answers, _, _ = self._snapshot
+        return {
+            "keys": len(keys),
+            "questions": len(row_answers),
+            "queries": self.queries
+        }
+
+
+autocomplete_index = PrefixIndex()
+if kb is not None:
+    autocomplete_index.add(np.arange(len(kb)), kb.questions, np.asarray(kb.answer_ids), kb.responses.tolist())
+else:
+    autocomplete_index.add(np.arange(len(questions)), questions, np.arange(len(questions)), list(responses))
+
+
+def autocomplete_suggestions(query, limit=8):
+    """Suggestions prêtes à renvoyer au frontend : question, catégorie et URL."""
+    suggestions, seen = [], set()
+    for row in autocomplete_index.suggest(query, limit * 2):
+        question = questions[row]
+        if question in seen:
+            continue
+        seen.add(question)
+        suggestions.append({
+            "question": question,
+            "category": kb.categories[row] if kb is not None else categories[row],
+            "url": kb.urls[row] if kb is not None else None
+        })
+        if len(suggestions) == limit:
+            break
+    return suggestions
+
+
+def index_new_questions(start, stop):
+    autocomplete_index.add(np.arange(start, stop), [kb.questions[i] for i in range(start, stop)],
+                           np.asarray(kb.answer_ids[start:stop]), [kb.responses[i] for i in range(start, stop)])
+
+
+if kb is not None:
+    kb.add_listener(index_new_questions)
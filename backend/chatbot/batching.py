@@ -0,0 +1,84 @@
+"""
+Module de micro-batching des requêtes d'inférence
+
+Les requêtes concurrentes sont accumulées pendant au plus max_wait_ms (ou
+jusqu'à max_batch éléments), puis traitées en un seul appel vectorisé ; chaque
+appelant reçoit ensuite sa propre réponse.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceScheduler:
+    def __init__(self, batch_fn, max_batch=16, max_wait_ms=5.0):
+        """
+        Args:
+            batch_fn (callable): Fonction liste d'entrées -> liste de résultats (même ordre)
+            max_batch (int): Taille maximale d'un lot
+            max_wait_ms (float): Attente maximale après la première requête d'un lot
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.queue_wait_total = 0.0
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Ajoute une entrée au prochain lot et attend son résultat."""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                print(f"Erreur lors du traitement d'un lot: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.queue_wait_total += sum(started - queued for _, _, queued in batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "avg_queue_wait_ms": 1000 * self.queue_wait_total / self.items if self.items else 0.0,
+                "queued": self._queue.qsize()
+            }
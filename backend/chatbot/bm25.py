@@ -0,0 +1,117 @@
+"""
+Module de recherche plein texte BM25 en mémoire
+
+Index inversé construit sur les jetons déjà racinisés par preprocess_text. Les
+listes de postings sont stockées dans des array('i') (identifiants de documents
+croissants et fréquences), sans objet Python par occurrence ; les ajouts sont
+incrémentaux.
+"""
+import math
+import threading
+from array import array
+import numpy as np
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # terme -> (array des doc ids, array des fréquences)
+        self._doc_len = array('i')
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, tokens):
+        """Indexe un document (liste de jetons) et renvoie son identifiant."""
+        with self._lock:
+            doc_id = len(self._doc_len)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('i'), array('i'))
+                postings[0].append(doc_id)
+                postings[1].append(tf)
+            self._doc_len.append(len(tokens))
+            self._total_len += len(tokens)
+            return doc_id
+
+    def add_documents(self, documents):
+        for tokens in documents:
+            self.add(tokens)
+
+    def search(self, tokens, k=1):
+        """
+        Renvoie les k meilleurs documents pour la requête
+
+        Les termes sont traités par borne supérieure décroissante (MaxScore) : dès
+        que le k-ième score dépasse la somme des bornes des termes restants, aucun
+        nouveau document ne peut entrer dans le top-k et les termes restants ne
+        sont plus évalués que pour les candidats encore atteignables, par recherche
+        dichotomique dans les postings au lieu d'un parcours complet.
+
+        Args:
+            tokens (list): Jetons racinisés de la requête
+            k (int): Nombre de résultats
+
+        Returns:
+            list: Couples (doc_id, score) triés par score décroissant
+        """
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avgdl = self._total_len / n_docs
+            doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+            norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+
+            terms = []
+            for term in set(tokens):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                df = len(postings[0])
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                # tf * (k1 + 1) / (tf + norm) < k1 + 1 : borne supérieure de la contribution
+                terms.append((idf * (self.k1 + 1), idf, postings))
+            if not terms:
+                return []
+            terms.sort(key=lambda t: t[0], reverse=True)
+            remaining_bound = sum(t[0] for t in terms)
+
+            scores = np.zeros(n_docs, dtype=np.float64)
+            candidates = None
+            for upper_bound, idf, (doc_ids, tfs) in terms:
+                ids = np.frombuffer(doc_ids, dtype=np.int32)
+                freqs = np.frombuffer(tfs, dtype=np.int32)
+                if candidates is None:
+                    scores[ids] += idf * freqs * (self.k1 + 1) / (freqs + norm[ids])
+                else:
+                    pos = np.searchsorted(ids, candidates)
+                    pos_clipped = np.minimum(pos, len(ids) - 1)
+                    hit = ids[pos_clipped] == candidates
+                    hit_docs = candidates[hit]
+                    hit_tfs = freqs[pos_clipped[hit]]
+                    scores[hit_docs] += idf * hit_tfs * (self.k1 + 1) / (hit_tfs + norm[hit_docs])
+                del ids, freqs
+                remaining_bound -= upper_bound
+                if candidates is None and remaining_bound > 0:
+                    threshold = _kth_largest(scores, k)
+                    if threshold > remaining_bound:
+                        candidates = np.flatnonzero(scores + remaining_bound >= threshold).astype(np.int32)
+            del doc_len
+
+        top = np.argpartition(-scores, min(k, n_docs) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def _kth_largest(scores, k):
+    if k >= len(scores):
+        return 0.0
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
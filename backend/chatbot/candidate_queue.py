@@ -0,0 +1,338 @@
+"""
+Module de la file des candidates à l'auto-apprentissage (SQLite)
+
+Une candidate est une question posée au chatbot, avec sa dernière réponse
+enregistrée et son nombre de retours positifs. La file est mise à jour à chaque
+réponse ou retour (save_new_question), au lieu de refusionner ratings.csv et
+new_questions.csv à chaque lecture. Chaque entrée porte une catégorie prédite,
+sa confiance et un score de doublon (similarité TF-IDF maximale avec les
+questions de la base), calculés par lots en arrière-plan ; la route des
+candidates n'est plus qu'une lecture indexée et paginée.
+
+Le score de doublon couvre les meta.kb_rows premières lignes de la base : les
+lignes ajoutées ensuite (intégration, même dans un autre processus) ne sont
+comparées qu'aux candidates déjà notées.
+"""
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from chatbot.data_processing import kb, preprocess_rows, preprocess_texts, processed_questions, vectorizer
+from chatbot.models import nb_classifier, knn_classifier
+
+CANDIDATES_DB = 'data/candidates.db'
+RATINGS_FILE = 'data/ratings.csv'
+NEW_QUESTIONS_FILE = 'data/new_questions.csv'
+# Mêmes seuils que check_for_duplicates et predict_category
+DUPLICATE_THRESHOLD = 0.9
+KNN_FALLBACK_CONFIDENCE = 0.6
+SCORE_BATCH_SIZE = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL UNIQUE,
+    answer TEXT,
+    positive_ratings INTEGER NOT NULL DEFAULT 0,
+    category TEXT,
+    confidence REAL,
+    duplicate_score REAL,
+    is_duplicate INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_candidates_ready ON candidates (id)
+    WHERE positive_ratings > 0 AND answer IS NOT NULL AND category IS NOT NULL AND is_duplicate = 0;
+CREATE INDEX IF NOT EXISTS idx_candidates_pending ON candidates (id) WHERE category IS NULL;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+READY_CONDITION = "positive_ratings > 0 AND answer IS NOT NULL AND category IS NOT NULL AND is_duplicate = 0"
+
+
+def predict_categories(processed):
+    """
+    Prédit la catégorie de questions prétraitées par lots
+
+    Naive Bayes (un seul predict_proba), puis KNN pour les questions dont la
+    probabilité est inférieure à KNN_FALLBACK_CONFIDENCE, si sa confiance est meilleure.
+
+    Returns:
+        tuple: (liste des catégories, tableau des confiances)
+    """
+    features = vectorizer.transform(processed)
+    proba = nb_classifier.predict_proba(features)
+    best = proba.argmax(axis=1)
+    categories = nb_classifier.classes_[best].astype(object)
+    confidences = proba[np.arange(len(best)), best]
+    low = np.flatnonzero(confidences < KNN_FALLBACK_CONFIDENCE)
+    if len(low) and knn_classifier is not None:
+        low_dense = features[low].toarray()
+        distances, _ = knn_classifier.kneighbors(low_dense, n_neighbors=1)
+        knn_confidences = 1.0 - distances[:, 0]
+        better = knn_confidences > confidences[low]
+        if better.any():
+            categories[low[better]] = knn_classifier.predict(low_dense[better])
+            confidences[low[better]] = knn_confidences[better]
+    return categories.tolist(), confidences
+
+
+class DuplicateIndex:
+    """Matrice TF-IDF (unigrammes et bigrammes) des questions de la base, étendue à chaque ajout."""
+
+    def __init__(self, processed):
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+        self.matrix = self.vectorizer.fit_transform(processed)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def extend(self, processed):
+        # Vocabulaire et IDF de l'ajustement initial : les nouveaux n-grammes sont ignorés
+        self.matrix = vstack([self.matrix, self.vectorizer.transform(processed)]).tocsr()
+
+    def max_similarity(self, processed, start=0):
+        """Similarité maximale de chaque question avec les lignes start: de la base."""
+        if start >= len(self):
+            return np.zeros(len(processed))
+        return cosine_similarity(self.vectorizer.transform(processed), self.matrix[start:]).max(axis=1)
+
+
+class CandidateQueue:
+    def __init__(self, path=CANDIDATES_DB, ratings_csv=RATINGS_FILE, new_questions_csv=NEW_QUESTIONS_FILE,
+                 duplicate_threshold=DUPLICATE_THRESHOLD, batch_size=SCORE_BATCH_SIZE):
+        self.path = path
+        self.ratings_csv = ratings_csv
+        self.new_questions_csv = new_questions_csv
+        self.duplicate_threshold = duplicate_threshold
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._open_lock = threading.Lock()
+        self._opened = False
+        self._score_lock = threading.Lock()  # notation et mise à jour des doublons
+        self._duplicates = None
+        self._wakeup = threading.Event()
+        self._worker = None
+        self.scored = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    def _conn(self):
+        # Une connexion par thread ; la base est créée (et les CSV importés) au premier accès
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._open_lock:
+                if not self._opened:
+                    conn.executescript(SCHEMA)
+                    self._import_csvs(conn)
+                    self._opened = True
+        return conn
+
+    def _import_csvs(self, conn):
+        """Amorce la file depuis ratings.csv et new_questions.csv (une seule fois)."""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+            return
+        answers, ratings = {}, {}
+        if os.path.exists(self.new_questions_csv):
+            for chunk in pd.read_csv(self.new_questions_csv, encoding='utf-8', usecols=['question', 'response'],
+                                     chunksize=50000):
+                chunk = chunk.dropna()
+                # Comme drop_duplicates(keep='last') : la dernière réponse l'emporte
+                answers.update(zip(chunk['question'].astype(str), chunk['response'].astype(str)))
+        if os.path.exists(self.ratings_csv):
+            for chunk in pd.read_csv(self.ratings_csv, encoding='utf-8', usecols=['question', 'rating'],
+                                     chunksize=50000):
+                positive = chunk.loc[chunk['rating'].astype(str) == 'True', 'question'].dropna().astype(str)
+                for question, count in positive.value_counts().items():
+                    ratings[question] = ratings.get(question, 0) + int(count)
+        now = pd.Timestamp.now().isoformat()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT INTO candidates (question, answer, positive_ratings, updated_at) VALUES (?, ?, ?, ?)",
+            [(q, answers.get(q), ratings.get(q, 0), now) for q in answers.keys() | ratings.keys()])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_imported', ?)",
+                     (str(len(answers.keys() | ratings.keys())),))
+        conn.execute("COMMIT")
+
+    def start(self):
+        """Ouvre la file (import initial des CSV) et note en arrière-plan les entrées en attente."""
+        self._conn()
+        self._schedule()
+
+    def record(self, question, answer=None, rating=None):
+        """
+        Prend en compte une réponse donnée à question et/ou un retour sur cette réponse
+
+        Args:
+            question (str): Question de l'utilisateur
+            answer (str|None): Réponse donnée (remplace la précédente)
+            rating (bool|None): Retour de l'utilisateur ; seuls les retours positifs comptent
+        """
+        if not question or (answer is None and rating is not True):
+            return
+        self._conn().execute(
+            "INSERT INTO candidates (question, answer, positive_ratings, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (question) DO UPDATE SET answer = COALESCE(excluded.answer, answer), "
+            "positive_ratings = positive_ratings + excluded.positive_ratings, updated_at = excluded.updated_at",
+            (str(question), answer, int(rating is True), pd.Timestamp.now().isoformat()))
+        self._schedule()
+
+    def remove(self, questions):
+        """Retire de la file les questions intégrées à la base."""
+        self._conn().executemany("DELETE FROM candidates WHERE question = ?", [(str(q),) for q in questions])
+
+    def _schedule(self):
+        # Notation en arrière-plan : les rafales d'ajouts sont traitées en un seul lot
+        if self._worker is None:
+            with self._open_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='candidate-queue', daemon=True)
+                    self._worker.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Erreur lors de la notation des candidates: {e}")
+
+    def _get_duplicates(self):
+        if self._duplicates is None:
+            self._duplicates = DuplicateIndex(processed_questions)
+            if kb is not None and len(kb) > len(self._duplicates):
+                self._duplicates.extend(preprocess_texts(kb.questions[i] for i in range(len(self._duplicates), len(kb))))
+        return self._duplicates
+
+    def _set_kb_rows(self, conn, rows):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('kb_rows', ?)", (str(rows),))
+
+    def _sync_kb(self, conn):
+        """Met à jour les scores de doublon des candidates notées avec les lignes ajoutées à la base."""
+        duplicates = self._get_duplicates()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'kb_rows'").fetchone()
+        covered = int(row[0]) if row else None
+        if covered == len(duplicates):
+            return
+        if covered is None or covered > len(duplicates):
+            # Première notation, ou base reconstruite : tout est à renoter
+            conn.execute("UPDATE candidates SET category = NULL")
+            self._set_kb_rows(conn, len(duplicates))
+            return
+        after = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, question, duplicate_score FROM candidates WHERE category IS NOT NULL AND id > ? "
+                "ORDER BY id LIMIT ?", (after, self.batch_size)).fetchall()
+            if not rows:
+                break
+            new_scores = duplicates.max_similarity(preprocess_texts(q for _, q, _ in rows), start=covered)
+            scores = np.maximum([s for _, _, s in rows], new_scores)
+            conn.executemany("UPDATE candidates SET duplicate_score = ?, is_duplicate = ? WHERE id = ?",
+                             [(float(s), int(s >= self.duplicate_threshold), r[0]) for s, r in zip(scores, rows)])
+            after = rows[-1][0]
+        self._set_kb_rows(conn, len(duplicates))
+
+    def on_kb_rows(self, start, stop):
+        """Écouteur du magasin : étend l'index des doublons aux lignes [start, stop)."""
+        with self._score_lock:
+            if self._duplicates is not None and len(self._duplicates) == start:
+                self._duplicates.extend(preprocess_rows(start, stop))
+        self._schedule()
+
+    def refresh(self):
+        """
+        Note les candidates en attente, par lots de batch_size
+
+        Returns:
+            int: Nombre de candidates notées
+        """
+        conn = self._conn()
+        scored = 0
+        with self._score_lock:
+            self._sync_kb(conn)
+            duplicates = self._get_duplicates()
+            while True:
+                rows = conn.execute("SELECT id, question FROM candidates WHERE category IS NULL ORDER BY id LIMIT ?",
+                                    (self.batch_size,)).fetchall()
+                if not rows:
+                    break
+                start = time.perf_counter()
+                processed = preprocess_texts(q for _, q in rows)
+                categories, confidences = predict_categories(processed)
+                scores = duplicates.max_similarity(processed)
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "UPDATE candidates SET category = ?, confidence = ?, duplicate_score = ?, is_duplicate = ? "
+                    "WHERE id = ?",
+                    [(str(c), float(p), float(s), int(s >= self.duplicate_threshold), r[0])
+                     for c, p, s, r in zip(categories, confidences, scores, rows)])
+                conn.execute("COMMIT")
+                scored += len(rows)
+                self.scored += len(rows)
+                self.batches += 1
+                self.last_batch_ms = (time.perf_counter() - start) * 1000
+        return scored
+
+    def page(self, limit=10, cursor=None):
+        """
+        Page de candidates prêtes à l'intégration (retour positif, réponse, pas de doublon)
+
+        Seules les candidates déjà notées sont lues : les entrées en attente sont
+        laissées au thread de notation (réveillé au besoin) et seulement comptées.
+
+        Args:
+            limit (int): Nombre de candidates par page
+            cursor (int|None): Identifiant de la dernière candidate de la page précédente
+
+        Returns:
+            tuple: (liste de candidates, curseur suivant ou None, nombre d'entrées en attente de notation)
+        """
+        conn = self._conn()
+        pending = conn.execute("SELECT COUNT(*) FROM candidates WHERE category IS NULL").fetchone()[0]
+        if pending:
+            self._schedule()
+        rows = conn.execute(
+            f"SELECT id, question, answer, category, confidence, duplicate_score, positive_ratings FROM candidates "
+            f"WHERE {READY_CONDITION} AND id > ? ORDER BY id LIMIT ?", (cursor or 0, limit + 1)).fetchall()
+        candidates = [{"id": r[0], "question": r[1], "answer": r[2], "category": r[3], "confidence": r[4],
+                       "duplicate_score": r[5], "positive_ratings": r[6]} for r in rows[:limit]]
+        next_cursor = candidates[-1]["id"] if len(rows) > limit else None
+        return candidates, next_cursor, pending
+
+    def count_ready(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM candidates WHERE {READY_CONDITION}").fetchone()[0]
+
+    def stats(self):
+        conn = self._conn()
+        total, pending, duplicates = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(category IS NULL), 0), COALESCE(SUM(is_duplicate), 0) FROM candidates").fetchone()
+        return {
+            "entries": total,
+            "ready": self.count_ready(),
+            "pending": pending,
+            "duplicates": duplicates,
+            "scored": self.scored,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms
+        }
+
+
+candidate_queue = CandidateQueue()
+
+if kb is not None:
+    kb.add_listener(candidate_queue.on_kb_rows)
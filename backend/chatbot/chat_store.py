@@ -0,0 +1,282 @@
+"""
+Module de stockage des sessions de chat (SQLite)
+
+Chaque message est une ligne indexée par (session_id, id) ; la table sessions
+maintient un résumé (date, premier message, nombre de messages) mis à jour à
+chaque ajout, pour que la liste paginée ne lise jamais les messages.
+L'ancien fichier data/chat_sessions.csv est importé une seule fois, en une
+transaction qui inclut la marque d'import (un import interrompu est rejoué en
+entier, deux processus ne l'importent pas deux fois).
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+CHAT_DB = 'data/chat_sessions.db'
+LEGACY_CHAT_FILE = 'data/chat_sessions.csv'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    first_message TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    user_message TEXT,
+    bot_answer TEXT,
+    bot_url TEXT,
+    bot_similarity REAL,
+    bot_category TEXT,
+    bot_is_shortcut INTEGER,
+    bot_method TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+MESSAGE_COLUMNS = "id, user_message, bot_answer, bot_url, bot_similarity, bot_category, bot_is_shortcut, bot_method, timestamp"
+
+
+def _message_from_row(row):
+    message_id, user_message, answer, url, similarity, category, is_shortcut, method, timestamp = row
+    return {
+        "id": message_id,
+        "user": user_message,
+        "bot": {
+            "answer": answer,
+            "url": url,
+            "similarity": similarity,
+            "category": category,
+            "is_shortcut": bool(is_shortcut),
+            "method": method
+        },
+        "timestamp": timestamp
+    }
+
+
+class ChatStore:
+    def __init__(self, path=CHAT_DB, legacy_csv=LEGACY_CHAT_FILE):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._import_legacy_csv(legacy_csv)
+
+    def _conn(self):
+        # Une connexion par thread (serveur WSGI multi-threadé)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction d'écriture (BEGIN IMMEDIATE) validée en fin de bloc, annulée sur exception."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _import_legacy_csv(self, legacy_csv):
+        if self._conn().execute("SELECT 1 FROM meta WHERE key = 'legacy_csv_imported'").fetchone():
+            return
+        with self._transaction() as conn:
+            # Un autre processus a pu importer le fichier depuis la lecture précédente
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_csv_imported'").fetchone():
+                return
+            imported = 0
+            if os.path.exists(legacy_csv):
+                for chunk in pd.read_csv(legacy_csv, encoding='utf-8', chunksize=50000):
+                    chunk = chunk.astype(object).where(chunk.notna(), None)
+                    for row in chunk.itertuples(index=False):
+                        self._insert_message(conn, int(row.session_id), row.date, {
+                            "user": row.user_message,
+                            "bot": {
+                                "answer": row.bot_answer,
+                                "url": row.bot_url,
+                                "similarity": row.bot_similarity,
+                                "category": row.bot_category,
+                                "is_shortcut": str(row.bot_is_shortcut) == 'True',
+                                "method": row.bot_method
+                            },
+                            "timestamp": row.timestamp
+                        })
+                    imported += len(chunk)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_csv_imported', ?)", (str(imported),))
+        if imported:
+            print(f"{imported} messages importés depuis {legacy_csv}")
+
+    @staticmethod
+    def _insert_message(conn, session_id, date, chat_entry):
+        bot = chat_entry.get('bot') or {}
+        conn.execute("INSERT OR IGNORE INTO sessions (id, date) VALUES (?, ?)", (session_id, date))
+        conn.execute(
+            "INSERT INTO messages (session_id, user_message, bot_answer, bot_url, bot_similarity, bot_category, "
+            "bot_is_shortcut, bot_method, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, chat_entry.get('user'), bot.get('answer'), bot.get('url'),
+             None if bot.get('similarity') is None else float(bot['similarity']),
+             None if bot.get('category') is None else str(bot['category']),
+             int(bool(bot.get('is_shortcut'))), bot.get('method', 'shortcut') if bot else None,
+             chat_entry.get('timestamp')))
+        conn.execute(
+            "UPDATE sessions SET message_count = message_count + 1, "
+            "first_message = COALESCE(first_message, ?) WHERE id = ?",
+            (chat_entry.get('user'), session_id))
+
+    def create_session(self, date):
+        """Crée une session vide et renvoie son identifiant."""
+        with self._transaction() as conn:
+            session_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sessions").fetchone()[0]
+            conn.execute("INSERT INTO sessions (id, date) VALUES (?, ?)", (session_id, date))
+        return session_id
+
+    def append_message(self, session_id, chat_entry):
+        """
+        Ajoute un échange à une session, créée si elle n'existe pas
+
+        Args:
+            session_id (int|None): Session cible
+            chat_entry (dict): {"user", "bot", "timestamp"}
+
+        Returns:
+            int: Identifiant de la session utilisée
+        """
+        with self._transaction() as conn:
+            exists = session_id is not None and conn.execute(
+                "SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if not exists:
+                session_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sessions").fetchone()[0]
+            self._insert_message(conn, session_id, chat_entry['timestamp'], chat_entry)
+        return session_id
+
+    def delete_session(self, session_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def list_sessions(self, limit=20, cursor=None):
+        """
+        Liste paginée des résumés de sessions, des plus récentes aux plus anciennes
+
+        Args:
+            limit (int): Nombre de sessions par page
+            cursor (int|None): Identifiant de la dernière session de la page précédente
+
+        Returns:
+            tuple: (liste de résumés, curseur suivant ou None)
+        """
+        query = "SELECT id, date, first_message, message_count FROM sessions"
+        params = []
+        if cursor is not None:
+            query += " WHERE id < ?"
+            params.append(cursor)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = self._conn().execute(query, params).fetchall()
+        summaries = [{"id": r[0], "date": r[1], "first_message": r[2], "message_count": r[3]} for r in rows[:limit]]
+        next_cursor = summaries[-1]["id"] if len(rows) > limit else None
+        return summaries, next_cursor
+
+    def get_session(self, session_id):
+        row = self._conn().execute(
+            "SELECT id, date, first_message, message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return {"id": row[0], "date": row[1], "first_message": row[2], "message_count": row[3]} if row else None
+
+    def iter_messages(self, session_id, after=None, limit=None, batch_size=500):
+        """Parcourt les messages d'une session par identifiant croissant, sans tout charger."""
+        after = after or 0
+        remaining = limit
+        conn = self._conn()
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            rows = conn.execute(
+                f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (session_id, after, size)).fetchall()
+            for row in rows:
+                yield _message_from_row(row)
+            if len(rows) < size:
+                return
+            after = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def oldest_messages(self, before, limit=5000):
+        """
+        Messages les plus anciens (identifiant croissant) horodatés avant before
+
+        Les messages étant ajoutés dans l'ordre chronologique, la lecture s'arrête au
+        premier message plus récent. Un message sans horodatage compte comme ancien.
+
+        Returns:
+            list: Lignes (session_id, date de la session, colonnes de MESSAGE_COLUMNS)
+        """
+        rows = self._conn().execute(
+            f"SELECT m.session_id, s.date, {', '.join('m.' + c for c in MESSAGE_COLUMNS.split(', '))} "
+            "FROM messages m LEFT JOIN sessions s ON s.id = m.session_id ORDER BY m.id LIMIT ?", (limit,)).fetchall()
+        old = []
+        for row in rows:
+            if row[-1] is not None and row[-1] >= before:
+                break
+            old.append(row)
+        return old
+
+    def delete_messages(self, rows):
+        """
+        Supprime des messages (lignes de oldest_messages) et les sessions qu'ils vident
+
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        removed = {}
+        for row in rows:
+            removed[row[0]] = removed.get(row[0], 0) + 1
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM messages WHERE id = ?", [(row[2],) for row in rows])
+            conn.executemany("UPDATE sessions SET message_count = message_count - ? WHERE id = ?",
+                             [(count, session_id) for session_id, count in removed.items()])
+            deleted = conn.executemany("DELETE FROM sessions WHERE id = ? AND message_count <= 0",
+                                       [(session_id,) for session_id in removed]).rowcount
+        return deleted
+
+    def answer_counts(self):
+        """Nombre de fois où chaque réponse a été donnée (popularité des réponses de la base)."""
+        rows = self._conn().execute(
+            "SELECT bot_answer, COUNT(*) FROM messages WHERE bot_answer IS NOT NULL GROUP BY bot_answer").fetchall()
+        return dict(rows)
+
+    def version(self):
+        """Valeur qui change à chaque ajout ou suppression (validation des caches HTTP)."""
+        return self._conn().execute(
+            "SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'messages'), "
+            "COUNT(*), TOTAL(message_count) FROM sessions").fetchone()
+
+    def load_all(self):
+        """Toutes les sessions avec leurs messages (ancien format de /get_sessions)."""
+        sessions, cursor = [], None
+        while True:
+            page, cursor = self.list_sessions(limit=1000, cursor=cursor)
+            for summary in page:
+                sessions.append({
+                    "id": summary["id"],
+                    "date": summary["date"],
+                    "messages": [{k: v for k, v in m.items() if k != "id"} for m in self.iter_messages(summary["id"])]
+                })
+            if cursor is None:
+                return sessions
@@ -1,23 +1,30 @@
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from whoosh.qparser import QueryParser
-from chatbot.data_processing import ix, responses, urls, preprocess_text, vectorizer, tfidf_matrix
+from chatbot.data_processing import bm25_index, responses, urls, preprocess_text, vectorizer, get_knowledge_base
 from chatbot.models import nb_classifier, knn_classifier
-from chatbot.config import shortcuts, shortcut_urls
-from chatbot.embeddings_utils import get_best_match_with_word2vec, get_best_match_with_fasttext, ensemble_similarity
+from chatbot.retrieval import partitioned_index, merge_by_answer
+from chatbot.spelling import spell_corrector
+from chatbot.candidate_queue import candidate_queue
+from chatbot.maintenance import new_questions_log, ratings_log
+from chatbot.config import shortcuts, shortcut_urls, alternatives_count, alternatives_margin, alternatives_min_similarity, \
+    chat_max_length
+from chatbot.embeddings_utils import get_top_answers_with_word2vec, get_top_answers_with_fasttext, combine_matches
 import os
+import re
 from langdetect import detect, DetectorFactory
 
 # Assurer la reproductibilité de la détection de langue
 DetectorFactory.seed = 0
 
 
-def search_in_index(query):
+def search_in_index(query, processed_query=None):
     try:
-        with ix.searcher() as searcher:
-            query_obj = QueryParser("question", ix.schema).parse(query)
-            results = searcher.search(query_obj, limit=1)
-            return {"answer": results[0]['answer'], "url": results[0]['url']} if results else None
+        if processed_query is None:
+            processed_query = preprocess_text(query)
+        results = bm25_index.search(processed_query.split(), k=1)
+        if not results:
+            return None
+        rid = results[0][0]
+        return {"answer": responses[rid], "url": urls[rid]}
     except Exception as e:
         print(f"Error searching in index: {e}")
         return None
@@ -52,14 +59,121 @@ def get_suggestions(user_input):
     return suggestions
 
 
+def normalize_query(user_input):
+    """
+    Clé canonique d'une requête pour le regroupement et les caches : les espaces
+    sont normalisés ; le texte libre est insensible à la casse (la cascade le met
+    en minuscules) mais les commandes /... restent exactes.
+    """
+    query = ' '.join(user_input.split())
+    return query if query.startswith('/') else query.lower()
+
+
 def get_response(user_input, input_source='text'):
-    print(f"Processing input from {input_source}: {user_input}")
+    response = None
+    for _, response in iter_response(user_input, input_source):
+        pass
+    return response
+
+
+def kb_response(idx, similarity, category, method, suggestions):
+    return {
+        "answer": responses[idx],
+        "url": f"https://isetsf.rnu.tn{urls[idx]}",
+        "similarity": float(similarity),
+        "category": category,
+        "is_shortcut": False,
+        "method": method,
+        "suggestions": suggestions
+    }
+
+
+# Réponses distinctes retenues par méthode (meilleure paraphrase de chacune) : la réponse
+# choisie et alternatives_count autres
+POOL_SIZE = alternatives_count + 1
+
+
+def get_alternatives(response, pools):
+    """
+    Questions de la base proches de la requête mais menant à d'autres réponses
+
+    Args:
+        response (dict): Réponse finale ; "answer" est exclue des alternatives
+        pools (dict): méthode -> (lignes, similarités) des k meilleures réponses calculées
+            (PartitionedIndex.top_answers, une paraphrase par réponse)
+
+    Returns:
+        list: Au plus alternatives_count dictionnaires {question, category, similarity, method} ;
+            chaque question peut être renvoyée telle quelle à /api/chat (au plus chat_max_length
+            caractères une fois les espaces normalisés)
+    """
+    if not alternatives_count or not pools:
+        return []
+    method = response["method"]
+    if method in pools or method == "ensemble":
+        # Quasi-égalités avec la réponse choisie, dans les résultats de la méthode qui a conclu
+        scope = {m: pools[m] for m in (("word2vec", "fasttext") if method == "ensemble" else (method,)) if m in pools}
+        floor = max(response["similarity"] - alternatives_margin, alternatives_min_similarity)
+    else:
+        scope = pools
+        floor = alternatives_min_similarity
+    kb = get_knowledge_base()
+    alternatives = []
+    for row, similarity, source in merge_by_answer(scope):
+        if similarity < floor or len(alternatives) >= alternatives_count:
+            break
+        question = kb.questions[row]
+        if responses[row] == response["answer"] or len(' '.join(question.split())) > chat_max_length:
+            continue
+        alternatives.append({
+            "question": question,
+            "category": kb.categories[row],
+            "similarity": float(similarity),
+            "method": source
+        })
+    return alternatives
+
+
+def with_alternatives(response, pools):
+    response["alternatives"] = get_alternatives(response, pools)
+    return response
+
+
+def detect_language(user_input):
     try:
         language = detect(user_input)
         if language not in ['fr', 'en']:
             language = 'fr'  # Par défaut français
     except Exception:
         language = 'fr'  # Secours si langdetect échoue
+    return language
+
+
+# Mots-clés anglais de get_quick_response et mots outils anglais : langdetect
+# classe souvent en 'en' une requête française courte ou fautive
+# ("horaires bibliotheqe"), seule une requête qui en contient est jugée anglaise
+ENGLISH_KEYWORDS = ('certificate of attendance', 'internship certificat', 'academic transcript')
+ENGLISH_MARKERS = {'the', 'is', 'are', 'how', 'what', 'where', 'when', 'which', 'who', 'can', 'could',
+                   'do', 'does', 'my', 'your', 'of', 'to', 'for', 'and', 'with', 'get', 'i', 'you', 'please'}
+
+
+def is_english(user_input, language):
+    """Requête anglaise avec certitude : mot-clé anglais, ou 'en' et au moins deux mots outils anglais."""
+    text = user_input.lower()
+    if any(keyword in text for keyword in ENGLISH_KEYWORDS):
+        return True
+    return language == 'en' and sum(word in ENGLISH_MARKERS for word in re.findall(r"[a-z]+", text)) >= 2
+
+
+def correct_spelling(user_input, language):
+    """Correction orthographique (vocabulaire français de la base), sauf pour une requête anglaise."""
+    if is_english(user_input, language):
+        return user_input
+    return spell_corrector.correct(user_input)
+
+
+def get_quick_response(user_input):
+    """Réponses sans modèle (mots-clés et raccourcis) ; None si la cascade complète est nécessaire."""
     user_input_lower = user_input.lower()
     if 'attestation presence' in user_input_lower and 'certificate of attendance' not in user_input_lower:
         response = {
@@ -125,18 +239,44 @@ def get_response(user_input, input_source='text'):
         print(
             f"Returning unknown shortcut response for {user_input}: {response['url']}")
         return response
+    return None
+
+
+def iter_response(user_input, input_source='text'):
+    """
+    Exécute la cascade de correspondance étape par étape.
+
+    Produit des couples (événement, réponse) : "partial" avec la meilleure réponse
+    trouvée jusque-là après chaque étape non concluante, puis une seule "final".
+    Fermer le générateur (client déconnecté) annule les étapes restantes.
+    """
+    print(f"Processing input from {input_source}: {user_input}")
+    quick = get_quick_response(user_input)
+    if quick is not None:
+        yield "final", quick
+        return
+
+    language = detect_language(user_input)
+    user_input = correct_spelling(user_input, language)
 
     processed_input = preprocess_text(
         user_input, language, is_voice=input_source == 'voice')
     input_tfidf = vectorizer.transform([processed_input])
 
+    # Category prediction using Naive Bayes and KNN
+    proba = nb_classifier.predict_proba(input_tfidf)[0]
+    category_tfidf = nb_classifier.classes_[proba.argmax()]
+    # Only the most probable categories are searched when NB is confident
+    route = partitioned_index.route(proba, nb_classifier.classes_)
+
     # Try TF-IDF (threshold: 0.65, adjust if too strict)
-    similarities = cosine_similarity(input_tfidf, tfidf_matrix)
-    best_match_idx = similarities.argmax()
-    max_similarity = similarities[0, best_match_idx]
+    # Chaque méthode renvoie ses POOL_SIZE meilleures réponses en une passe (une paraphrase par
+    # réponse) ; la première est la ligne d'argmax
+    pools = {}
+    top_idx, top_sim = partitioned_index.top_answers('tfidf', input_tfidf, [route], POOL_SIZE)
+    pools["tfidf"] = (top_idx[0], top_sim[0])
+    best_match_idx, max_similarity = top_idx[0, 0], top_sim[0, 0]
 
-    # Category prediction using Naive Bayes and KNN
-    category_tfidf = nb_classifier.predict(input_tfidf)[0]
     input_dense = input_tfidf.toarray()
     category_knn = knn_classifier.predict(input_dense)[0]
 
@@ -144,73 +284,52 @@ def get_response(user_input, input_source='text'):
     suggestions = get_suggestions(user_input)
 
     if max_similarity > 0.65:
-        return {
-            "answer": responses[best_match_idx],
-            "url": f"https://isetsf.rnu.tn{urls[best_match_idx]}",
-            "similarity": float(max_similarity),
-            "category": category_tfidf,
-            "is_shortcut": False,
-            "method": "tfidf",
-            "suggestions": suggestions
-        }
+        yield "final", with_alternatives(kb_response(best_match_idx, max_similarity, category_tfidf, "tfidf", suggestions), pools)
+        return
+    best = kb_response(best_match_idx, max_similarity, category_tfidf, "tfidf", suggestions)
+    yield "partial", best
 
     # Try Word2Vec (threshold: 0.8, adjust if needed)
-    w2v_idx, w2v_sim = get_best_match_with_word2vec(user_input, language)
+    top_idx, top_sim = get_top_answers_with_word2vec([user_input], [language], [route], POOL_SIZE)
+    pools["word2vec"] = (top_idx[0], top_sim[0])
+    w2v_idx, w2v_sim = top_idx[0, 0], top_sim[0, 0]
     if w2v_sim > 0.8:
-        return {
-            "answer": responses[w2v_idx],
-            "url": f"https://isetsf.rnu.tn{urls[w2v_idx]}",
-            "similarity": float(w2v_sim),
-            "category": category_tfidf,
-            "is_shortcut": False,
-            "method": "word2vec",
-            "suggestions": suggestions
-        }
+        yield "final", with_alternatives(kb_response(w2v_idx, w2v_sim, category_tfidf, "word2vec", suggestions), pools)
+        return
+    if w2v_sim > best["similarity"]:
+        best = kb_response(w2v_idx, w2v_sim, category_tfidf, "word2vec", suggestions)
+    yield "partial", best
 
     # Try FastText (threshold: 0.8)
-    ft_idx, ft_sim = get_best_match_with_fasttext(user_input, language)
+    top_idx, top_sim = get_top_answers_with_fasttext([user_input], [language], [route], POOL_SIZE)
+    pools["fasttext"] = (top_idx[0], top_sim[0])
+    ft_idx, ft_sim = top_idx[0, 0], top_sim[0, 0]
     if ft_sim > 0.8:
-        return {
-            "answer": responses[ft_idx],
-            "url": f"https://isetsf.rnu.tn{urls[ft_idx]}",
-            "similarity": float(ft_sim),
-            "category": category_tfidf,
-            "is_shortcut": False,
-            "method": "fasttext",
-            "suggestions": suggestions
-        }
+        yield "final", with_alternatives(kb_response(ft_idx, ft_sim, category_tfidf, "fasttext", suggestions), pools)
+        return
+    if ft_sim > best["similarity"]:
+        best = kb_response(ft_idx, ft_sim, category_tfidf, "fasttext", suggestions)
+    yield "partial", best
 
-    # Try ensemble (threshold: 0.7)
-    ens_idx, ens_sim = ensemble_similarity(user_input, language)
+    # Try ensemble (threshold: 0.7), à partir des meilleures lignes déjà calculées
+    ens_idx, ens_sim = combine_matches(w2v_idx, w2v_sim, ft_idx, ft_sim)
     if ens_sim > 0.7:
-        return {
-            "answer": responses[ens_idx],
-            "url": f"https://isetsf.rnu.tn{urls[ens_idx]}",
-            "similarity": float(ens_sim),
-            "category": category_tfidf,
-            "is_shortcut": False,
-            "method": "ensemble",
-            "suggestions": suggestions
-        }
+        yield "final", with_alternatives(kb_response(ens_idx, ens_sim, category_tfidf, "ensemble", suggestions), pools)
+        return
+    if ens_sim > best["similarity"]:
+        best = kb_response(ens_idx, ens_sim, category_tfidf, "ensemble", suggestions)
+    yield "partial", best
 
     # Fall back to KNN (distance threshold: 0.7)
     distances, indices = knn_classifier.kneighbors(input_dense, n_neighbors=1)
     if distances[0][0] < 0.7:
-        idx = indices[0][0]
-        return {
-            "answer": responses[idx],
-            "url": f"https://isetsf.rnu.tn{urls[idx]}",
-            "similarity": 1.0 - distances[0][0],
-            "category": category_knn,
-            "is_shortcut": False,
-            "method": "knn",
-            "suggestions": suggestions
-        }
+        yield "final", with_alternatives(kb_response(indices[0][0], 1.0 - distances[0][0], category_knn, "knn", suggestions), pools)
+        return
 
-    # Last resort: Whoosh search
-    search_result = search_in_index(user_input)
+    # Last resort: BM25 search
+    search_result = search_in_index(user_input, processed_input)
     if search_result:
-        return {
+        yield "final", with_alternatives({
             "answer": search_result['answer'],
             "url": f"https://isetsf.rnu.tn{search_result['url']}",
             "similarity": 0.5,
@@ -218,10 +337,11 @@ def get_response(user_input, input_source='text'):
             "is_shortcut": False,
             "method": "index_search",
             "suggestions": suggestions
-        }
+        }, pools)
+        return
 
     # No match found
-    return {
+    yield "final", with_alternatives({
         "answer": "Désolé, je n'ai pas compris.",
         "url": None,
         "similarity": 0.0,
@@ -229,7 +349,111 @@ def get_response(user_input, input_source='text'):
         "is_shortcut": False,
         "method": "no_match",
         "suggestions": suggestions
-    }
+    }, pools)
+
+
+def get_responses_batch(user_inputs, input_sources=None):
+    """
+    Équivalent par lot de get_response : chaque étape de la cascade est exécutée
+    une seule fois sur toutes les requêtes encore non résolues.
+
+    Args:
+        user_inputs (list): Requêtes des utilisateurs
+        input_sources (list): 'text' ou 'voice' pour chaque requête
+
+    Returns:
+        list: Une réponse (même format que get_response) par requête
+    """
+    input_sources = input_sources or ['text'] * len(user_inputs)
+    results = [get_quick_response(user_input) for user_input in user_inputs]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    inputs = [user_inputs[i] for i in pending]
+    languages = [detect_language(user_input) for user_input in inputs]
+    inputs = [correct_spelling(user_input, language) for user_input, language in zip(inputs, languages)]
+    processed = [preprocess_text(user_input, language, is_voice=input_sources[i] == 'voice')
+                 for user_input, language, i in zip(inputs, languages, pending)]
+    input_tfidf = vectorizer.transform(processed)
+
+    probas = nb_classifier.predict_proba(input_tfidf)
+    categories_tfidf = nb_classifier.classes_[probas.argmax(axis=1)]
+    routes = [partitioned_index.route(proba, nb_classifier.classes_) for proba in probas]
+    tfidf_top_idx, tfidf_top_sim = partitioned_index.top_answers('tfidf', input_tfidf, routes, POOL_SIZE)
+    tfidf_idx, tfidf_sim = tfidf_top_idx[:, 0], tfidf_top_sim[:, 0]
+    pools = [{"tfidf": (tfidf_top_idx[j], tfidf_top_sim[j])} for j in range(len(pending))]
+
+    input_dense = input_tfidf.toarray()
+    categories_knn = knn_classifier.predict(input_dense)
+    suggestions = [get_suggestions(user_input) for user_input in inputs]
+
+    # Positions (dans pending) encore non résolues après chaque étape
+    remaining = []
+    for j, i in enumerate(pending):
+        if tfidf_sim[j] > 0.65:
+            results[i] = kb_response(tfidf_idx[j], tfidf_sim[j], categories_tfidf[j], "tfidf", suggestions[j])
+            with_alternatives(results[i], pools[j])
+        else:
+            remaining.append(j)
+
+    if remaining:
+        batch_inputs = [inputs[j] for j in remaining]
+        batch_languages = [languages[j] for j in remaining]
+        batch_routes = [routes[j] for j in remaining]
+        w2v_top_idx, w2v_top_sim = get_top_answers_with_word2vec(batch_inputs, batch_languages, batch_routes, POOL_SIZE)
+        ft_top_idx, ft_top_sim = get_top_answers_with_fasttext(batch_inputs, batch_languages, batch_routes, POOL_SIZE)
+        w2v_idx, w2v_sim = w2v_top_idx[:, 0], w2v_top_sim[:, 0]
+        ft_idx, ft_sim = ft_top_idx[:, 0], ft_top_sim[:, 0]
+        still_remaining = []
+        for k, j in enumerate(remaining):
+            i = pending[j]
+            pools[j]["word2vec"] = (w2v_top_idx[k], w2v_top_sim[k])
+            pools[j]["fasttext"] = (ft_top_idx[k], ft_top_sim[k])
+            ens_idx, ens_sim = combine_matches(w2v_idx[k], w2v_sim[k], ft_idx[k], ft_sim[k])
+            if w2v_sim[k] > 0.8:
+                results[i] = kb_response(w2v_idx[k], w2v_sim[k], categories_tfidf[j], "word2vec", suggestions[j])
+            elif ft_sim[k] > 0.8:
+                results[i] = kb_response(ft_idx[k], ft_sim[k], categories_tfidf[j], "fasttext", suggestions[j])
+            elif ens_sim > 0.7:
+                results[i] = kb_response(ens_idx, ens_sim, categories_tfidf[j], "ensemble", suggestions[j])
+            else:
+                still_remaining.append(j)
+            if results[i] is not None:
+                with_alternatives(results[i], pools[j])
+        remaining = still_remaining
+
+    if remaining:
+        distances, indices = knn_classifier.kneighbors(input_dense[remaining], n_neighbors=1)
+        for k, j in enumerate(remaining):
+            i = pending[j]
+            if distances[k][0] < 0.7:
+                results[i] = with_alternatives(
+                    kb_response(indices[k][0], 1.0 - distances[k][0], categories_knn[j], "knn", suggestions[j]), pools[j])
+                continue
+            search_result = search_in_index(inputs[j], processed[j])
+            if search_result:
+                results[i] = {
+                    "answer": search_result['answer'],
+                    "url": f"https://isetsf.rnu.tn{search_result['url']}",
+                    "similarity": 0.5,
+                    "category": categories_knn[j],
+                    "is_shortcut": False,
+                    "method": "index_search",
+                    "suggestions": suggestions[j]
+                }
+            else:
+                results[i] = {
+                    "answer": "Désolé, je n'ai pas compris.",
+                    "url": None,
+                    "similarity": 0.0,
+                    "category": None,
+                    "is_shortcut": False,
+                    "method": "no_match",
+                    "suggestions": suggestions[j]
+                }
+            with_alternatives(results[i], pools[j])
+    return results
 
 
 def save_new_question(user_input, response, rating=None):
@@ -242,11 +466,18 @@ def save_new_question(user_input, response, rating=None):
             "rating": rating,
             "timestamp": pd.Timestamp.now().isoformat()
         }
-        if os.path.exists('data/new_questions.csv'):
-            df = pd.read_csv('data/new_questions.csv', encoding='utf-8')
-            df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-        else:
-            df = pd.DataFrame([new_entry])
-        df.to_csv('data/new_questions.csv', index=False, encoding='utf-8')
+        # Ajout en fin de fichier, le journal est compacté par chatbot.maintenance
+        new_questions_log.append(new_entry)
+        # File des candidates à l'auto-apprentissage, notée en arrière-plan
+        candidate_queue.record(user_input, response, rating)
     except Exception as e:
         print(f"Error saving new question: {e}")
+
+
+def save_rating(question, rating):
+    """Ajoute un retour utilisateur à data/ratings.csv (compacté par chatbot.maintenance)."""
+    ratings_log.append({
+        "question": question,
+        "rating": rating,
+        "timestamp": pd.Timestamp.now().isoformat()
+    })
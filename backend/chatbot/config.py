@@ -1,4 +1,109 @@
 # config.py
+import os
+
+# Base de connaissances servie : CSV source du magasin data/kb_store, celui auquel
+# l'auto-apprentissage et l'import en masse ajoutent leurs lignes (avant le magasin,
+# le chatbot servait data/data.csv, plus petit, que ces ajouts n'atteignaient pas)
+kb_data_path = os.getenv('CHATBOT_KB_DATA', 'data/data_option1.csv')
+
+# Micro-batching de l'inférence (/api/chat) : désactivé tant que batch_max_size <= 1
+batch_max_size = int(os.getenv('CHATBOT_BATCH_MAX_SIZE', 1))
+batch_max_wait_ms = float(os.getenv('CHATBOT_BATCH_MAX_WAIT_MS', 5))
+
+# Recherche partitionnée par catégorie : on interroge les 1 à partition_max_categories
+# catégories Naive Bayes les plus probables si leur probabilité cumulée atteint
+# partition_min_confidence, sinon toute la base
+partition_min_confidence = float(os.getenv('CHATBOT_PARTITION_MIN_CONFIDENCE', 0.8))
+partition_max_categories = int(os.getenv('CHATBOT_PARTITION_MAX_CATEGORIES', 2))
+
+# Première passe sur les centroïdes des réponses : seules les paraphrases des
+# answer_centroid_candidates meilleures réponses sont ensuite notées
+answer_centroid_first_pass = os.getenv('CHATBOT_ANSWER_CENTROID_FIRST_PASS', '0') == '1'
+answer_centroid_candidates = int(os.getenv('CHATBOT_ANSWER_CENTROID_CANDIDATES', 8))
+
+# Questions proches proposées avec la réponse ("Vouliez-vous dire", 0 pour désactiver) :
+# paraphrases d'autres réponses à moins de alternatives_margin de la réponse choisie,
+# ou meilleures candidates au-dessus de alternatives_min_similarity si aucune méthode n'a conclu
+alternatives_count = int(os.getenv('CHATBOT_ALTERNATIVES', 3))
+alternatives_margin = float(os.getenv('CHATBOT_ALTERNATIVES_MARGIN', 0.1))
+alternatives_min_similarity = float(os.getenv('CHATBOT_ALTERNATIVES_MIN_SIMILARITY', 0.3))
+
+# Threads d'exécution (chatbot.runtime) : processus serveur sur la machine (gunicorn -w),
+# threads BLAS/OpenMP par processus, workers d'entraînement gensim, cascades simultanées
+# et threads du serveur waitress par processus (0 : déduit des cœurs disponibles)
+server_workers = int(os.getenv('CHATBOT_SERVER_WORKERS', os.getenv('WEB_CONCURRENCY', 1)))
+blas_threads = int(os.getenv('CHATBOT_BLAS_THREADS', 0))
+training_workers = int(os.getenv('CHATBOT_TRAINING_WORKERS', 0))
+request_threads = int(os.getenv('CHATBOT_REQUEST_THREADS', 0))
+server_threads = int(os.getenv('CHATBOT_SERVER_THREADS', 0))
+
+# Contrôle d'admission de /api/chat : seaux à jetons par session et par adresse IP
+# (jetons par seconde, rafale), requêtes d'inférence simultanées (0 : inference_slots du runtime) et
+# budget d'attente au-delà duquel la requête est refusée (503)
+admission_enabled = os.getenv('CHATBOT_ADMISSION', '1') == '1'
+admission_session_rate = float(os.getenv('CHATBOT_ADMISSION_SESSION_RATE', 2))
+admission_session_burst = float(os.getenv('CHATBOT_ADMISSION_SESSION_BURST', 10))
+admission_ip_rate = float(os.getenv('CHATBOT_ADMISSION_IP_RATE', 20))
+admission_ip_burst = float(os.getenv('CHATBOT_ADMISSION_IP_BURST', 60))
+admission_max_concurrent = int(os.getenv('CHATBOT_ADMISSION_MAX_CONCURRENT', 0))
+admission_max_queue = int(os.getenv('CHATBOT_ADMISSION_MAX_QUEUE', 64))
+admission_latency_budget_ms = float(os.getenv('CHATBOT_ADMISSION_LATENCY_BUDGET_MS', 2000))
+# Adresse du client lue dans X-Forwarded-For (derrière un proxy de confiance uniquement)
+trust_proxy = os.getenv('CHATBOT_TRUST_PROXY', '0') == '1'
+
+# Cache des réponses de la cascade : LRU du processus (entrées), puis magasin partagé
+# par les workers (chemin SQLite, url redis://... ou vide pour aucun), durée de vie (s)
+result_cache_enabled = os.getenv('CHATBOT_RESULT_CACHE', '1') == '1'
+result_cache_shared = os.getenv('CHATBOT_RESULT_CACHE_SHARED', 'data/result_cache.db')
+result_cache_ttl = float(os.getenv('CHATBOT_RESULT_CACHE_TTL', 3600))
+result_cache_local_size = int(os.getenv('CHATBOT_RESULT_CACHE_LOCAL_SIZE', 1024))
+result_cache_max_entries = int(os.getenv('CHATBOT_RESULT_CACHE_MAX_ENTRIES', 100000))
+
+# Analyse des lacunes (/api/self-learning/gaps) : nombre de groupes de questions non
+# résolues, et couverture (similarité moyenne avec la base) sous laquelle un groupe est une lacune
+gap_clusters = int(os.getenv('CHATBOT_GAP_CLUSTERS', 30))
+gap_max_coverage = float(os.getenv('CHATBOT_GAP_MAX_COVERAGE', 0.7))
+
+# Maintenance des journaux (chatbot.maintenance), toutes les maintenance_interval secondes :
+# new_questions.csv et ratings.csv gardent au plus retention_max_rows lignes de moins de
+# retention_days jours (le reste est archivé dans data/archive/) ; messages de chat
+# archivés après chat_retention_days jours (0 pour les garder)
+maintenance_enabled = os.getenv('CHATBOT_MAINTENANCE', '1') == '1'
+maintenance_interval = float(os.getenv('CHATBOT_MAINTENANCE_INTERVAL', 3600))
+retention_days = float(os.getenv('CHATBOT_RETENTION_DAYS', 90))
+retention_max_rows = int(os.getenv('CHATBOT_RETENTION_MAX_ROWS', 100000))
+chat_retention_days = float(os.getenv('CHATBOT_CHAT_RETENTION_DAYS', 365))
+
+# Longueur maximale (en caractères) d'un message de chat ; tout caractère imprimable
+# est accepté, comme dans les questions de la base renvoyées en suggestions
+chat_max_length = int(os.getenv('CHATBOT_CHAT_MAX_LENGTH', 1000))
+
+# Correction orthographique avant TF-IDF (0 pour la désactiver)
+spelling_max_edit_distance = int(os.getenv('CHATBOT_SPELLING_MAX_EDIT_DISTANCE', 2))
+# Lexique français facultatif (un mot par ligne, UTF-8) : ses mots ne sont jamais
+# corrigés, en plus des mots courants de chatbot.spelling.COMMON_WORDS
+spelling_lexicon = os.getenv('CHATBOT_SPELLING_LEXICON')
+
+# Embeddings servis : 'full' (modèles gensim complets), 'float32' ou 'int8'
+# (export allégé de chatbot.serving_vectors, ouvert en mmap)
+embeddings_serving = os.getenv('CHATBOT_EMBEDDINGS_SERVING', 'float32')
+
+# Téléchargements (/api/download) : files/ est re-parcouru au plus toutes les
+# download_check_interval secondes ; variantes .br/.gz servies si elles existent
+download_check_interval = float(os.getenv('CHATBOT_DOWNLOAD_CHECK_INTERVAL', 2))
+download_max_age = int(os.getenv('CHATBOT_DOWNLOAD_MAX_AGE', 300))
+download_precompressed = os.getenv('CHATBOT_DOWNLOAD_PRECOMPRESSED', '1') == '1'
+
+# Durée pendant laquelle /metrics (compteurs d'exécution) est resservi tel quel
+http_cache_metrics_seconds = float(os.getenv('CHATBOT_HTTP_CACHE_METRICS_SECONDS', 5))
+
+# Profilage à la demande (/admin/profile, en-tête X-Debug-Profile) : désactivé par défaut
+profiling_enabled = os.getenv('CHATBOT_PROFILING', '0') == '1'
+profiling_interval_ms = float(os.getenv('CHATBOT_PROFILING_INTERVAL_MS', 10))
+# Jeton exigé (en-tête X-Admin-Token) par les routes d'administration ; sans jeton,
+# elles ne répondent qu'aux requêtes directes depuis la boucle locale
+admin_token = os.getenv('CHATBOT_ADMIN_TOKEN')
+
 shortcuts = {
     "/horaires": "Voici les horaires des cours. Consultez le lien pour plus de détails.",
     "/contact": "Pour contacter l'administration: Email: admin@iset.tn, Tél: +216 XX XXX XXX",
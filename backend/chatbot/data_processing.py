@@ -6,49 +6,52 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import SnowballStemmer
 from sklearn.feature_extraction.text import TfidfVectorizer
-from whoosh.index import create_in
-from whoosh.fields import Schema, TEXT
 import os
 from gensim.models import Word2Vec, FastText
+from chatbot.kb_store import KnowledgeBase, DATA_PATH
+from chatbot.bm25 import BM25Index
+from chatbot.config import embeddings_serving
+from chatbot.runtime import runtime
+from chatbot.serving_vectors import export_vectors, load_serving_model
 
-nltk.download('punkt_tab', quiet=True)
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
+def has_nltk_resource(*resources):
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+            return True
+        except LookupError:
+            pass
+    return False
+
+# Ressources NLTK téléchargées seulement si absentes (démarrage hors ligne) ;
+# punkt_tab remplace punkt depuis NLTK 3.8.2, l'un des deux suffit
+if not has_nltk_resource('tokenizers/punkt_tab', 'tokenizers/punkt'):
+    nltk.download('punkt_tab', quiet=True)
+    nltk.download('punkt', quiet=True)
+if not has_nltk_resource('corpora/stopwords'):
+    nltk.download('stopwords', quiet=True)
 
 stemmer_fr = SnowballStemmer('french')
 stop_words_fr = set(stopwords.words('french'))
 # Common filler words in French for voice input
 filler_words_fr = {'euh', 'hum', 'ben', 'tu sais', 'genre', 'comme', 'voilà'}
 
-schema = Schema(question=TEXT(stored=True), answer=TEXT(stored=True), url=TEXT(stored=True))
-if not os.path.exists("indexdir"):
-    os.makedirs("indexdir")
-ix = create_in("indexdir", schema)
+kb = None
+
+def get_knowledge_base():
+    global kb
+    if kb is None:
+        kb = KnowledgeBase.open(DATA_PATH)
+    return kb
 
 def load_data():
     try:
-        data = pd.read_csv('data/data.csv', encoding='utf-8')
-        questions = []
-        responses = []
-        urls = []
-        categories = []
-        writer = ix.writer()
-        
-        for _, row in data.iterrows():
-            question = row['question']
-            answer = row['answer']
-            category = row['category']
-            url = row['url']
-            writer.add_document(question=question, answer=answer, url=url)
-            questions.append(question)
-            responses.append(answer)
-            urls.append(url)
-            categories.append(category)
-        
-        writer.commit()
-        return questions, responses, urls, categories
+        kb = get_knowledge_base()
+        # Les réponses et URLs restent dans le magasin mappé ; les catégories
+        # sont matérialisées car les classifieurs sklearn attendent une liste
+        return kb.questions, kb.responses, kb.urls, kb.categories.tolist()
     except FileNotFoundError:
-        print("Error: data_option1.csv not found.")
+        print(f"Error: {DATA_PATH} not found.")
         return [], [], [], []
     except Exception as e:
         print(f"Error loading data: {e}")
@@ -68,41 +71,103 @@ def preprocess_text(text, language='fr', is_voice=False):
     tokens = [stemmer.stem(word) for word in word_tokenize(text) if word not in stop_words]
     return ' '.join(tokens)
 
+def preprocess_texts(texts, language='fr'):
+    """
+    preprocess_text sur une liste de textes (même résultat), pour les traitements par lots :
+    la racine de chaque mot distinct n'est calculée qu'une fois.
+    """
+    punctuation = str.maketrans('', '', string.punctuation)
+    stems = {}
+    processed = []
+    for text in texts:
+        tokens = []
+        # Sans ponctuation, il n'y a qu'une phrase : le découpage en phrases est inutile
+        for word in word_tokenize(text.lower().translate(punctuation), preserve_line=True):
+            if word in stop_words_fr:
+                continue
+            stem = stems.get(word)
+            if stem is None:
+                stem = stems[word] = stemmer_fr.stem(word)
+            tokens.append(stem)
+        processed.append(' '.join(tokens))
+    return processed
+
 tokenized_questions = [preprocess_text(q, 'fr').split() for q in questions]
 
+# Index BM25 (dernier recours de get_response), tenu à jour lors des ajouts à la base
+bm25_index = BM25Index()
+bm25_index.add_documents(tokenized_questions)
+
+# Dernier intervalle de lignes ajoutées prétraité : partagé par les écouteurs d'ajout
+_last_processed_rows = (None, [])
+
+def preprocess_rows(start, stop):
+    """Questions prétraitées des lignes [start, stop) de la base (le dernier intervalle est mémorisé)."""
+    global _last_processed_rows
+    rows, processed = _last_processed_rows
+    if rows != (start, stop):
+        processed = preprocess_texts(kb.questions[i] for i in range(start, stop))
+        _last_processed_rows = ((start, stop), processed)
+    return processed
+
+def index_new_questions(start, stop):
+    bm25_index.add_documents([p.split() for p in preprocess_rows(start, stop)])
+
+if kb is not None:
+    kb.add_listener(index_new_questions)
+
 vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_df=0.9, min_df=2)
 processed_questions = [preprocess_text(q, 'fr') for q in questions]
 tfidf_matrix = vectorizer.fit_transform(processed_questions)
 
-word2vec_model_path = 'models/word2vec.model'
-if os.path.exists(word2vec_model_path):
-    word2vec_model = Word2Vec.load(word2vec_model_path)
-else:
-    word2vec_model = Word2Vec(sentences=tokenized_questions, vector_size=100, window=5, min_count=1, workers=4)
+def load_or_train_word2vec(path):
+    if os.path.exists(path):
+        return Word2Vec.load(path)
+    model = Word2Vec(sentences=tokenized_questions, vector_size=100, window=5, min_count=1,
+                     workers=runtime.training_workers)
     if not os.path.exists('models'):
         os.makedirs('models')
-    word2vec_model.save(word2vec_model_path)
+    model.save(path)
+    return model
+
+def load_or_train_fasttext(path):
+    if os.path.exists(path):
+        return FastText.load(path)
+    model = FastText(tokenized_questions, vector_size=100, window=5, min_count=1, workers=runtime.training_workers)
+    model.save(path)
+    return model
+
+def load_embedding_model(name, path, load_or_train):
+    """
+    Modèle servi : l'export allégé (serving_vectors) si embeddings_serving le demande,
+    (re)généré depuis le modèle complet s'il est absent ou périmé, sinon le modèle complet.
+    """
+    if embeddings_serving == 'full':
+        return load_or_train(path)
+    serving_model = load_serving_model(name, path, embeddings_serving) if os.path.exists(path) else None
+    if serving_model is None:
+        export_vectors(load_or_train(path), path, name, embeddings_serving)
+        serving_model = load_serving_model(name, path, embeddings_serving)
+    return serving_model
+
+word2vec_model_path = 'models/word2vec.model'
+word2vec_model = load_embedding_model('word2vec', word2vec_model_path, load_or_train_word2vec)
 
 fasttext_model_path = 'models/fasttext.model'
-if os.path.exists(fasttext_model_path):
-    fasttext_model = FastText.load(fasttext_model_path)
-else:
-    fasttext_model = FastText(tokenized_questions, vector_size=100, window=5, min_count=1, workers=4)
-    fasttext_model.save(fasttext_model_path)
+fasttext_model = load_embedding_model('fasttext', fasttext_model_path, load_or_train_fasttext)
 
-def get_document_vector_w2v(doc, model, language='fr'):
-    words = preprocess_text(doc, language).split()
+def document_vector(words, model):
+    """Moyenne des vecteurs des mots (déjà prétraités) connus du modèle."""
     word_vectors = [model.wv[word] for word in words if word in model.wv]
     if len(word_vectors) == 0:
         return np.zeros(model.vector_size)
     return np.mean(word_vectors, axis=0)
 
+def get_document_vector_w2v(doc, model, language='fr'):
+    return document_vector(preprocess_text(doc, language).split(), model)
+
 def get_document_vector_fasttext(doc, model, language='fr'):
-    words = preprocess_text(doc, language).split()
-    word_vectors = [model.wv[word] for word in words if word in model.wv]
-    if len(word_vectors) == 0:
-        return np.zeros(model.vector_size)
-    return np.mean(word_vectors, axis=0)
+    return document_vector(preprocess_text(doc, language).split(), model)
 
 w2v_question_vectors = np.array([get_document_vector_w2v(q, word2vec_model, 'fr') for q in questions])
 fasttext_question_vectors = np.array([get_document_vector_fasttext(q, fasttext_model, 'fr') for q in questions])
\ No newline at end of file
@@ -1,25 +1,37 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from chatbot.data_processing import word2vec_model, fasttext_model, w2v_question_vectors, fasttext_question_vectors, preprocess_text
+from chatbot.data_processing import word2vec_model, fasttext_model, preprocess_text
+from chatbot.retrieval import partitioned_index
 
-def get_best_match_with_word2vec(query, language='fr'):
+# route : catégories à interroger (PartitionedIndex.route), None pour toute la base
+
+def get_best_match_with_word2vec(query, language='fr', route=None):
     query_vector = np.array([get_document_vector_w2v(query, word2vec_model, language)])
-    similarities = cosine_similarity(query_vector, w2v_question_vectors)
-    best_match_idx = similarities.argmax()
-    max_similarity = similarities[0, best_match_idx]
-    return best_match_idx, max_similarity
+    return partitioned_index.best_match('word2vec', query_vector, route)
 
-def get_best_match_with_fasttext(query, language='fr'):
+def get_best_match_with_fasttext(query, language='fr', route=None):
     query_vector = np.array([get_document_vector_fasttext(query, fasttext_model, language)])
-    similarities = cosine_similarity(query_vector, fasttext_question_vectors)
-    best_match_idx = similarities.argmax()
-    max_similarity = similarities[0, best_match_idx]
-    return best_match_idx, max_similarity
-
-def ensemble_similarity(query, language='fr'):
-    w2v_idx, w2v_sim = get_best_match_with_word2vec(query, language)
-    ft_idx, ft_sim = get_best_match_with_fasttext(query, language)
-    
+    return partitioned_index.best_match('fasttext', query_vector, route)
+
+def get_top_answers_with_word2vec(queries, languages=None, routes=None, k=5):
+    """k meilleures réponses par requête (PartitionedIndex.top_answers) : (lignes, similarités)."""
+    languages = languages or ['fr'] * len(queries)
+    routes = routes or [None] * len(queries)
+    query_vectors = np.array([get_document_vector_w2v(q, word2vec_model, l) for q, l in zip(queries, languages)])
+    return partitioned_index.top_answers('word2vec', query_vectors, routes, k)
+
+def get_top_answers_with_fasttext(queries, languages=None, routes=None, k=5):
+    """k meilleures réponses par requête (PartitionedIndex.top_answers) : (lignes, similarités)."""
+    languages = languages or ['fr'] * len(queries)
+    routes = routes or [None] * len(queries)
+    query_vectors = np.array([get_document_vector_fasttext(q, fasttext_model, l) for q, l in zip(queries, languages)])
+    return partitioned_index.top_answers('fasttext', query_vectors, routes, k)
+
+def ensemble_similarity(query, language='fr', route=None):
+    w2v_idx, w2v_sim = get_best_match_with_word2vec(query, language, route)
+    ft_idx, ft_sim = get_best_match_with_fasttext(query, language, route)
+    return combine_matches(w2v_idx, w2v_sim, ft_idx, ft_sim)
+
+def combine_matches(w2v_idx, w2v_sim, ft_idx, ft_sim):
     # Weighted average of similarities (equal weights for simplicity)
     weights = [0.5, 0.5]
     if w2v_idx == ft_idx:
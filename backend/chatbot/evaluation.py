@@ -0,0 +1,221 @@
+"""
+Module d'évaluation des méthodes de correspondance (/embeddings-metrics)
+
+L'évaluation tourne dans un thread en arrière-plan : les questions de test
+(data/test_questions.csv) sont prétraitées et encodées en une fois, puis notées
+par blocs de CHUNK_SIZE questions (un produit matriciel par méthode et par bloc),
+les blocs étant répartis sur les cœurs du processus (chatbot.runtime). Le rapport est enregistré dans
+models/evaluations/, sous une clé formée de la génération des modèles, du nombre
+de lignes de la base et d'une empreinte du jeu de test : il n'est recalculé que
+si l'un d'eux change.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import normalize
+from chatbot.data_processing import (get_knowledge_base, preprocess_texts, document_vector, vectorizer,
+                                     word2vec_model, fasttext_model)
+from chatbot.embeddings_utils import combine_matches
+from chatbot.generation import current_generation
+from chatbot.retrieval import partitioned_index, _similarities
+from chatbot.runtime import runtime
+
+TEST_QUESTIONS_PATH = 'data/test_questions.csv'
+REPORTS_DIR = 'models/evaluations'
+METHODS = ['tfidf', 'word2vec', 'fasttext', 'ensemble']
+CHUNK_SIZE = 256
+MAX_REPORTS = 5
+
+DEFAULT_TEST_QUESTIONS = [
+    "Quelles sont les horaires d'ouverture de la bibliothèque?",
+    "Comment s'inscrire pour la nouvelle année?",
+    "Où puis-je trouver les résultats des examens?",
+    "Quand commence la période d'inscription?",
+    "Comment contacter l'administration?",
+    "Quels sont les programmes disponibles à l'ISET?"
+]
+
+
+def load_test_questions(path=TEST_QUESTIONS_PATH):
+    if os.path.exists(path):
+        test_questions = pd.read_csv(path, encoding='utf-8')['question'].dropna().astype(str).tolist()
+        if test_questions:
+            return test_questions
+    return list(DEFAULT_TEST_QUESTIONS)
+
+
+def report_key(test_questions):
+    """Clé du rapport : génération des modèles, taille de la base et empreinte du jeu de test."""
+    digest = hashlib.sha1('\n'.join(test_questions).encode('utf-8')).hexdigest()[:12]
+    return f"g{current_generation()}-r{len(get_knowledge_base())}-{digest}"
+
+
+def report_path(key):
+    return os.path.join(REPORTS_DIR, f"embeddings_metrics_{key}.json")
+
+
+def _best_rows(name, queries, scope):
+    sims = _similarities(normalize(queries), scope[name])
+    best = sims.argmax(axis=1)
+    return scope["rows"][best], sims[np.arange(len(best)), best]
+
+
+class EmbeddingsEvaluation:
+    """Calcul d'un rapport ; run() peut être appelé directement ou dans un thread (start_evaluation)."""
+
+    def __init__(self, test_questions, key, workers=None):
+        self.test_questions = test_questions
+        self.key = key
+        self.workers = workers or runtime.cores_per_worker
+        self.status = 'pending'
+        self.phase = None
+        self.scored = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "key": self.key,
+            "status": self.status,
+            "phase": self.phase,
+            "questions": len(self.test_questions),
+            "scored": self.scored,
+            "progress": self.scored / len(self.test_questions) if self.test_questions else 1.0,
+            "elapsed_seconds": elapsed,
+            "error": self.error
+        }
+
+    def _score_chunk(self, scope, tfidf, w2v, ft):
+        """Meilleure ligne et similarité de chaque méthode pour un bloc de questions."""
+        matches = {
+            "tfidf": _best_rows("tfidf", tfidf, scope),
+            "word2vec": _best_rows("word2vec", w2v, scope),
+            "fasttext": _best_rows("fasttext", ft, scope)
+        }
+        ensemble = [combine_matches(w2v_idx, w2v_sim, ft_idx, ft_sim)
+                    for w2v_idx, w2v_sim, ft_idx, ft_sim in zip(*matches["word2vec"], *matches["fasttext"])]
+        matches["ensemble"] = (np.array([idx for idx, _ in ensemble]), np.array([sim for _, sim in ensemble]))
+        with self._lock:
+            self.scored += tfidf.shape[0]
+        return matches
+
+    def compute(self):
+        """Rapport au format de /embeddings-metrics (results, similarities, method_counts)."""
+        self.phase = 'encodage'
+        processed = preprocess_texts(self.test_questions)
+        tfidf = vectorizer.transform(processed)
+        w2v = np.array([document_vector(p.split(), word2vec_model) for p in processed])
+        ft = np.array([document_vector(p.split(), fasttext_model) for p in processed])
+
+        self.phase = 'notation'
+        # Base entière, comme les étapes de get_response sans routage
+        scope = partitioned_index.global_scope
+        bounds = [(start, min(start + CHUNK_SIZE, len(processed))) for start in range(0, len(processed), CHUNK_SIZE)]
+        # Les produits matriciels libèrent le GIL : les blocs sont notés en parallèle
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            chunks = list(executor.map(lambda b: self._score_chunk(scope, tfidf[b[0]:b[1]], w2v[b[0]:b[1]], ft[b[0]:b[1]]),
+                                       bounds))
+        rows = {m: np.concatenate([chunk[m][0] for chunk in chunks]) for m in METHODS}
+        sims = {m: np.concatenate([chunk[m][1] for chunk in chunks]).astype(float) for m in METHODS}
+
+        self.phase = 'rapport'
+        kb = get_knowledge_base()
+        results = [{
+            "question": question,
+            **{m: {"response": kb.responses[int(rows[m][i])], "similarity": float(sims[m][i])} for m in METHODS}
+        } for i, question in enumerate(self.test_questions)]
+        # Meilleure méthode par question (la première en cas d'égalité, comme max())
+        best_methods = np.argmax(np.vstack([sims[m] for m in METHODS]), axis=0)
+        counts = np.bincount(best_methods, minlength=len(METHODS))
+        return {
+            "key": self.key,
+            "generation": current_generation(),
+            "computed_at": pd.Timestamp.now().isoformat(),
+            "results": results,
+            "similarities": [sims[m].tolist() for m in METHODS],
+            "method_counts": {m: int(c) for m, c in zip(METHODS, counts) if c}
+        }
+
+    def run(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            report = self.compute()
+            report["elapsed_seconds"] = time.time() - self.started_at
+            save_report(self.key, report)
+            self.status = 'done'
+            print(f"Évaluation {self.key}: {len(self.test_questions)} questions en {report['elapsed_seconds']:.1f} s")
+        except Exception as e:
+            self.status = 'error'
+            self.error = str(e)
+            print(f"Erreur lors de l'évaluation {self.key}: {e}")
+            raise
+        finally:
+            self.phase = None
+            self.finished_at = time.time()
+        return self
+
+
+def save_report(key, report):
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = report_path(key)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    # Seuls les MAX_REPORTS rapports les plus récents sont conservés
+    reports = sorted((os.path.join(REPORTS_DIR, name) for name in os.listdir(REPORTS_DIR) if name.endswith('.json')),
+                     key=os.path.getmtime)
+    for old_path in reports[:-MAX_REPORTS]:
+        os.remove(old_path)
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start_evaluation(test_questions=None, force=False):
+    """
+    Rapport enregistré pour la génération courante, ou lancement de son calcul
+
+    Args:
+        test_questions (list): Questions de test (data/test_questions.csv par défaut)
+        force (bool): Recalculer même si le rapport existe
+
+    Returns:
+        tuple: (chemin du rapport ou None, évaluation en cours ou None)
+    """
+    global _job
+    test_questions = test_questions or load_test_questions()
+    key = report_key(test_questions)
+    path = report_path(key)
+    with _job_lock:
+        if not force and os.path.exists(path):
+            return path, None
+        if _job is not None and (_job.status in ('pending', 'running') or
+                                 (_job.status == 'error' and _job.key == key and not force)):
+            return None, _job
+        _job = EmbeddingsEvaluation(test_questions, key)
+        job = _job
+
+    def run():
+        try:
+            job.run()
+        except Exception:
+            pass  # erreur enregistrée dans l'évaluation
+
+    threading.Thread(target=run, name=f'evaluation-{key}', daemon=True).start()
+    return None, job
+
+
+def get_evaluation():
+    """Dernière évaluation lancée (None si aucune)."""
+    return _job
@@ -0,0 +1,247 @@
+"""
+Module de service des fichiers téléchargeables (/api/download/<filename>)
+
+Le répertoire files/ est parcouru au démarrage (start) pour construire un
+manifeste (taille, date de modification, ETag fort = empreinte SHA-256 du
+contenu) ; un thread d'arrière-plan le re-parcourt toutes les check_interval
+secondes pour suivre les ajouts et modifications (seuls les fichiers dont la
+taille ou la date a changé sont ré-empreints) et publie le nouveau manifeste
+d'un seul bloc. Une requête ne fait que lire le manifeste publié, sans verrou
+ni accès disque ; elle ne coûte donc qu'une recherche dans un dictionnaire :
+- If-None-Match / If-Modified-Since : 304 sans ouvrir le fichier ;
+- Range : réponse partielle (206) par werkzeug ;
+- variantes précompressées (fichier.pdf.br, fichier.pdf.gz) servies avec
+  Content-Encoding si le client les accepte et ne demande pas de plage.
+
+Les variantes se génèrent avec :
+    python -m chatbot.file_server [--min-ratio 0.9]
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import threading
+import time
+from flask import Response, send_file
+from chatbot.config import download_check_interval, download_max_age, download_precompressed
+
+try:
+    import brotli
+except ImportError:  # dépendance facultative : seules les variantes gzip sont générées
+    brotli = None
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'files')
+# Encodages des variantes, par ordre de préférence
+VARIANTS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+class FileServer:
+    def __init__(self, directory=FILES_DIR, check_interval=2.0, max_age=300, precompressed=True):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.precompressed = precompressed
+        self._lock = threading.Lock()  # compteurs
+        self._start_lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        # (tous les fichiers, variantes comprises ; fichiers téléchargeables), remplacé par refresh
+        self._manifest = None
+        self._thread = None
+        self.scans = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.compressed = 0
+        self.missing = 0
+
+    def refresh(self):
+        """Re-parcourt le répertoire et publie le nouveau manifeste."""
+        with self._scan_lock:
+            previous_entries = self._manifest[0] if self._manifest is not None else {}
+            self._manifest = self._scan(previous_entries)
+            self.scans += 1
+
+    def _scan(self, previous_entries):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        entries = {}
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            previous = previous_entries.get(name)
+            if previous is not None and (previous["size"], previous["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                etag = previous["etag"]
+            else:
+                etag = _file_digest(path)
+            entries[name] = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                             "mtime": stat.st_mtime, "etag": etag, "variants": {}}
+        public = {}
+        for name, entry in entries.items():
+            if any(name.endswith(suffix) and name[:-len(suffix)] in entries for _, suffix in VARIANTS):
+                continue
+            for encoding, suffix in VARIANTS:
+                # Une variante plus ancienne que l'original est périmée
+                if name + suffix in entries and entries[name + suffix]["mtime_ns"] >= entry["mtime_ns"]:
+                    entry["variants"][encoding] = entries[name + suffix]
+            public[name] = entry
+        return entries, public
+
+    def start(self):
+        """Premier parcours, puis re-parcours toutes les check_interval secondes en arrière-plan."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name='file-server', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Erreur lors du parcours de {self.directory}: {e}")
+
+    def _public(self):
+        manifest = self._manifest
+        if manifest is None:
+            # Serveur non démarré (ligne de commande, benchmarks) : premier parcours ici
+            self.start()
+            manifest = self._manifest
+        return manifest[1]
+
+    def lookup(self, name):
+        """Entrée du manifeste d'un fichier téléchargeable (None s'il n'existe pas)."""
+        return self._public().get(name)
+
+    def files(self):
+        return {name: {"size": entry["size"], "etag": entry["etag"], "encodings": sorted(entry["variants"])}
+                for name, entry in self._public().items()}
+
+    def _select_variant(self, entry, request):
+        if not self.precompressed or request.range is not None:
+            return entry, None
+        for encoding, _ in VARIANTS:
+            if encoding in entry["variants"] and request.accept_encodings[encoding]:
+                return entry["variants"][encoding], encoding
+        return entry, None
+
+    def _is_fresh(self, variant, request):
+        if request.if_none_match:
+            return request.if_none_match.contains(variant["etag"])
+        if request.if_modified_since is not None:
+            return int(variant["mtime"]) <= request.if_modified_since.timestamp()
+        return False
+
+    def serve(self, name, request):
+        """
+        Réponse Flask pour le téléchargement de name
+
+        Args:
+            name (str): Nom du fichier dans files/
+            request: Requête Flask (en-têtes conditionnels, Range, Accept-Encoding)
+
+        Returns:
+            Response: 200, 206 ou 304 ; None si le fichier n'existe pas
+        """
+        entry = self.lookup(name)
+        with self._lock:
+            self.requests += 1
+            if entry is None:
+                self.missing += 1
+        if entry is None:
+            return None
+        variant, encoding = self._select_variant(entry, request)
+        if self._is_fresh(variant, request):
+            response = Response(status=304)
+            response.set_etag(variant["etag"])
+            response.last_modified = variant["mtime"]
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+        else:
+            response = send_file(variant["path"], as_attachment=True, download_name=name, etag=variant["etag"],
+                                 last_modified=variant["mtime"], max_age=self.max_age, conditional=True)
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+        if entry["variants"]:
+            response.vary.add('Accept-Encoding')
+        with self._lock:
+            self.not_modified += response.status_code == 304
+            self.partial += response.status_code == 206
+            self.compressed += encoding is not None and response.status_code == 200
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._manifest[1]) if self._manifest is not None else 0,
+                "scans": self.scans,
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "partial": self.partial,
+                "compressed": self.compressed,
+                "missing": self.missing
+            }
+
+
+def precompress(directory=FILES_DIR, min_ratio=0.9):
+    """
+    Écrit les variantes .gz (et .br si brotli est installé) des fichiers de directory
+    qu'elles réduisent d'au moins 1 - min_ratio ; les variantes inutiles sont supprimées.
+
+    Returns:
+        dict: nom -> encodages écrits
+    """
+    written = {}
+    server = FileServer(directory)
+    for name in server.files():
+        with open(os.path.join(directory, name), 'rb') as f:
+            content = f.read()
+        compressors = [('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            compressors.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+        for encoding, suffix, compress in compressors:
+            variant_path = os.path.join(directory, name + suffix)
+            compressed = compress(content)
+            if len(compressed) <= len(content) * min_ratio:
+                with open(variant_path, 'wb') as f:
+                    f.write(compressed)
+                written.setdefault(name, []).append(encoding)
+            elif os.path.exists(variant_path):
+                os.remove(variant_path)
+    return written
+
+
+file_server = FileServer(FILES_DIR, download_check_interval, download_max_age, download_precompressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directory', default=FILES_DIR)
+    parser.add_argument('--min-ratio', type=float, default=0.9,
+                        help="taille compressée maximale (fraction de l'original) pour garder une variante")
+    args = parser.parse_args()
+    written = precompress(args.directory, args.min_ratio)
+    for name, encodings in written.items():
+        print(f"{name}: {', '.join(encodings)}")
+    print(f"{len(written)} fichier(s) précompressé(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+Module d'analyse des lacunes de la base (/api/self-learning/gaps)
+
+Les questions de data/new_questions.csv (réponses de similarité < 0.8) sont lues
+par blocs de CHUNK_SIZE lignes, sans charger le fichier entier, puis regroupées
+par un k-means en mini-lots (MiniBatchKMeans.partial_fit) sur la concaténation
+de leurs vecteurs TF-IDF et FastText normalisés. L'état tient en mémoire bornée
+(k centres, quelques compteurs et au plus REPRESENTATIVES questions par groupe)
+et est enregistré dans models/gap_clusters.joblib avec la position de lecture :
+chaque analyse ne traite que les lignes ajoutées depuis la précédente.
+
+Par groupe : nombre de questions, couverture (similarité TF-IDF moyenne de ses
+questions avec la question la plus proche de la base), catégorie prédite
+majoritaire et questions représentatives (les plus proches du centre à leur
+arrivée ; les centres se déplaçant ensuite, l'affectation est approximative).
+Les lacunes sont les plus grands groupes dont la couverture reste faible.
+"""
+import hashlib
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+from chatbot.config import gap_clusters, gap_max_coverage
+from chatbot.candidate_queue import predict_categories
+from chatbot.data_processing import preprocess_texts, document_vector, vectorizer, fasttext_model
+from chatbot.http_cache import file_signature
+from chatbot.retrieval import partitioned_index, _similarities
+
+NEW_QUESTIONS_FILE = 'data/new_questions.csv'
+STATE_PATH = 'models/gap_clusters.joblib'
+CHUNK_SIZE = 2048
+REPRESENTATIVES = 5
+# Part du TF-IDF dans la distance (le reste pour FastText)
+TFIDF_WEIGHT = 0.5
+# Deux représentantes dont les mots se recouvrent à ce point sont des variantes d'une même question
+NEAR_DUPLICATE_OVERLAP = 0.8
+
+
+def vocabulary_signature():
+    """Empreinte du vocabulaire TF-IDF : un état calculé avec un autre vocabulaire est repris de zéro."""
+    terms = '\n'.join(sorted(vectorizer.vocabulary_))
+    return hashlib.sha1(terms.encode('utf-8')).hexdigest()[:16]
+
+
+def near_duplicate(words, other_words):
+    """Coefficient de recouvrement des ensembles de mots au moins NEAR_DUPLICATE_OVERLAP."""
+    smallest = min(len(words), len(other_words))
+    return smallest > 0 and len(words & other_words) / smallest >= NEAR_DUPLICATE_OVERLAP
+
+
+def embed(questions):
+    """
+    Vecteurs des questions pour le regroupement, et leurs composantes utiles
+
+    Returns:
+        tuple: (matrice creuse TF-IDF + FastText, TF-IDF normalisé, questions prétraitées)
+    """
+    processed = preprocess_texts(questions)
+    tfidf = normalize(vectorizer.transform(processed))
+    ft = normalize(np.array([document_vector(p.split(), fasttext_model) for p in processed]))
+    features = sp.hstack([tfidf * np.sqrt(TFIDF_WEIGHT), sp.csr_matrix(ft) * np.sqrt(1 - TFIDF_WEIGHT)]).tocsr()
+    return features, tfidf, processed
+
+
+class GapState:
+    """Modèle de regroupement et statistiques par groupe, repris d'une analyse à l'autre."""
+
+    def __init__(self, n_clusters=gap_clusters):
+        self.n_clusters = n_clusters
+        self.vocabulary = vocabulary_signature()
+        self.model = None
+        self.pending = []  # questions en attente du premier ajustement (moins de n_clusters)
+        self.counts = np.zeros(n_clusters, dtype=np.int64)
+        self.coverage_sum = np.zeros(n_clusters)
+        self.categories = [Counter() for _ in range(n_clusters)]
+        self.representatives = [[] for _ in range(n_clusters)]  # tas de (-distance, question, mots prétraités)
+        self.last_seen = [None] * n_clusters
+        # Position de lecture : lignes déjà lues du fichier et horodatages de la première et de la dernière
+        self.rows_read = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.source_signature = None
+        self.updated_at = None
+
+    @property
+    def questions(self):
+        return int(self.counts.sum())
+
+    def add(self, questions, timestamps):
+        """Regroupe un bloc de questions (les premières attendent d'être au moins n_clusters)."""
+        questions = self.pending + list(questions)
+        timestamps = [self.last_timestamp] * len(self.pending) + list(timestamps)
+        if self.model is None and len(questions) < self.n_clusters:
+            self.pending = questions
+            return
+        self.pending = []
+        features, tfidf, processed = embed(questions)
+        if self.model is None:
+            self.model = MiniBatchKMeans(self.n_clusters, batch_size=CHUNK_SIZE, n_init=3, random_state=0)
+        self.model.partial_fit(features)
+        distances = self.model.transform(features)
+        labels = distances.argmin(axis=1)
+        distances = distances[np.arange(len(labels)), labels]
+        coverage = _similarities(tfidf, partitioned_index.global_scope["tfidf"]).max(axis=1)
+        categories, _ = predict_categories(processed)
+
+        np.add.at(self.counts, labels, 1)
+        np.add.at(self.coverage_sum, labels, coverage)
+        for question, text, label, distance, category, timestamp in zip(questions, processed, labels, distances,
+                                                                       categories, timestamps):
+            self.categories[label][category] += 1
+            self.last_seen[label] = max(filter(None, [self.last_seen[label], timestamp]), default=None)
+            heap = self.representatives[label]
+            # Une seule formulation par question (variantes de ponctuation, de politesse...)
+            words = frozenset(text.split())
+            if any(near_duplicate(words, other) for _, _, other in heap):
+                continue
+            if len(heap) < REPRESENTATIVES:
+                heapq.heappush(heap, (-distance, question, words))
+            elif -distance > heap[0][0]:
+                heapq.heapreplace(heap, (-distance, question, words))
+
+    def cluster(self, label):
+        size = int(self.counts[label])
+        category, category_count = self.categories[label].most_common(1)[0] if self.categories[label] else (None, 0)
+        return {
+            "id": int(label),
+            "size": size,
+            "share": size / self.questions if self.questions else 0.0,
+            "coverage": float(self.coverage_sum[label] / size) if size else 0.0,
+            "category": category,
+            "category_share": category_count / size if size else 0.0,
+            "questions": [q for _, q, _ in sorted(self.representatives[label], reverse=True)],
+            "last_seen": self.last_seen[label]
+        }
+
+    def report(self, limit=10, max_coverage=gap_max_coverage):
+        """Plus grands groupes de couverture inférieure à max_coverage."""
+        clusters = [self.cluster(label) for label in np.flatnonzero(self.counts)]
+        gaps = sorted((c for c in clusters if c["coverage"] < max_coverage), key=lambda c: -c["size"])
+        return {
+            "questions": self.questions,
+            "pending": len(self.pending),
+            "clusters": len(clusters),
+            "uncovered_clusters": len(gaps),
+            "max_coverage": max_coverage,
+            "updated_at": self.updated_at,
+            "gaps": gaps[:limit]
+        }
+
+
+def load_state(path=STATE_PATH):
+    """État enregistré, ou un état vide s'il est absent, illisible ou d'un autre vocabulaire."""
+    if os.path.exists(path):
+        try:
+            state = joblib.load(path)
+            if state.vocabulary == vocabulary_signature() and state.n_clusters == gap_clusters:
+                return state
+            print("Analyse des lacunes : vocabulaire ou nombre de groupes modifié, reprise de zéro")
+        except Exception as e:
+            print(f"Erreur lors du chargement de l'analyse des lacunes: {e}")
+    return GapState()
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def rebase_state(path=STATE_PATH):
+    """
+    Après réécriture de new_questions.csv (chatbot.maintenance) : la position de lecture
+    n'a plus de sens, la prochaine analyse reprend après le dernier horodatage lu.
+    """
+    if os.path.exists(path):
+        state = load_state(path)
+        state.first_timestamp = None
+        save_state(state, path)
+
+
+def iter_new_rows(state, path=NEW_QUESTIONS_FILE, chunk_size=CHUNK_SIZE):
+    """
+    Blocs (DataFrame question, timestamp) des lignes non encore lues de path
+
+    Si le début du fichier a changé (archivage, compaction), la lecture reprend au
+    début en ne gardant que les lignes plus récentes que la dernière lue. Une
+    dernière ligne incomplète (fichier en cours de réécriture) est laissée pour
+    l'analyse suivante. state.rows_read et state.last_timestamp avancent avec les blocs.
+    """
+    head = pd.read_csv(path, encoding='utf-8', dtype=str, nrows=1)
+    if head.empty:
+        return
+    first_timestamp = head['timestamp'].iloc[0]
+    if first_timestamp != state.first_timestamp:
+        state.rows_read = 0
+        state.first_timestamp = first_timestamp
+        after = state.last_timestamp
+    else:
+        after = None
+    # Nombre de lignes à sauter (en-tête compris) plutôt qu'une liste : mémoire constante
+    chunks = pd.read_csv(path, encoding='utf-8', header=None, names=list(head.columns),
+                         usecols=['question', 'timestamp'], dtype=str, chunksize=chunk_size,
+                         skiprows=state.rows_read + 1)
+    for chunk in chunks:
+        complete = chunk['timestamp'].notna()
+        if not complete.all():
+            chunk = chunk[:int(np.argmin(complete.to_numpy()))]
+        state.rows_read += len(chunk)
+        if after is not None:
+            chunk = chunk[chunk['timestamp'] > after]
+        chunk = chunk.dropna(subset=['question'])
+        if not chunk.empty:
+            state.last_timestamp = max(state.last_timestamp or '', chunk['timestamp'].max())
+            yield chunk
+        if not complete.all():
+            return
+
+
+class GapAnalysis:
+    """Mise à jour incrémentale de l'état ; run() peut être appelé directement ou dans un thread."""
+
+    def __init__(self, reset=False, path=NEW_QUESTIONS_FILE, state_path=STATE_PATH):
+        self.reset = reset
+        self.path = path
+        self.state_path = state_path
+        self.signature = file_signature(path)
+        self.status = 'pending'
+        self.rows = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.state = None
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "status": self.status,
+            "reset": self.reset,
+            "rows": self.rows,
+            "elapsed_seconds": elapsed,
+            "error": self.error
+        }
+
+    def run(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            # Toujours repris du fichier d'état (partagé entre processus), jamais modifié sur place
+            state = GapState() if self.reset else load_state(self.state_path)
+            signature = self.signature
+            if signature is not None and signature != state.source_signature:
+                for chunk in iter_new_rows(state, self.path):
+                    state.add(chunk['question'].astype(str).tolist(), chunk['timestamp'].tolist())
+                    self.rows += len(chunk)
+                state.source_signature = signature
+                state.updated_at = pd.Timestamp.now().isoformat()
+                save_state(state, self.state_path)
+            self.state = state
+            self.status = 'done'
+            print(f"Analyse des lacunes : {self.rows} nouvelles questions en {time.time() - self.started_at:.1f} s")
+        except Exception as e:
+            self.status = 'error'
+            self.error = str(e)
+            print(f"Erreur lors de l'analyse des lacunes: {e}")
+            raise
+        finally:
+            self.finished_at = time.time()
+        return self
+
+
+_state = None
+_job = None
+_job_lock = threading.Lock()
+
+
+def needs_update(path=NEW_QUESTIONS_FILE):
+    signature = file_signature(path)
+    return signature is not None and (_state is None or signature != _state.source_signature)
+
+
+def start_gap_analysis(reset=False):
+    """
+    Lance la mise à jour de l'analyse en arrière-plan (sauf si elle tourne déjà,
+    ou si elle a échoué sur le même fichier et que reset n'est pas demandé)
+
+    Args:
+        reset (bool): Regrouper à nouveau toutes les questions depuis le début
+
+    Returns:
+        GapAnalysis: Analyse lancée, en cours ou en erreur
+    """
+    global _job
+    with _job_lock:
+        if _job is not None and (_job.status in ('pending', 'running') or (
+                _job.status == 'error' and not reset and _job.signature == file_signature(NEW_QUESTIONS_FILE))):
+            return _job
+        _job = GapAnalysis(reset)
+        job = _job
+
+    def run():
+        global _state
+        try:
+            _state = job.run().state
+        except Exception:
+            pass  # erreur enregistrée dans l'analyse
+
+    threading.Thread(target=run, name='gap-analysis', daemon=True).start()
+    return job
+
+
+def get_gap_report(limit=10):
+    """
+    Dernier rapport des lacunes, et mise à jour lancée si de nouvelles questions sont arrivées
+
+    Returns:
+        tuple: (rapport ou None avant la première analyse, analyse en cours ou None)
+    """
+    global _state
+    if _state is None and os.path.exists(STATE_PATH):
+        _state = load_state()
+    job = start_gap_analysis() if needs_update() else None
+    if job is None and _job is not None and _job.status in ('pending', 'running'):
+        job = _job
+    return (_state.report(limit) if _state is not None else None), job
@@ -0,0 +1,57 @@
+"""
+Module du compteur de génération des modèles
+
+Chaque reconstruction des modèles (update_models) incrémente la génération,
+enregistrée dans models/generation.json pour être partagée entre processus ; les
+résultats dérivés des modèles (évaluations, caches) peuvent s'y référer.
+"""
+import json
+import os
+import threading
+import pandas as pd
+
+GENERATION_FILE = 'models/generation.json'
+
+_lock = threading.Lock()
+_cache = {"mtime_ns": None, "state": {"generation": 0}}
+
+
+def generation_info(path=GENERATION_FILE):
+    """État de la génération courante ({"generation": 0} avant la première reconstruction)."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return {"generation": 0}
+    if _cache["mtime_ns"] != mtime_ns:
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"generation": 0}
+        _cache.update(mtime_ns=mtime_ns, state=state)
+    return dict(_cache["state"])
+
+
+def current_generation(path=GENERATION_FILE):
+    return int(generation_info(path).get("generation", 0))
+
+
+def bump_generation(path=GENERATION_FILE, **info):
+    """
+    Passe à la génération suivante
+
+    Args:
+        path (str): Fichier de la génération
+        **info: Informations enregistrées avec la génération (lignes, origine...)
+
+    Returns:
+        int: Nouvelle génération
+    """
+    with _lock:
+        state = {"generation": current_generation(path) + 1, "updated_at": pd.Timestamp.now().isoformat(), **info}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    return state["generation"]
@@ -0,0 +1,173 @@
+"""
+Module de cache HTTP des routes JSON en lecture (tableaux de bord)
+
+cached_json(version) décore une route Flask : version() renvoie à peu de frais
+une valeur qui change quand les données changent (génération des modèles,
+signature de fichiers, compteur du magasin de chats). L'ETag faible en dérive,
+si bien que :
+- un If-None-Match à jour reçoit 304 sans exécuter la route ;
+- sinon, le corps construit pour cette version est réutilisé (un seul calcul
+  par version), avec ses variantes gzip/brotli compressées une fois, à un
+  niveau choisi selon la taille (fort pour les petits corps, modéré pour les
+  gros afin de borner le coût CPU).
+Les réponses d'erreur ne sont jamais mises en cache.
+"""
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:  # dépendance facultative : gzip seulement
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+MAX_ENTRIES = 256
+# (taille maximale du corps, niveau gzip, qualité brotli)
+COMPRESSION_LEVELS = [(64 * 1024, 9, 11), (1024 * 1024, 6, 6), (None, 4, 4)]
+
+
+def file_signature(path):
+    """(mtime_ns, taille) d'un fichier, None s'il n'existe pas : change à chaque réécriture."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compression_levels(size):
+    for max_size, gzip_level, brotli_quality in COMPRESSION_LEVELS:
+        if max_size is None or size <= max_size:
+            return gzip_level, brotli_quality
+
+
+def _compress(body, encoding):
+    gzip_level, brotli_quality = compression_levels(len(body))
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, gzip_level, mtime=0)
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES, min_compress_size=MIN_COMPRESS_SIZE):
+        self.max_entries = max_entries
+        self.min_compress_size = min_compress_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (route, requête) -> {"etag", "body", encodage: corps compressé}
+        self.not_modified = 0
+        self.hits = 0
+        self.builds = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def _entry(self, key, etag, view, args, kwargs):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["etag"] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, None
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return None, response
+        entry = {"etag": etag, "body": response.get_data(), "mimetype": response.mimetype}
+        with self._lock:
+            self.builds += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry, None
+
+    def _encoded_body(self, entry):
+        """Corps (éventuellement compressé selon Accept-Encoding) et encodage choisi."""
+        body = entry["body"]
+        if len(body) < self.min_compress_size:
+            return body, None
+        for encoding in self.encodings():
+            if request.accept_encodings[encoding]:
+                # Compressé au plus une fois par version ; deux calculs concurrents sont sans danger
+                if encoding not in entry:
+                    entry[encoding] = _compress(body, encoding)
+                return entry[encoding], encoding
+        return body, None
+
+    def respond(self, version, view, args, kwargs, max_age=0, private=False):
+        digest = hashlib.sha1(repr((request.path, request.query_string, version)).encode('utf-8')).hexdigest()[:20]
+        cache_control = {"private" if private else "public": True}
+        if max_age:
+            cache_control["max_age"] = max_age
+        else:
+            cache_control["no_cache"] = True  # conservé par le navigateur, revalidé à chaque appel
+        if request.if_none_match.contains_weak(digest):
+            response = Response(status=304)
+            with self._lock:
+                self.not_modified += 1
+        else:
+            key = (request.path, request.query_string)
+            entry, error_response = self._entry(key, digest, view, args, kwargs)
+            if error_response is not None:
+                return error_response
+            body, encoding = self._encoded_body(entry)
+            response = Response(body, mimetype=entry["mimetype"])
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+            with self._lock:
+                self.bytes_sent += len(body)
+                self.bytes_saved += len(entry["body"]) - len(body)
+        response.set_etag(digest, weak=True)
+        response.vary.add('Accept-Encoding')
+        for directive, value in cache_control.items():
+            setattr(response.cache_control, directive, value)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "not_modified": self.not_modified,
+                "hits": self.hits,
+                "builds": self.builds,
+                "bytes_sent": self.bytes_sent,
+                "bytes_saved": self.bytes_saved,
+                "encodings": list(self.encodings())
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cached_json(version, max_age=0, private=False):
+    """
+    Décorateur de route : ETag/Cache-Control, 304 et compression
+
+    Args:
+        version (callable): Sans argument ; valeur (repr stable) qui change avec les données
+        max_age (int): Durée de réutilisation sans revalidation (0 : revalider à chaque appel)
+        private (bool): Réponse propre à l'utilisateur (pas de cache partagé)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                current = version()
+            except Exception as e:
+                print(f"Version indisponible pour {request.path}: {e}")
+                return view(*args, **kwargs)
+            return response_cache.respond(current, view, args, kwargs, max_age, private)
+        return wrapper
+    return decorator
+
+
+def time_bucket(seconds):
+    """Version qui change toutes les seconds secondes (données sans compteur de changement)."""
+    return int(time.time() // seconds)
@@ -0,0 +1,272 @@
+"""
+Module d'import en masse dans la base de connaissances
+
+Le fichier (CSV ou JSONL, colonnes category, question, answer et url facultative)
+est lu par blocs de chunk_size lignes. Chaque bloc est validé, normalisé
+(preprocess_texts) puis dédupliqué de façon vectorisée :
+- doublons exacts (même question prétraitée) contre la base et les blocs
+  précédents, par empreintes 64 bits triées ;
+- quasi-doublons (similarité TF-IDF >= near_duplicate_threshold) contre la base.
+Les lignes retenues sont écrites dans un fichier intermédiaire : rien n'est
+modifié avant la validation finale, qui ajoute tout au CSV et au magasin en une
+seule fois (KnowledgeBase.append_chunks, sous le verrou d'écriture de la base
+partagé avec l'intégration des candidates ; tout est annulé en cas d'erreur,
+une seule notification des index) puis reconstruit les modèles une seule fois
+(nouvelle génération).
+
+Usage (depuis backend/) :
+    python -m chatbot.kb_import fichier.csv|fichier.jsonl [--dry-run] [--chunk-size 5000]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+import numpy as np
+import pandas as pd
+from chatbot.kb_store import DATA_PATH
+from chatbot.data_processing import get_knowledge_base, preprocess_texts, processed_questions
+from chatbot.candidate_queue import DuplicateIndex, DUPLICATE_THRESHOLD
+from chatbot.generation import current_generation
+from chatbot.self_learning import update_models
+
+REQUIRED_COLUMNS = ['category', 'question', 'answer']
+STAGED_COLUMNS = ['category', 'question', 'answer', 'url']
+MAX_QUESTION_LENGTH = 500
+CHUNK_SIZE = 5000
+MAX_JOBS = 20
+
+_import_lock = threading.Lock()  # un import à la fois
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def detect_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def read_chunks(path, fmt, chunk_size):
+    if fmt == 'jsonl':
+        with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, encoding='utf-8') as reader:
+            yield from reader
+    else:
+        yield from pd.read_csv(path, encoding='utf-8', chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+
+def _hash_keys(questions, processed):
+    # Question prétraitée ; la question en minuscules si le prétraitement ne laisse rien
+    keys = pd.Series(processed, dtype=object)
+    empty = keys.str.len() == 0
+    keys[empty] = pd.Series(questions, dtype=object)[empty].str.lower()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _in_sorted(values, sorted_keys):
+    if not len(sorted_keys):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_keys, values), len(sorted_keys) - 1)
+    return sorted_keys[positions] == values
+
+
+class ImportJob:
+    """Import d'un fichier ; run() peut être appelé directement (CLI) ou dans un thread (route)."""
+
+    def __init__(self, path, fmt=None, chunk_size=CHUNK_SIZE, near_duplicate_threshold=DUPLICATE_THRESHOLD,
+                 dry_run=False, remove_source=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.format = fmt or detect_format(path)
+        self.chunk_size = chunk_size
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.dry_run = dry_run
+        self.remove_source = remove_source
+        self.status = 'pending'
+        self.phase = None
+        self.rows_read = 0
+        self.accepted = 0
+        self.rejected = Counter()
+        self.added = None
+        self.generation = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "format": self.format,
+            "dry_run": self.dry_run,
+            "rows_read": self.rows_read,
+            "accepted": self.accepted,
+            "rejected": dict(self.rejected),
+            "added": self.added,
+            "generation": self.generation,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": self.rows_read / elapsed if elapsed else 0.0,
+            "error": self.error
+        }
+
+    def _validate(self, chunk):
+        """Bloc normalisé, masque des lignes valides et motifs de rejet comptés."""
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {missing}")
+        chunk = chunk.reindex(columns=STAGED_COLUMNS)
+        for column in STAGED_COLUMNS:
+            chunk[column] = chunk[column].fillna('').astype(str).str.strip()
+        for column in ('category', 'question'):
+            chunk[column] = chunk[column].str.replace(r'\s+', ' ', regex=True)
+        reasons = pd.Series(None, index=chunk.index, dtype=object)
+        # Le premier motif rencontré l'emporte
+        for reason, mask in [('question_trop_longue', chunk['question'].str.len() > MAX_QUESTION_LENGTH),
+                             ('categorie_vide', chunk['category'] == ''),
+                             ('reponse_vide', chunk['answer'] == ''),
+                             ('question_vide', chunk['question'] == '')]:
+            reasons[reasons.isna() & mask] = reason
+        self.rejected.update(reasons.dropna().tolist())
+        return chunk, reasons.isna().to_numpy()
+
+    def _deduplicate(self, chunk, processed, seen_keys, duplicates):
+        keys = _hash_keys(chunk['question'].tolist(), processed)
+        exact = _in_sorted(keys, seen_keys)
+        first = np.zeros(len(keys), dtype=bool)
+        first[np.unique(keys, return_index=True)[1]] = True
+        exact |= ~first
+        self.rejected['doublon'] += int(exact.sum())
+        keep = ~exact
+        if self.near_duplicate_threshold and keep.any():
+            positions = np.flatnonzero(keep)
+            near = duplicates.max_similarity([processed[i] for i in positions]) >= self.near_duplicate_threshold
+            self.rejected['quasi_doublon'] += int(near.sum())
+            keep[positions[near]] = False
+        return keep, np.union1d(seen_keys, keys[keep])
+
+    def _stage(self, staging_path):
+        """Lit, valide et déduplique le fichier ; écrit les lignes retenues dans staging_path."""
+        self.phase = 'validation'
+        kb = get_knowledge_base()
+        kb_processed = list(processed_questions[:len(kb)])
+        kb_processed += preprocess_texts(kb.questions[i] for i in range(len(kb_processed), len(kb)))
+        seen_keys = np.unique(_hash_keys(kb.questions.tolist(), kb_processed))
+        duplicates = DuplicateIndex(kb_processed) if self.near_duplicate_threshold else None
+        del kb_processed
+        for chunk in read_chunks(self.path, self.format, self.chunk_size):
+            self.rows_read += len(chunk)
+            chunk, valid = self._validate(chunk)
+            chunk = chunk[valid]
+            if not chunk.empty:
+                processed = preprocess_texts(chunk['question'].tolist())
+                keep, seen_keys = self._deduplicate(chunk, processed, seen_keys, duplicates)
+                chunk = chunk[keep]
+                chunk.to_csv(staging_path, mode='a', header=False, index=False, encoding='utf-8')
+                self.accepted += len(chunk)
+            print(f"Import {self.id}: {self.rows_read} lignes lues, {self.accepted} retenues, "
+                  f"{sum(self.rejected.values())} rejetées")
+
+    def _commit(self, staging_path):
+        """Ajoute les lignes retenues au CSV et au magasin, puis reconstruit les modèles une fois."""
+        self.phase = 'commit'
+        staged_chunks = pd.read_csv(staging_path, header=None, names=STAGED_COLUMNS, encoding='utf-8',
+                                    chunksize=self.chunk_size, dtype=str, keep_default_na=False)
+        added = get_knowledge_base().append_chunks(staged_chunks, DATA_PATH)
+        self.added = [added.start, added.stop]
+        self.phase = 'models'
+        update_models()
+        self.generation = current_generation()
+
+    def run(self):
+        if not _import_lock.acquire(blocking=False):
+            raise RuntimeError("Un import est déjà en cours")
+        return self._run_locked()
+
+    def _run_locked(self):
+        """Corps de run(), _import_lock déjà pris ; le relâche à la fin."""
+        self.status = 'running'
+        self.started_at = time.time()
+        staging_path = None
+        try:
+            fd, staging_path = tempfile.mkstemp(suffix='.csv', prefix='kb_import_')
+            os.close(fd)
+            self._stage(staging_path)
+            if self.accepted and not self.dry_run:
+                self._commit(staging_path)
+            self.status = 'done'
+        except Exception as e:
+            self.status = 'error'
+            self.error = str(e)
+            print(f"Erreur lors de l'import {self.id}: {e}")
+            raise
+        finally:
+            self.phase = None
+            self.finished_at = time.time()
+            if staging_path is not None:
+                os.remove(staging_path)
+            if self.remove_source:
+                os.remove(self.path)
+            _import_lock.release()
+        return self
+
+
+def start_import(path, **options):
+    """
+    Lance un import dans un thread et l'enregistre pour le suivi de progression
+
+    Returns:
+        ImportJob: Import lancé
+
+    Raises:
+        RuntimeError: Si un import est déjà en cours
+    """
+    # Le verrou est pris ici et confié au thread : deux appels simultanés ne
+    # peuvent pas lancer chacun un job qui échouerait ensuite sans être suivi
+    if not _import_lock.acquire(blocking=False):
+        raise RuntimeError("Un import est déjà en cours")
+    try:
+        job = ImportJob(path, **options)
+
+        def run():
+            try:
+                job._run_locked()
+            except Exception:
+                pass  # erreur enregistrée dans le job
+
+        thread = threading.Thread(target=run, name=f'kb-import-{job.id}', daemon=True)
+        with _jobs_lock:
+            _jobs[job.id] = job
+            while len(_jobs) > MAX_JOBS:
+                _jobs.popitem(last=False)
+        thread.start()
+    except BaseException:
+        _import_lock.release()
+        raise
+    return job
+
+
+def get_import(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'jsonl'])
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--near-duplicate-threshold', type=float, default=DUPLICATE_THRESHOLD,
+                        help="0 pour ne rejeter que les doublons exacts")
+    parser.add_argument('--dry-run', action='store_true', help="valider et dédupliquer sans rien écrire")
+    args = parser.parse_args()
+    job = ImportJob(args.path, args.format, args.chunk_size, args.near_duplicate_threshold, args.dry_run).run()
+    report = job.to_dict()
+    print(f"{report['rows_read']} lignes lues, {report['accepted']} retenues "
+          f"({'simulation' if job.dry_run else 'ajoutées'}), rejets: {report['rejected']}, "
+          f"{report['elapsed_seconds']:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+"""
+Module de stockage en colonnes de la base de connaissances du chatbot ISET
+
+Le CSV reste la source de vérité ; il est converti une seule fois en un magasin
+binaire (data/kb_store) composé de tables de chaînes mappées en mémoire. Les
+réponses, URLs et catégories sont dédupliquées : chaque ligne ne stocke qu'un
+identifiant vers la valeur unique correspondante.
+
+Plusieurs processus (workers, import en masse, intégration des candidates)
+peuvent ajouter des lignes : un ajout (CSV et magasin) se fait sous kb_write_lock
+(verrou du processus et verrou fcntl sur data/kb_store/.lock), après avoir relu
+toutes les colonnes depuis le disque ; les identifiants sont attribués sous ce
+verrou et le manifeste est écrit en dernier. Les lignes au-delà du nombre enregistré dans
+le manifeste (ajout interrompu) sont retirées à la prochaine ouverture ou au
+prochain ajout.
+"""
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import threading
+import numpy as np
+import pandas as pd
+from chatbot.config import kb_data_path
+
+DATA_PATH = kb_data_path
+STORE_DIR = 'data/kb_store'
+STORE_VERSION = 1
+INTERNED_COLUMNS = ['answer', 'url', 'category']
+
+_manifest_rows = {}  # chemin du manifeste -> (mtime_ns, lignes)
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité au processus
+    fcntl = None
+
+_write_lock = threading.RLock()
+_write_depth = 0  # profondeur de kb_write_lock dans le thread qui le détient
+_lock_file = None
+
+
+@contextlib.contextmanager
+def kb_write_lock(store_dir=STORE_DIR):
+    """
+    Verrou d'écriture de la base (CSV et magasin), entre threads et entre processus
+
+    Réentrant dans un même thread : un appelant peut garder le verrou autour de
+    KnowledgeBase.append_chunks, qui le prend aussi.
+    """
+    global _write_depth, _lock_file
+    with _write_lock:
+        if _write_depth == 0 and fcntl is not None:
+            os.makedirs(store_dir, exist_ok=True)
+            _lock_file = open(os.path.join(store_dir, '.lock'), 'a')
+            fcntl.flock(_lock_file, fcntl.LOCK_EX)
+        _write_depth += 1
+        try:
+            yield
+        finally:
+            _write_depth -= 1
+            if _write_depth == 0 and _lock_file is not None:
+                fcntl.flock(_lock_file, fcntl.LOCK_UN)
+                _lock_file.close()
+                _lock_file = None
+
+
+def _digest(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _save_array(path, array):
+    # Écriture atomique : les lecteurs qui ont déjà mappé l'ancien fichier gardent une vue cohérente
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_strings(path, strings, append=False):
+    encoded = [s.encode('utf-8') for s in strings]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    if append and os.path.exists(path + '.idx.npy'):
+        offsets = np.load(path + '.idx.npy')
+        start = offsets[-1]
+    else:
+        offsets = np.zeros(1, dtype=np.int64)
+        start = 0
+    with open(path + '.bin', 'ab' if append else 'wb') as f:
+        f.write(b''.join(encoded))
+    _save_array(path + '.idx.npy', np.concatenate([offsets, start + np.cumsum(lengths)]))
+
+
+def _truncate_strings(path, count):
+    """Ramène une table de chaînes à ses count premières valeurs."""
+    offsets = np.load(path + '.idx.npy')
+    if len(offsets) <= count + 1:
+        return
+    with open(path + '.bin', 'r+b') as f:
+        f.truncate(int(offsets[count]))
+    _save_array(path + '.idx.npy', offsets[:count + 1])
+
+
+class StringTable:
+    """Séquence de chaînes en lecture seule, décodées à la demande depuis un fichier mappé."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reload()
+
+    def reload(self):
+        self._offsets = np.load(self.path + '.idx.npy', mmap_mode='r')
+        with open(self.path + '.bin', 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index hors limites")
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def tolist(self):
+        return list(self)
+
+
+class InternedColumn:
+    """Colonne dont les valeurs sont dédupliquées : codes par ligne vers une table de valeurs uniques."""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = StringTable(path)
+        self.reload()
+
+    def reload(self):
+        self.values.reload()
+        self.codes = np.load(self.path + '.codes.npy', mmap_mode='r')
+        self.digests = np.load(self.path + '.digest.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.values[self.codes[int(index)]]
+
+    def __iter__(self):
+        for code in np.asarray(self.codes).tolist():
+            yield self.values[code]
+
+    def tolist(self):
+        decoded = self.values.tolist()
+        return [decoded[code] for code in np.asarray(self.codes).tolist()]
+
+    @staticmethod
+    def write(path, series):
+        codes, uniques = pd.factorize(series, sort=False)
+        _write_strings(path, uniques.tolist())
+        _save_array(path + '.codes.npy', codes.astype(np.int32))
+        _save_array(path + '.digest.npy', np.array([_digest(v) for v in uniques], dtype=np.uint64))
+
+    def truncate(self, rows):
+        """
+        Retire les codes au-delà de rows lignes et les valeurs écrites sans leur
+        empreinte (ajout interrompu) ; les valeurs devenues inutilisées restent.
+        """
+        if len(self.values) > len(self.digests):
+            _truncate_strings(self.path, len(self.digests))
+        if len(self.codes) > rows:
+            _save_array(self.path + '.codes.npy', np.array(self.codes[:rows]))
+        self.reload()
+
+    def append(self, values):
+        digests = np.array(self.digests)
+        # Empreinte -> codes des valeurs existantes (plusieurs en cas de collision)
+        by_digest = {}
+        for code, digest in enumerate(digests.tolist()):
+            by_digest.setdefault(digest, []).append(code)
+        new_values = []
+        codes = []
+        known = {}
+        for value in values:
+            if value in known:
+                codes.append(known[value])
+                continue
+            code = None
+            for candidate in by_digest.get(_digest(value), ()):
+                if self.values[candidate] == value:
+                    code = candidate
+                    break
+            if code is None:
+                code = len(digests) + len(new_values)
+                new_values.append(value)
+            known[value] = code
+            codes.append(code)
+        if new_values:
+            _write_strings(self.path, new_values, append=True)
+            _save_array(self.path + '.digest.npy', np.concatenate(
+                [digests, np.array([_digest(v) for v in new_values], dtype=np.uint64)]))
+        _save_array(self.path + '.codes.npy', np.concatenate(
+            [np.array(self.codes), np.array(codes, dtype=np.int32)]))
+        self.reload()
+
+
+class KnowledgeBase:
+    """
+    Base de connaissances servie depuis le magasin en colonnes.
+
+    Les attributs questions, responses, urls et categories se comportent comme des
+    listes indexables ; ils restent valides (et voient les nouvelles lignes) après append().
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self._listeners = []
+        self.questions = StringTable(os.path.join(store_dir, 'question'))
+        self.responses = InternedColumn(os.path.join(store_dir, 'answer'))
+        self.urls = InternedColumn(os.path.join(store_dir, 'url'))
+        self.categories = InternedColumn(os.path.join(store_dir, 'category'))
+        self.ids = np.load(os.path.join(store_dir, 'id.npy'), mmap_mode='r')
+
+    def reload(self):
+        """
+        Relit toutes les colonnes depuis le disque (lignes ajoutées par un autre
+        processus) et retire celles d'un ajout interrompu, absentes du manifeste.
+        À appeler sous kb_write_lock.
+        """
+        for column in (self.questions, self.responses, self.urls, self.categories):
+            column.reload()
+        self.ids = np.load(os.path.join(self.store_dir, 'id.npy'), mmap_mode='r')
+        rows = (_read_manifest(self.store_dir) or {}).get("rows")
+        if rows is None:
+            return
+        if len(self.questions) > rows:
+            _truncate_strings(self.questions.path, rows)
+            self.questions.reload()
+        for column in (self.responses, self.urls, self.categories):
+            column.truncate(rows)
+        if len(self.ids) > rows:
+            _save_array(os.path.join(self.store_dir, 'id.npy'), np.array(self.ids[:rows]))
+            self.ids = np.load(os.path.join(self.store_dir, 'id.npy'), mmap_mode='r')
+
+    @classmethod
+    def open(cls, csv_path=DATA_PATH, store_dir=STORE_DIR):
+        """
+        Ouvre le magasin, en le reconstruisant depuis le CSV s'il est absent ou périmé
+
+        Args:
+            csv_path (str): Chemin du CSV source
+            store_dir (str): Répertoire du magasin
+
+        Returns:
+            KnowledgeBase: Base de connaissances ouverte
+        """
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        with kb_write_lock(store_dir):
+            if not _is_fresh(csv_path, store_dir):
+                build_store(csv_path, store_dir)
+            kb = cls(store_dir)
+            kb.reload()
+        return kb
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def answer_ids(self):
+        return self.responses.codes
+
+    @property
+    def answers(self):
+        return self.responses.values
+
+    def max_id(self):
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    def add_listener(self, callback):
+        """Enregistre callback(start, stop), appelé après chaque ajout de lignes."""
+        self._listeners.append(callback)
+
+    def append(self, rows, csv_path=DATA_PATH):
+        """
+        Ajoute des lignes au CSV source et au magasin sans le reconstruire
+
+        Args:
+            rows (DataFrame): Lignes avec les colonnes category, question, answer, url
+                (les identifiants sont attribués à la suite de max_id())
+            csv_path (str): CSV source, complété par les mêmes lignes
+
+        Returns:
+            range: Indices des lignes ajoutées
+        """
+        return self.append_chunks([rows], csv_path)
+
+    def _write_rows(self, rows, csv_path, header):
+        _write_strings(os.path.join(self.store_dir, 'question'), rows['question'].astype(str).tolist(), append=True)
+        self.responses.append(rows['answer'].astype(str).tolist())
+        self.urls.append(rows['url'].astype(str).tolist())
+        self.categories.append(rows['category'].astype(str).tolist())
+        _save_array(os.path.join(self.store_dir, 'id.npy'), np.concatenate(
+            [np.array(self.ids), rows['id'].to_numpy(dtype=np.int64)]))
+        self.questions.reload()
+        self.ids = np.load(os.path.join(self.store_dir, 'id.npy'), mmap_mode='r')
+        rows.reindex(columns=header).to_csv(csv_path, mode='a', header=False, index=False, encoding='utf-8')
+
+    def append_chunks(self, chunks, csv_path=DATA_PATH):
+        """
+        Ajoute des blocs de lignes (itérable de DataFrame, consommé au fil de l'eau)
+        puis notifie les écouteurs une seule fois pour l'ensemble
+
+        Le magasin est relu sous kb_write_lock avant d'être étendu : les lignes
+        ajoutées entre-temps par un autre processus sont conservées, et notifiées
+        aux écouteurs avec les nouvelles. Chaque bloc reçoit ses identifiants à la
+        suite de max_id() et est ajouté au CSV après le magasin. En cas d'erreur,
+        le CSV est ramené à sa taille initiale et les lignes déjà écrites dans le
+        magasin sont retirées (le manifeste n'est écrit qu'à la fin).
+
+        Args:
+            chunks (iterable): Blocs (DataFrame) avec les colonnes category, question, answer, url
+            csv_path (str): CSV source, complété par les mêmes lignes
+
+        Returns:
+            range: Indices des lignes ajoutées depuis la dernière lecture du magasin
+        """
+        start = len(self)
+        with kb_write_lock(self.store_dir):
+            self.reload()
+            committed = len(self)
+            csv_size = os.path.getsize(csv_path)
+            header = pd.read_csv(csv_path, encoding='utf-8', nrows=0).columns
+            try:
+                for rows in chunks:
+                    if rows.empty:
+                        continue
+                    next_id = self.max_id() + 1
+                    rows = rows.assign(id=np.arange(next_id, next_id + len(rows), dtype=np.int64))
+                    self._write_rows(rows, csv_path, header)
+                if len(self) > committed:
+                    _write_manifest(csv_path, self.store_dir, len(self))
+            except BaseException:
+                with open(csv_path, 'r+b') as f:
+                    f.truncate(csv_size)
+                self.reload()
+                # Même contenu, nouvelle date de modification : le magasin reste à jour
+                _write_manifest(csv_path, self.store_dir, len(self))
+                self._notify(start)
+                raise
+        return self._notify(start)
+
+    def _notify(self, start):
+        added = range(start, len(self))
+        if not added:
+            return added
+        for callback in self._listeners:
+            try:
+                callback(added.start, added.stop)
+            except Exception as e:
+                print(f"Erreur lors de la notification d'ajout: {e}")
+        return added
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"source": os.path.abspath(csv_path), "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def _write_manifest(csv_path, store_dir, rows):
+    manifest = {"version": STORE_VERSION, "rows": rows, **_source_signature(csv_path)}
+    tmp_path = os.path.join(store_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(store_dir, 'manifest.json'))
+
+
+def store_rows(store_dir=STORE_DIR):
+    """
+    Lignes du magasin sur disque d'après son manifeste (0 s'il est absent)
+
+    Le manifeste est commun à tous les processus : il change dès que l'un d'eux
+    ajoute des lignes, même si les autres n'ont pas encore rechargé leur magasin.
+    Relu seulement quand sa date de modification change.
+    """
+    path = os.path.join(store_dir, 'manifest.json')
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+    cached = _manifest_rows.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        try:
+            with open(path, encoding='utf-8') as f:
+                cached = (mtime_ns, int(json.load(f).get("rows", 0)))
+        except (OSError, ValueError):
+            return 0
+        _manifest_rows[path] = cached
+    return cached[1]
+
+
+def _read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(csv_path, store_dir):
+    manifest = _read_manifest(store_dir)
+    if manifest is None:
+        return False
+    return manifest.get("version") == STORE_VERSION and all(
+        manifest.get(key) == value for key, value in _source_signature(csv_path).items())
+
+
+def build_store(csv_path=DATA_PATH, store_dir=STORE_DIR):
+    """
+    Convertit le CSV de la base de connaissances en magasin en colonnes
+
+    Args:
+        csv_path (str): Chemin du CSV source
+        store_dir (str): Répertoire de destination
+
+    Returns:
+        int: Nombre de lignes écrites
+    """
+    data = pd.read_csv(csv_path, encoding='utf-8', usecols=['id', 'category', 'question', 'answer', 'url'])
+    data = data.dropna(subset=['question', 'answer'])
+    os.makedirs(store_dir, exist_ok=True)
+    _write_strings(os.path.join(store_dir, 'question'), data['question'].astype(str).tolist())
+    for column in INTERNED_COLUMNS:
+        InternedColumn.write(os.path.join(store_dir, column), data[column].fillna('').astype(str))
+    ids = pd.to_numeric(data['id'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    _save_array(os.path.join(store_dir, 'id.npy'), ids)
+    _write_manifest(csv_path, store_dir, len(data))
+    print(f"Magasin de la base de connaissances construit: {len(data)} lignes")
+    return len(data)
@@ -0,0 +1,448 @@
+"""
+Module de maintenance des journaux (rétention, compaction, archivage)
+
+data/new_questions.csv et data/ratings.csv ne reçoivent que des ajouts en fin de
+fichier (LogFile.append). Toutes les maintenance_interval secondes, un thread de
+fond les réécrit à taille bornée :
+- compaction : lignes dont la question est déjà dans la base (intégrées) et
+  doublons (même clé normalisée : seule la plus récente est gardée) retirés ;
+- archivage : lignes de plus de retention_days jours, puis au-delà des
+  retention_max_rows plus récentes, ajoutées à data/archive/<journal>/AAAA-MM.csv.gz
+  (partition par mois de l'horodatage, un membre gzip par passage) ;
+- messages de chat de plus de chat_retention_days jours archivés de la même façon
+  (data/archive/chat_messages/) puis supprimés de data/chat_sessions.db.
+Les agrégats de toutes les lignes retirées (nombre, retours utiles et non utiles,
+raccourcis demandés, réponses données) sont cumulés dans data/archive/summary.json :
+/metrics, /report, le statut d'auto-apprentissage et l'autocomplétion les ajoutent
+aux fichiers chauds, leurs totaux ne changent donc pas à la maintenance.
+
+Un journal n'est verrouillé que pour noter sa taille, puis pour recopier les
+octets ajoutés pendant la réécriture et remplacer le fichier (os.replace) : les
+requêtes n'attendent jamais la lecture complète. Les verrous valent aussi entre
+processus (fcntl, hors Windows) et une seule maintenance tourne à la fois. Si le
+journal est réécrit entre-temps (intégration de candidates), la passe est abandonnée ;
+les lignes déjà archivées le seront de nouveau à la passe suivante.
+"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from chatbot.config import (maintenance_enabled, maintenance_interval, retention_days, retention_max_rows,
+                            chat_retention_days, shortcuts)
+from chatbot.data_processing import kb
+from chatbot.http_cache import file_signature
+from chatbot import gap_analysis
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrous limités au processus
+    fcntl = None
+
+ARCHIVE_DIR = 'data/archive'
+CHUNK_SIZE = 50000
+CHAT_BATCH_SIZE = 5000
+# Première passe après le démarrage, une fois les modèles chargés et le serveur prêt
+FIRST_RUN_DELAY = 60
+CHAT_ARCHIVE_COLUMNS = ['session_id', 'session_date', 'id', 'user_message', 'bot_answer', 'bot_url',
+                        'bot_similarity', 'bot_category', 'bot_is_shortcut', 'bot_method', 'timestamp']
+
+
+@contextlib.contextmanager
+def file_lock(path, blocking=True):
+    """Verrou exclusif entre processus sur path ; donne False si non bloquant et déjà pris."""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def normalize(values):
+    """Questions (ou clés) comparées sans casse ni espaces de bord."""
+    return values.fillna('').astype(str).str.strip().str.lower()
+
+
+def add_totals(total, delta):
+    """Ajoute récursivement les compteurs de delta à total (dictionnaires imbriqués)."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            add_totals(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class _Prefix(io.RawIOBase):
+    """Les size premiers octets d'un fichier ouvert (état du journal au moment du verrou)."""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        count = self.f.readinto(memoryview(buffer)[:self.remaining])
+        self.remaining -= count
+        return count
+
+
+class ArchiveWriter:
+    """Ajout de lignes à directory/AAAA-MM.csv.gz selon leur colonne timestamp (un membre gzip par ouverture)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def write(self, rows):
+        months = rows['timestamp'].fillna('').astype(str).str[:7].replace('', 'undated')
+        for month, part in rows.groupby(months):
+            f = self._files.get(month)
+            if f is None:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f'{month}.csv.gz')
+                new = not os.path.exists(path)
+                f = self._files[month] = gzip.open(path, 'at', encoding='utf-8', newline='')
+                if new:
+                    pd.DataFrame(columns=rows.columns).to_csv(f, index=False)
+            part.to_csv(f, header=False, index=False)
+
+
+class LogFile:
+    """Journal CSV en ajout seul, partagé par les threads et les processus du serveur"""
+
+    def __init__(self, path, columns, key_columns, totals):
+        """
+        Args:
+            path (str): Fichier CSV
+            columns (list): Colonnes d'un nouveau fichier (un fichier existant garde son en-tête)
+            key_columns (list): Colonnes dont l'égalité (normalisée) fait un doublon
+            totals (callable): Agrégats (dict) d'un DataFrame de lignes retirées
+        """
+        self.path = path
+        self.columns = columns
+        self.key_columns = key_columns
+        self.totals = totals
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Exclut les autres écritures du journal (ce processus et les autres)."""
+        with self._lock, file_lock(self.path + '.lock'):
+            yield
+
+    def header(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                line = f.readline().strip()
+        except FileNotFoundError:
+            return None
+        return line.split(',') if line else None
+
+    def append(self, row):
+        """Ajoute une ligne (dict) en fin de fichier, sans relire le journal."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.locked():
+            header = self.header()
+            pd.DataFrame([row]).reindex(columns=header or self.columns).to_csv(
+                self.path, mode='a', header=header is None, index=False, encoding='utf-8')
+
+    def remove_questions(self, questions):
+        """Réécrit le journal sans les lignes de ces questions (intégrées à la base)."""
+        with self.locked():
+            if not os.path.exists(self.path):
+                return
+            df = pd.read_csv(self.path, encoding='utf-8')
+            tmp_path = self.path + '.tmp'
+            df[~df['question'].isin(questions)].to_csv(tmp_path, index=False, encoding='utf-8')
+            os.replace(tmp_path, self.path)
+
+    def _chunks(self, size):
+        with open(self.path, 'rb') as f:
+            text = io.TextIOWrapper(io.BufferedReader(_Prefix(f, size)), encoding='utf-8', newline='')
+            with pd.read_csv(text, dtype=str, chunksize=CHUNK_SIZE) as reader:
+                yield from reader
+
+    def compact(self, cutoff, max_rows, known_questions, archive_dir, on_replaced):
+        """
+        Réécrit le journal : doublons et questions intégrées retirés, lignes antérieures
+        à cutoff ou au-delà des max_rows plus récentes archivées
+
+        Args:
+            cutoff (str): Horodatage ISO sous lequel une ligne est archivée
+            max_rows (int): Lignes gardées au plus dans le journal
+            known_questions (set): Questions normalisées de la base
+            archive_dir (str): Répertoire des archives
+            on_replaced (callable): Appelé avec les agrégats des lignes retirées, verrou tenu
+
+        Returns:
+            dict|None: Lignes lues, gardées, archivées et retirées (None sans journal ou si abandonné)
+        """
+        with self.locked():
+            if not os.path.exists(self.path) or self.header() is None:
+                return None
+            size = os.path.getsize(self.path)
+            inode = os.stat(self.path).st_ino
+
+        # Passe 1 : clés, lignes intégrées et récentes (quelques octets par ligne)
+        keys, integrated, recent = [], [], []
+        for chunk in self._chunks(size):
+            keys.append(pd.util.hash_pandas_object(
+                chunk[self.key_columns].apply(normalize), index=False).to_numpy())
+            integrated.append(normalize(chunk['question']).isin(known_questions).to_numpy())
+            recent.append((chunk['timestamp'].fillna('') >= cutoff).to_numpy())
+        if not keys:
+            return {"rows": 0, "kept": 0, "archived": 0, "dropped": 0}
+        keys, integrated, recent = np.concatenate(keys), np.concatenate(integrated), np.concatenate(recent)
+        # Dernière occurrence de chaque clé : première dans l'ordre inverse
+        _, first_reversed = np.unique(keys[::-1], return_index=True)
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[len(keys) - 1 - first_reversed] = True
+        keep &= ~integrated
+        hot = keep & recent
+        hot_rows = np.flatnonzero(hot)
+        if len(hot_rows) > max_rows:
+            hot[hot_rows[:len(hot_rows) - max_rows]] = False
+        archived = keep & ~hot
+
+        # Passe 2 : journal réécrit à côté, lignes archivées et agrégats des lignes retirées
+        tmp_path = self.path + '.compact'
+        totals = {}
+        position = 0
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as out, \
+                ArchiveWriter(os.path.join(archive_dir, self.name)) as writer:
+            pd.DataFrame(columns=self.header()).to_csv(out, index=False)
+            for chunk in self._chunks(size):
+                rows = slice(position, position + len(chunk))
+                position += len(chunk)
+                chunk[hot[rows]].to_csv(out, header=False, index=False)
+                if archived[rows].any():
+                    writer.write(chunk[archived[rows]])
+                if not hot[rows].all():
+                    add_totals(totals, self.totals(chunk[~hot[rows]]))
+
+        # Lignes ajoutées pendant la réécriture recopiées telles quelles, puis remplacement
+        with self.locked():
+            if not os.path.exists(self.path) or os.stat(self.path).st_ino != inode:
+                os.remove(tmp_path)
+                print(f"Maintenance de {self.path} abandonnée : journal réécrit pendant la compaction")
+                return None
+            with open(self.path, 'rb') as src, open(tmp_path, 'ab') as dst:
+                src.seek(size)
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, self.path)
+            on_replaced(self.name, totals)
+        return {"rows": len(keys), "kept": int(hot.sum()), "archived": int(archived.sum()),
+                "dropped": int((~keep).sum())}
+
+
+def new_questions_totals(rows):
+    questions = rows['question']
+    counts = questions[questions.isin(list(shortcuts))].value_counts()
+    return {"rows": len(rows), "shortcuts": {shortcut: int(count) for shortcut, count in counts.items()}}
+
+
+def ratings_totals(rows):
+    rating = rows['rating'].fillna('').str.lower()
+    return {"rows": len(rows), "positive": int((rating == 'true').sum()), "negative": int((rating == 'false').sum())}
+
+
+new_questions_log = LogFile('data/new_questions.csv', ['question', 'response', 'rating', 'timestamp'],
+                            ['question', 'response', 'rating'], new_questions_totals)
+ratings_log = LogFile('data/ratings.csv', ['question', 'rating', 'timestamp'], ['question', 'rating'],
+                      ratings_totals)
+
+
+class Maintenance:
+    def __init__(self, logs, archive_dir=ARCHIVE_DIR, interval=maintenance_interval, retention_days=retention_days,
+                 max_rows=retention_max_rows, chat_retention_days=chat_retention_days):
+        """
+        Args:
+            logs (list): Journaux (LogFile) à compacter
+            archive_dir (str): Répertoire des archives et de summary.json
+            interval (float): Secondes entre deux passes du thread de fond
+            retention_days (float): Âge au-delà duquel une ligne de journal est archivée
+            max_rows (int): Lignes gardées au plus par journal
+            chat_retention_days (float): Âge au-delà duquel un message de chat est archivé (0 : jamais)
+        """
+        self.logs = logs
+        self.archive_dir = archive_dir
+        self.summary_path = os.path.join(archive_dir, 'summary.json')
+        self.interval = interval
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.chat_retention_days = chat_retention_days
+        self.chat_store = None
+        self.runs = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_report = None
+        self.running = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._summary = (None, {})
+
+    def start(self, chat_store=None):
+        """Lance le thread de fond (si la maintenance est activée)."""
+        self.chat_store = chat_store
+        if not maintenance_enabled or self._thread is not None:
+            return
+
+        def loop():
+            time.sleep(FIRST_RUN_DELAY)
+            while True:
+                self.run()
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=loop, name='maintenance', daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        """Lance une passe immédiate en arrière-plan (sans effet si une passe tourne)."""
+        threading.Thread(target=self.run, name='maintenance-now', daemon=True).start()
+
+    def summary(self):
+        """Agrégats cumulés des lignes retirées, relus quand summary.json change."""
+        signature = file_signature(self.summary_path)
+        if signature != self._summary[0]:
+            totals = {}
+            if signature is not None:
+                with open(self.summary_path, encoding='utf-8') as f:
+                    totals = json.load(f)
+            self._summary = (signature, totals)
+        return self._summary[1]
+
+    def archived(self, name):
+        """Agrégats des lignes retirées du journal name (new_questions, ratings, chat_messages)."""
+        return self.summary().get(name, {})
+
+    def signature(self):
+        """Change à chaque mise à jour des agrégats (validation des caches HTTP)."""
+        return file_signature(self.summary_path)
+
+    def _add_summary(self, name, totals):
+        if not totals:
+            return
+        summary = json.loads(json.dumps(self.summary()))
+        add_totals(summary.setdefault(name, {}), totals)
+        summary["updated_at"] = pd.Timestamp.now().isoformat()
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = self.summary_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(tmp_path, self.summary_path)
+
+    def _compact_log(self, log, cutoff, known_questions):
+        gap_source = log.path == gap_analysis.NEW_QUESTIONS_FILE and os.path.exists(gap_analysis.STATE_PATH)
+        if gap_source:
+            # L'analyse des lacunes lit d'abord les lignes qui vont être archivées
+            job = gap_analysis.start_gap_analysis()
+            while job.status in ('pending', 'running'):
+                time.sleep(0.5)
+        report = log.compact(cutoff, self.max_rows, known_questions, self.archive_dir, self._add_summary)
+        if gap_source and report is not None:
+            gap_analysis.rebase_state()
+        return report
+
+    def _archive_chat(self, cutoff):
+        report = {"archived": 0, "sessions_deleted": 0}
+        while True:
+            rows = self.chat_store.oldest_messages(cutoff, CHAT_BATCH_SIZE)
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=CHAT_ARCHIVE_COLUMNS)
+            # Archive fermée (membre gzip complet) avant la suppression des messages
+            with ArchiveWriter(os.path.join(self.archive_dir, 'chat_messages')) as writer:
+                writer.write(frame)
+            sessions = self.chat_store.delete_messages(rows)
+            answers = frame['bot_answer'].dropna().value_counts()
+            self._add_summary('chat_messages', {"rows": len(rows), "sessions": sessions,
+                                                "answers": {a: int(c) for a, c in answers.items()}})
+            report["archived"] += len(rows)
+            report["sessions_deleted"] += sessions
+            if len(rows) < CHAT_BATCH_SIZE:
+                break
+        return report
+
+    def run(self):
+        """
+        Une passe de maintenance (ignorée si une autre tourne dans ce processus ou un autre)
+
+        Returns:
+            dict|None: Rapport par journal, None si la passe n'a pas eu lieu
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            with file_lock(os.path.join(self.archive_dir, '.lock'), blocking=False) as acquired:
+                if not acquired:
+                    return None
+                self.running = True
+                started = time.time()
+                now = pd.Timestamp.now()
+                cutoff = (now - pd.Timedelta(days=self.retention_days)).isoformat()
+                known_questions = set(normalize(pd.Series(list(kb.questions))))
+                report = {log.name: self._compact_log(log, cutoff, known_questions) for log in self.logs}
+                if self.chat_store is not None and self.chat_retention_days > 0:
+                    report["chat_messages"] = self._archive_chat(
+                        (now - pd.Timedelta(days=self.chat_retention_days)).isoformat())
+                report["elapsed_seconds"] = time.time() - started
+                self.runs += 1
+                self.last_run = now.isoformat()
+                self.last_report = report
+                print(f"Maintenance des journaux terminée en {report['elapsed_seconds']:.1f} s")
+                return report
+        except Exception as e:
+            self.errors += 1
+            print(f"Erreur lors de la maintenance des journaux: {e}")
+            return None
+        finally:
+            self.running = False
+            self._lock.release()
+
+    def stats(self):
+        return {
+            "enabled": maintenance_enabled,
+            "interval_seconds": self.interval,
+            "retention_days": self.retention_days,
+            "max_rows": self.max_rows,
+            "chat_retention_days": self.chat_retention_days,
+            "running": self.running,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "last_report": self.last_report,
+            "hot_bytes": {log.name: (file_signature(log.path) or (None, 0))[1] for log in self.logs},
+            "archived_rows": {name: totals.get("rows", 0) for name, totals in self.summary().items()
+                              if isinstance(totals, dict)}
+        }
+
+
+maintenance = Maintenance([new_questions_log, ratings_log])
@@ -0,0 +1,178 @@
+"""
+Module de profilage à la demande (désactivé par défaut)
+
+- Échantillonneur : pendant une capture, un thread relève toutes les
+  interval_ms millisecondes la pile des threads qui traitent une requête de chat
+  (ceux entrés dans track()) et compte les piles repliées (format flamegraph).
+- Capture cProfile : pendant une capture au format pstats, chaque requête suivie
+  est profilée et les statistiques sont fusionnées.
+- Profil d'une seule requête : profile_call().
+
+Désactivé, track() renvoie un contexte vide partagé et wrap() la fonction
+d'origine : le chemin de get_response ne paie qu'un test de booléen.
+"""
+import contextlib
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from chatbot.config import profiling_enabled, profiling_interval_ms
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler:
+    def __init__(self, enabled=False, interval_ms=10):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000.0
+        self._lock = threading.Lock()
+        self._capture_lock = threading.Lock()  # une capture à la fois
+        self._tracked = Counter()  # thread id -> requêtes suivies en cours
+        self._stacks = None  # Counter pendant une capture échantillonnée
+        self._profiles = None  # liste de cProfile.Profile pendant une capture pstats
+        self.captures = 0
+        self.samples = 0
+
+    def track(self):
+        """Contexte entourant le traitement d'une requête (sans effet si désactivé)."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._tracking()
+
+    @contextlib.contextmanager
+    def _tracking(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._tracked[thread_id] += 1
+            collect_profile = self._profiles is not None
+        profile = _start_profile() if collect_profile else None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    if self._profiles is not None:
+                        self._profiles.append(profile)
+            with self._lock:
+                self._tracked[thread_id] -= 1
+                if not self._tracked[thread_id]:
+                    del self._tracked[thread_id]
+
+    def wrap(self, fn):
+        """fn entourée de track() (fn elle-même si le profilage est désactivé)."""
+        if not self.enabled:
+            return fn
+
+        def tracked(*args, **kwargs):
+            with self._tracking():
+                return fn(*args, **kwargs)
+        return tracked
+
+    def _sample(self, stop):
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            with self._lock:
+                tracked = set(self._tracked)
+            frames = sys._current_frames()
+            stacks = [_collapse(frames[t]) for t in tracked if t != own and t in frames]
+            del frames
+            with self._lock:
+                for stack in stacks:
+                    self._stacks[stack] += 1
+                self.samples += len(stacks)
+
+    def capture(self, seconds, fmt='collapsed', stop=None):
+        """
+        Profile les requêtes suivies pendant seconds secondes
+
+        Args:
+            seconds (float): Durée de la capture
+            fmt (str): 'collapsed' (piles repliées, une par ligne avec leur nombre
+                d'échantillons) ou 'pstats' (statistiques cProfile fusionnées)
+            stop (threading.Event): Termine la capture avant seconds s'il est levé
+
+        Returns:
+            str|bytes: Texte des piles repliées ou contenu d'un fichier .prof
+        """
+        if not self._capture_lock.acquire(blocking=False):
+            raise RuntimeError("Une capture est déjà en cours")
+        stop = stop or threading.Event()
+        try:
+            self.captures += 1
+            if fmt == 'pstats':
+                with self._lock:
+                    self._profiles = []
+                stop.wait(seconds)
+                with self._lock:
+                    profiles, self._profiles = self._profiles, None
+                return marshal.dumps(pstats.Stats(*profiles).stats if profiles else {})
+            with self._lock:
+                self._stacks = Counter()
+            sampler_stop = threading.Event()
+            sampler = threading.Thread(target=self._sample, args=(sampler_stop,), name='profiler-sampler', daemon=True)
+            sampler.start()
+            stop.wait(seconds)
+            sampler_stop.set()
+            sampler.join()
+            with self._lock:
+                stacks, self._stacks = self._stacks, None
+            return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._capture_lock.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "interval_ms": self.interval * 1000,
+                "tracked_threads": len(self._tracked),
+                "capturing": self._stacks is not None or self._profiles is not None,
+                "captures": self.captures,
+                "samples": self.samples
+            }
+
+
+def _start_profile():
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python >= 3.12 : un seul profileur actif à la fois
+        return None
+    return profile
+
+
+def profile_call(fn, *args, limit=30, **kwargs):
+    """
+    Exécute fn sous cProfile
+
+    Returns:
+        tuple: (résultat de fn, les limit fonctions les plus coûteuses en temps cumulé)
+    """
+    profile = _start_profile()
+    if profile is None:
+        return fn(*args, **kwargs), "Profileur déjà actif"
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profile.disable()
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(limit)
+    return result, out.getvalue()
+
+
+profiler = Profiler(profiling_enabled, profiling_interval_ms)
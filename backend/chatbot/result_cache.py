@@ -0,0 +1,280 @@
+"""
+Module de cache des réponses calculées par la cascade (get_response)
+
+Deux niveaux :
+- niveau 1 : LRU en mémoire du processus ;
+- niveau 2 : magasin partagé, consulté après un défaut du niveau 1 —
+  SQLite en mode WAL (un fichier commun à tous les workers de la machine) ou
+  serveur Redis (url redis://..., paquet redis facultatif) pour plusieurs machines.
+Les clés commencent par l'espace de noms g{génération}-r{lignes du magasin} ; les
+deux valeurs sont lues sur disque (models/generation.json, manifeste de
+data/kb_store) et donc communes à tous les processus : une reconstruction des
+modèles (update_models) ou l'ajout de lignes à la base par n'importe quel worker
+rend les anciennes entrées inaccessibles partout, sans purge ; elles expirent
+après ttl secondes (la purge périodique de SQLite les supprime, Redis les expire
+seul). Un worker dont la base en mémoire est en retard sur le magasin n'écrit
+plus dans le niveau partagé : ses réponses ne remplacent pas celles des autres.
+Les valeurs sont en JSON compact, compressé par zlib au-delà de COMPRESS_MIN_SIZE.
+Une erreur du magasin partagé n'est jamais propagée : elle compte comme un défaut.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from chatbot.config import result_cache_enabled, result_cache_shared, result_cache_ttl, result_cache_local_size, \
+    result_cache_max_entries
+from chatbot.data_processing import get_knowledge_base
+from chatbot.generation import current_generation
+from chatbot.kb_store import store_rows
+
+try:
+    import redis
+except ImportError:  # dépendance facultative : magasin Redis indisponible
+    redis = None
+
+COMPRESS_MIN_SIZE = 512
+# Purge des entrées expirées (et des plus anciennes au-delà de max_entries) toutes les PURGE_EVERY écritures
+PURGE_EVERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires);
+"""
+
+
+def encode(value):
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    if len(data) >= COMPRESS_MIN_SIZE:
+        return b'z' + zlib.compress(data)
+    return b'j' + data
+
+
+def decode(blob):
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == b'z' else blob[1:]
+    return json.loads(data)
+
+
+class SQLiteResultStore:
+    """Magasin partagé par les processus de la machine (un fichier SQLite en WAL)."""
+
+    name = "sqlite"
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # Une connexion par thread (serveur WSGI multi-threadé)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value FROM results WHERE key = ? AND expires > ?",
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, blob, ttl):
+        self._conn().execute("INSERT OR REPLACE INTO results (key, expires, value) VALUES (?, ?, ?)",
+                             (key, time.time() + ttl, blob))
+
+    def purge(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+        # Au-delà de la limite, les entrées les plus proches de l'expiration partent d'abord
+        conn.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY expires DESC "
+                     "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class RedisResultStore:
+    """Magasin partagé par plusieurs machines (serveur Redis, expiration native)."""
+
+    name = "redis"
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("Le paquet redis est requis pour un cache de résultats redis://")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, blob, ttl):
+        self.client.set(key, blob, ex=max(1, int(ttl)))
+
+    def purge(self):
+        pass
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+def open_shared_store(location, max_entries=100000):
+    """Magasin partagé désigné par location : url redis://, chemin SQLite, ou vide (aucun)."""
+    if not location:
+        return None
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisResultStore(location)
+    return SQLiteResultStore(location, max_entries)
+
+
+def default_namespace():
+    return f"g{current_generation()}-r{store_rows()}"
+
+
+def kb_is_current():
+    """La base chargée par ce processus contient toutes les lignes du magasin partagé."""
+    return len(get_knowledge_base()) >= store_rows()
+
+
+class ResultCache:
+    def __init__(self, shared=None, local_size=1024, ttl=3600, namespace=default_namespace, enabled=True,
+                 is_current=kb_is_current):
+        """
+        Args:
+            namespace (callable): Préfixe des clés, commun à tous les processus
+            is_current (callable): Faux si les réponses calculées par ce processus sont
+                périmées (elles ne sont alors pas écrites dans le niveau partagé)
+        """
+        self.enabled = enabled
+        self.shared = shared
+        self.local_size = local_size
+        self.ttl = ttl
+        self.namespace = namespace
+        self.is_current = is_current
+        self._lock = threading.Lock()
+        self._local = OrderedDict()  # clé -> (expiration, réponse)
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        self.writes = 0
+        self.stale_skips = 0
+
+    def key(self, query):
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:24]
+        return f"{self.namespace()}:{digest}"
+
+    def get(self, query):
+        """
+        Réponse en cache pour la requête normalisée query
+
+        Returns:
+            dict: Copie de la réponse, ou None si aucun niveau ne l'a
+        """
+        if not self.enabled:
+            return None
+        key = self.key(query)
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > now:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return dict(entry[1])
+        if self.shared is None:
+            with self._lock:
+                self.shared_misses += 1
+            return None
+        try:
+            blob = self.shared.get(key)
+            value = decode(blob) if blob is not None else None
+        except Exception as e:
+            print(f"Erreur du cache de résultats partagé ({self.shared.name}): {e}")
+            blob, value = None, None
+            with self._lock:
+                self.shared_errors += 1
+        with self._lock:
+            if value is None:
+                self.shared_misses += 1
+                return None
+            self.shared_hits += 1
+            # Durée restante inconnue côté partagé : le niveau 1 garde l'entrée au plus ttl
+            self._remember(key, now + self.ttl, value)
+        return dict(value)
+
+    def _remember(self, key, expires, value):
+        self._local[key] = (expires, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def put(self, query, response):
+        if not self.enabled:
+            return
+        key = self.key(query)
+        value = dict(response)
+        with self._lock:
+            self._remember(key, time.time() + self.ttl, value)
+            self.writes += 1
+            purge = self.writes % PURGE_EVERY == 0
+        if self.shared is None:
+            return
+        if not self.is_current():
+            with self._lock:
+                self.stale_skips += 1
+            return
+        try:
+            self.shared.set(key, encode(value), self.ttl)
+            if purge:
+                self.shared.purge()
+        except Exception as e:
+            print(f"Erreur du cache de résultats partagé ({self.shared.name}): {e}")
+            with self._lock:
+                self.shared_errors += 1
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.shared_misses
+            shared_lookups = self.shared_hits + self.shared_misses
+            stats = {
+                "enabled": self.enabled,
+                "backend": self.shared.name if self.shared is not None else None,
+                "lookups": lookups,
+                "local_entries": len(self._local),
+                "local_hits": self.local_hits,
+                "local_hit_rate": self.local_hits / lookups if lookups else 0.0,
+                "shared_hits": self.shared_hits,
+                "shared_misses": self.shared_misses,
+                "shared_hit_rate": self.shared_hits / shared_lookups if shared_lookups else 0.0,
+                "shared_errors": self.shared_errors,
+                "hit_rate": (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "stale_skips": self.stale_skips
+            }
+        return stats
+
+
+def _open_default_store():
+    try:
+        return open_shared_store(result_cache_shared, result_cache_max_entries) if result_cache_enabled else None
+    except Exception as e:
+        print(f"Cache de résultats partagé indisponible ({result_cache_shared}): {e}")
+        return None
+
+
+result_cache = ResultCache(_open_default_store(), result_cache_local_size, result_cache_ttl,
+                           enabled=result_cache_enabled)
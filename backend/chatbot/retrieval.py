@@ -0,0 +1,429 @@
+"""
+Module de recherche partitionnée par catégorie et regroupée par réponse
+
+Les matrices de la base (TF-IDF, Word2Vec, FastText) sont découpées en une
+sous-matrice par catégorie. La requête n'est comparée qu'aux partitions des
+catégories les plus probables selon Naive Bayes ; la recherche globale n'est
+utilisée que lorsque la prédiction est peu sûre.
+
+Dans chaque partition, les questions sont aussi regroupées par identifiant de
+réponse (les réponses sont dédupliquées par le magasin kb_store) : on peut
+classer les réponses (agrégation max ou moyenne sur les paraphrases) et, en
+option, faire une première passe sur le centroïde de chaque réponse avant de ne
+noter que les paraphrases des meilleures réponses.
+
+top_matches renvoie les k meilleures lignes en une seule passe (argpartition sur
+les scores denses, top-k calculé directement sur le produit creux pour TF-IDF) ;
+la première colonne est toujours celle d'argmax. top_answers a la même forme mais
+ne garde qu'une ligne par réponse (sa meilleure paraphrase) : c'est elle qu'utilise
+la cascade de chatbot_logic, dont les alternatives sont ainsi des réponses
+distinctes.
+"""
+import threading
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from chatbot.config import (partition_min_confidence, partition_max_categories,
+                            answer_centroid_first_pass, answer_centroid_candidates)
+from chatbot.data_processing import (kb, categories, preprocess_rows, document_vector, vectorizer, tfidf_matrix, word2vec_model,
+                                     fasttext_model, w2v_question_vectors, fasttext_question_vectors)
+
+def _stack(a, b):
+    return sp.vstack([a, b], format='csr') if sp.issparse(a) else np.vstack([a, b])
+
+
+def _similarities(queries, matrix):
+    sims = queries @ matrix.T
+    return sims.toarray() if sp.issparse(sims) else np.asarray(sims)
+
+
+def _dense_top_k(sims, k):
+    """k meilleures positions de chaque ligne, triées ; la première est celle d'argmax."""
+    n, m = sims.shape
+    k = min(k, m)
+    if k == 1:
+        positions = sims.argmax(axis=1)[:, None]
+        return positions, np.take_along_axis(sims, positions, axis=1)
+    positions = np.argpartition(-sims, k - 1, axis=1)[:, :k] if m > k else np.tile(np.arange(m), (n, 1))
+    values = np.take_along_axis(sims, positions, axis=1)
+    order = np.lexsort((positions, -values), axis=-1)
+    positions = np.take_along_axis(positions, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    # Égalités au rang k : argpartition peut écarter la position qu'argmax aurait choisie
+    best = sims.argmax(axis=1)
+    positions[:, 0] = best
+    values[:, 0] = sims[np.arange(n), best]
+    return positions, values
+
+
+def _sparse_top_k(product, k):
+    """
+    _dense_top_k sur un produit creux à valeurs positives (TF-IDF), sans le densifier :
+    seuls les termes non nuls de chaque ligne sont triés. Les places manquantes sont
+    complétées par la position -1 (similarité -inf) ; une ligne nulle donne la position 0.
+    """
+    product = product.tocsr()
+    n = product.shape[0]
+    k = min(k, product.shape[1])
+    positions = np.full((n, k), -1, dtype=np.int64)
+    values = np.full((n, k), -np.inf)
+    for i in range(n):
+        start, end = product.indptr[i], product.indptr[i + 1]
+        columns, data = product.indices[start:end], product.data[start:end]
+        if len(data) > k:
+            keep = np.argpartition(-data, k - 1)[:k]
+            # Comme pour _dense_top_k : la position d'argmax est conservée en cas d'égalité au rang k
+            best = np.flatnonzero(data == data.max())
+            best = best[columns[best].argmin()]
+            if best not in keep:
+                keep[k - 1] = best
+            columns, data = columns[keep], data[keep]
+        order = np.lexsort((columns, -data))
+        positions[i, :len(order)] = columns[order]
+        values[i, :len(order)] = data[order]
+        if not len(order):
+            positions[i, 0], values[i, 0] = 0, 0.0
+    return positions, values
+
+
+def _answer_top_k(scope, sims, k, how='max'):
+    """
+    k meilleures réponses de la partition pour chaque ligne de sims (requêtes x lignes)
+
+    Returns:
+        tuple: (positions de la meilleure paraphrase de chaque réponse, scores agrégés),
+        triés par score décroissant ; -1 (score -inf) pour les places non remplies.
+        Avec l'agrégation max, la première position est celle d'argmax, comme _dense_top_k.
+    """
+    order, offsets = scope["member_order"], scope["offsets"]
+    grouped = sims[:, order]
+    if how == 'mean':
+        scores = np.add.reduceat(grouped, offsets[:-1], axis=1) / scope["counts"]
+    else:
+        scores = np.maximum.reduceat(grouped, offsets[:-1], axis=1)
+    answers, values = _dense_top_k(scores, k)
+    if how != 'mean':
+        # À égalité de score, la réponse de la ligne d'argmax passe devant (mêmes scores : seul l'ordre change)
+        lead = scope["inverse"][sims.argmax(axis=1)]
+        for i in range(len(answers)):
+            where = np.flatnonzero(answers[i] == lead[i])
+            j = where[0] if len(where) else answers.shape[1] - 1
+            answers[i, 1:j + 1] = answers[i, :j].copy()
+            answers[i, 0] = lead[i]
+    positions = np.empty_like(answers)
+    for i, j in np.ndindex(answers.shape):
+        segment = order[offsets[answers[i, j]]:offsets[answers[i, j] + 1]]
+        positions[i, j] = segment[sims[i, segment].argmax()]
+    positions[~np.isfinite(values)] = -1
+    return positions, values
+
+
+def _make_scope(rows, answers, matrices):
+    """
+    Partition (ou base entière) : lignes globales, identifiants de réponse, matrices
+    normalisées et regroupement des lignes par réponse avec les centroïdes associés.
+    """
+    answer_ids, inverse = np.unique(answers, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(answer_ids))
+    membership = sp.csr_matrix((np.ones(len(rows)), (inverse, np.arange(len(rows)))),
+                               shape=(len(answer_ids), len(rows)))
+    scope = {
+        "rows": rows,
+        "answers": answers,
+        "answer_ids": answer_ids,
+        "inverse": inverse,
+        "counts": counts,
+        "member_order": np.argsort(inverse, kind='stable'),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]),
+        "centroids": {}
+    }
+    for name, matrix in matrices.items():
+        scope[name] = matrix
+        centroids = membership @ matrix
+        scope["centroids"][name] = normalize(sp.csr_matrix(centroids) if sp.issparse(matrix) else np.asarray(centroids))
+    return scope
+
+
+def _extend_scope(scope, rows, answers, matrices):
+    return _make_scope(np.concatenate([scope["rows"], rows]), np.concatenate([scope["answers"], answers]),
+                       {name: _stack(scope[name], matrix) for name, matrix in matrices.items()})
+
+
+def _candidate_positions(scope, query_sims_to_centroids, n_candidates):
+    """Positions (dans la partition) des paraphrases des réponses aux meilleurs centroïdes."""
+    n_answers = len(query_sims_to_centroids)
+    if n_answers > n_candidates:
+        top = np.argpartition(-query_sims_to_centroids, n_candidates - 1)[:n_candidates]
+    else:
+        top = np.arange(n_answers)
+    order, offsets = scope["member_order"], scope["offsets"]
+    return np.concatenate([order[offsets[a]:offsets[a + 1]] for a in top])
+
+
+class PartitionedIndex:
+    def __init__(self, min_confidence=0.8, max_categories=2, centroid_first_pass=False, centroid_candidates=8):
+        self.min_confidence = min_confidence
+        self.max_categories = max_categories
+        self.centroid_first_pass = centroid_first_pass
+        self.centroid_candidates = centroid_candidates
+        self.partitions = {}  # catégorie -> partition (voir _make_scope)
+        self.global_scope = None
+        self._lock = threading.Lock()
+        self.routed_queries = 0
+        self.global_queries = 0
+        self.rows_scanned = 0
+
+    def add(self, row_categories, row_ids, row_answers, matrices):
+        """
+        Ajoute des lignes (normalisées L2) à la recherche globale et à leur partition
+
+        Args:
+            row_categories (list): Catégorie de chaque ligne
+            row_ids (array): Indices des lignes dans la base
+            row_answers (array): Identifiant de réponse (kb.answer_ids) de chaque ligne
+            matrices (dict): nom -> matrice (une ligne par élément de row_ids)
+        """
+        matrices = {name: normalize(matrix) for name, matrix in matrices.items()}
+        row_categories = np.asarray(row_categories, dtype=object)
+        row_ids = np.asarray(row_ids)
+        row_answers = np.asarray(row_answers)
+        with self._lock:
+            # Copie sur écriture : les recherches en cours gardent l'ancienne version
+            partitions = dict(self.partitions)
+            if self.global_scope is None:
+                global_scope = _make_scope(row_ids, row_answers, matrices)
+            else:
+                global_scope = _extend_scope(self.global_scope, row_ids, row_answers, matrices)
+            for category in dict.fromkeys(row_categories):
+                mask = row_categories == category
+                part = {name: matrix[mask] for name, matrix in matrices.items()}
+                if category in partitions:
+                    partitions[category] = _extend_scope(partitions[category], row_ids[mask], row_answers[mask], part)
+                else:
+                    partitions[category] = _make_scope(row_ids[mask], row_answers[mask], part)
+            self.global_scope, self.partitions = global_scope, partitions
+
+    def route(self, proba, classes):
+        """
+        Catégories à interroger pour une distribution de probabilités Naive Bayes
+
+        Returns:
+            tuple|None: Les 1 à max_categories catégories les plus probables dont la
+            probabilité cumulée atteint min_confidence, sinon None (recherche globale)
+        """
+        chosen = []
+        cumulative = 0.0
+        for i in np.argsort(proba)[::-1][:self.max_categories]:
+            chosen.append(classes[i])
+            cumulative += proba[i]
+            if cumulative >= self.min_confidence:
+                return tuple(c for c in chosen if c in self.partitions) or None
+        return None
+
+    def _scopes(self, route):
+        partitions = self.partitions
+        return [self.global_scope] if route is None else [partitions[c] for c in route]
+
+    def _scope_top(self, scope, name, queries, k):
+        """k meilleures lignes de la partition pour chaque requête : (positions, similarités, lignes notées)."""
+        if not self.centroid_first_pass:
+            product = queries @ scope[name].T
+            scanned = product.shape[0] * product.shape[1]
+            if sp.issparse(product):
+                positions, values = _sparse_top_k(product, k)
+            else:
+                positions, values = _dense_top_k(np.asarray(product), k)
+            return positions, values, scanned
+        centroid_sims = _similarities(queries, scope["centroids"][name])
+        n = queries.shape[0]
+        positions = np.full((n, k), -1, dtype=np.int64)
+        values = np.full((n, k), -np.inf)
+        scanned = centroid_sims.size
+        for i in range(n):
+            candidates = _candidate_positions(scope, centroid_sims[i], self.centroid_candidates)
+            local, local_values = _dense_top_k(_similarities(queries[i:i + 1], scope[name][candidates]), k)
+            positions[i, :local.shape[1]] = candidates[local[0]]
+            values[i, :local.shape[1]] = local_values[0]
+            scanned += len(candidates)
+        return positions, values, scanned
+
+    def _scope_answers(self, scope, name, queries, k, how):
+        """k meilleures réponses de la partition pour chaque requête : (positions, scores, lignes notées)."""
+        if not self.centroid_first_pass:
+            sims = _similarities(queries, scope[name])
+            positions, values = _answer_top_k(scope, sims, k, how)
+            return positions, values, sims.size
+        centroid_sims = _similarities(queries, scope["centroids"][name])
+        n = queries.shape[0]
+        positions = np.full((n, k), -1, dtype=np.int64)
+        values = np.full((n, k), -np.inf)
+        scanned = centroid_sims.size
+        for i in range(n):
+            candidates = _candidate_positions(scope, centroid_sims[i], self.centroid_candidates)
+            # Les réponses hors candidates gardent un score -inf
+            sims = np.full((1, len(scope["rows"])), -np.inf)
+            sims[0, candidates] = _similarities(queries[i:i + 1], scope[name][candidates])[0]
+            local, local_values = _answer_top_k(scope, sims, k, how)
+            positions[i, :local.shape[1]] = local[0]
+            values[i, :local.shape[1]] = local_values[0]
+            scanned += len(candidates)
+        return positions, values, scanned
+
+    def _search(self, scope_top, queries, routes, k, by_answer=False):
+        """
+        Regroupe les requêtes par route et fusionne les k meilleurs résultats de chaque
+        partition (une seule ligne par réponse si by_answer : une réponse peut couvrir
+        plusieurs catégories)
+        """
+        queries = normalize(queries)
+        n = queries.shape[0]
+        top_idx = np.full((n, k), -1, dtype=np.int64)
+        top_sim = np.full((n, k), -np.inf)
+        groups = {}
+        for i, route in enumerate(routes):
+            groups.setdefault(route, []).append(i)
+        scanned = 0
+        for route, members in groups.items():
+            members = np.array(members)
+            scopes = self._scopes(route)
+            found_idx, found_sim, found_answers = [], [], []
+            for scope in scopes:
+                local, local_sim, count = scope_top(scope, queries[members], k)
+                scanned += count
+                found_idx.append(np.where(local >= 0, scope["rows"][np.maximum(local, 0)], -1))
+                found_sim.append(local_sim)
+                found_answers.append(scope["answers"][np.maximum(local, 0)])
+            found_idx, found_sim = np.hstack(found_idx), np.hstack(found_sim)
+            # Tri stable : à égalité, la première partition l'emporte
+            order = np.argsort(-found_sim, axis=1, kind='stable')
+            if by_answer and len(scopes) > 1:
+                found_answers = np.take_along_axis(np.hstack(found_answers), order, axis=1)
+                order = np.array([np.concatenate([row[np.sort(np.unique(answers, return_index=True)[1])],
+                                                  np.full(k, -1)])[:k]
+                                  for row, answers in zip(order, found_answers)])
+                found_idx = np.hstack([found_idx, np.full((len(members), 1), -1)])
+                found_sim = np.hstack([found_sim, np.full((len(members), 1), -np.inf)])
+            order = order[:, :k]
+            width = order.shape[1]
+            top_idx[members, :width] = np.take_along_axis(found_idx, order, axis=1)
+            top_sim[members, :width] = np.take_along_axis(found_sim, order, axis=1)
+        with self._lock:
+            global_count = len(groups.get(None, ()))
+            self.global_queries += global_count
+            self.routed_queries += n - global_count
+            self.rows_scanned += scanned
+        return top_idx, top_sim
+
+    def top_matches(self, name, queries, routes, k=5):
+        """
+        k meilleures lignes (similarité cosinus) pour chaque requête, en une passe par partition
+
+        Args:
+            name (str): Matrice interrogée ('tfidf', 'word2vec' ou 'fasttext')
+            queries: Matrice des requêtes (une ligne par requête)
+            routes (list): Résultat de route() pour chaque requête
+            k (int): Nombre de lignes par requête
+
+        Returns:
+            tuple: (indices globaux, similarités), deux tableaux (requêtes x k) triés par
+            similarité décroissante ; -1 (similarité -inf) pour les places non remplies
+        """
+        return self._search(lambda scope, members, k: self._scope_top(scope, name, members, k), queries, routes, k)
+
+    def best_matches(self, name, queries, routes):
+        """
+        Meilleure ligne (similarité cosinus) pour chaque requête
+
+        Returns:
+            tuple: (indices globaux, similarités)
+        """
+        top_idx, top_sim = self.top_matches(name, queries, routes, k=1)
+        return top_idx[:, 0], top_sim[:, 0]
+
+    def best_match(self, name, query, route):
+        idx, sim = self.best_matches(name, query, [route])
+        return idx[0], sim[0]
+
+    def top_answers(self, name, queries, routes, k=5, how='max'):
+        """
+        Classement au niveau des réponses : les similarités des paraphrases d'une
+        même réponse sont agrégées (max ou moyenne), une seule ligne par réponse
+
+        Args:
+            name (str): Matrice interrogée
+            queries: Matrice des requêtes (une ligne par requête)
+            routes (list): Résultat de route() pour chaque requête
+            k (int): Nombre de réponses par requête
+            how (str): 'max' ou 'mean'
+
+        Returns:
+            tuple: (meilleure paraphrase de chaque réponse, scores), deux tableaux
+            (requêtes x k) triés par score décroissant, comme top_matches ; avec
+            l'agrégation max, la première colonne est celle de top_matches
+        """
+        return self._search(lambda scope, members, k: self._scope_answers(scope, name, members, k, how),
+                            queries, routes, k, by_answer=True)
+
+    def stats(self):
+        with self._lock:
+            total = self.routed_queries + self.global_queries
+            global_scope = self.global_scope
+            return {
+                "partitions": len(self.partitions),
+                "largest_partition": max((len(p["rows"]) for p in self.partitions.values()), default=0),
+                "questions": len(global_scope["rows"]) if global_scope else 0,
+                "answers": len(global_scope["answer_ids"]) if global_scope else 0,
+                "centroid_first_pass": self.centroid_first_pass,
+                "routed_queries": self.routed_queries,
+                "global_queries": self.global_queries,
+                "routed_ratio": self.routed_queries / total if total else 0.0,
+                "avg_rows_scanned": self.rows_scanned / total if total else 0.0
+            }
+
+
+partitioned_index = PartitionedIndex(partition_min_confidence, partition_max_categories,
+                                     answer_centroid_first_pass, answer_centroid_candidates)
+# Sans magasin, chaque question est sa propre réponse
+answer_ids = np.asarray(kb.answer_ids[:len(categories)]) if kb is not None else np.arange(len(categories))
+partitioned_index.add(categories, np.arange(len(categories)), answer_ids, {
+    "tfidf": tfidf_matrix,
+    "word2vec": w2v_question_vectors,
+    "fasttext": fasttext_question_vectors
+})
+
+
+def merge_by_answer(pools):
+    """
+    Fusionne des listes de meilleures lignes et les déduplique par réponse
+
+    Args:
+        pools (dict): méthode -> (indices, similarités), une ligne de top_matches
+
+    Returns:
+        list: Tuples (ligne, similarité, méthode), une seule par réponse (sa meilleure
+        paraphrase, toutes méthodes confondues), triés par similarité décroissante
+    """
+    best = {}
+    for method, (rows, sims) in pools.items():
+        for row, sim in zip(np.asarray(rows).tolist(), np.asarray(sims).tolist()):
+            if row < 0:
+                continue
+            answer = int(kb.answer_ids[row]) if kb is not None else row
+            if answer not in best or sim > best[answer][1]:
+                best[answer] = (row, sim, method)
+    return sorted(best.values(), key=lambda item: item[1], reverse=True)
+
+
+def index_new_rows(start, stop):
+    processed = preprocess_rows(start, stop)
+    tokens = [p.split() for p in processed]
+    partitioned_index.add([kb.categories[i] for i in range(start, stop)], np.arange(start, stop),
+                          np.asarray(kb.answer_ids[start:stop]), {
+        "tfidf": vectorizer.transform(processed),
+        "word2vec": np.array([document_vector(t, word2vec_model) for t in tokens]),
+        "fasttext": np.array([document_vector(t, fasttext_model) for t in tokens])
+    })
+
+
+if kb is not None:
+    kb.add_listener(index_new_rows)
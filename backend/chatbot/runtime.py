@@ -0,0 +1,130 @@
+"""
+Module de configuration des threads d'exécution
+
+Détermine les cœurs réellement disponibles pour le processus (affinité CPU et
+quota cgroup v2 cpu.max ou v1 cpu.cfs_quota_us) puis les partage entre les
+server_workers processus du serveur (gunicorn -w, WEB_CONCURRENCY) :
+- threads BLAS/OpenMP par processus : variables d'environnement posées à
+  l'import (avant le chargement des bibliothèques, sauf si déjà définies) puis
+  limites threadpoolctl appliquées aux bibliothèques déjà chargées (apply) ;
+- workers d'entraînement gensim (Word2Vec, FastText) ;
+- taille des pools de requêtes : cascades simultanées, places d'inférence du
+  contrôle d'admission (un lot complet par cascade quand le micro-batching est
+  actif), threads d'évaluation, threads du serveur waitress.
+Sans réglage, chaque processus a ses cœurs / server_workers cœurs et un seul
+thread BLAS : les produits d'une requête sont petits, le parallélisme vient des
+requêtes simultanées plutôt que de BLAS (voir benchmarks/bench_threads.py).
+"""
+import math
+import os
+from threadpoolctl import threadpool_info, threadpool_limits
+from chatbot.config import (server_workers, blas_threads, training_workers, request_threads, server_threads,
+                            batch_max_size)
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS',
+                   'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+# Threads du serveur par place d'inférence (les autres attendent le disque, SQLite ou le
+# réseau), sans descendre sous le défaut de waitress
+SERVER_THREADS_PER_SLOT = 2
+MIN_SERVER_THREADS = 4
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root=CGROUP_ROOT):
+    """
+    Quota CPU du cgroup du processus, en cœurs (None sans limite)
+
+    cgroup v2 : cpu.max ("quota période" ou "max période") du cgroup du processus
+    ou de la racine ; cgroup v1 : cpu.cfs_quota_us / cpu.cfs_period_us (-1 : aucun quota).
+    """
+    v2_path = ''
+    for line in (_read('/proc/self/cgroup') or '').splitlines():
+        if line.startswith('0::'):
+            v2_path = line[3:].lstrip('/')
+    for directory in dict.fromkeys([os.path.join(root, v2_path), root]):
+        content = _read(os.path.join(directory, 'cpu.max'))
+        if content:
+            quota, _, period = content.partition(' ')
+            if quota == 'max':
+                return None
+            return int(quota) / int(period or 100000)
+    quota = _read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(root, 'cpu', 'cpu.cfs_period_us'))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cores():
+    """Cœurs utilisables : affinité CPU, bornée par le quota cgroup (arrondi inférieur, au moins 1)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # pas d'affinité hors Linux
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, max(1, math.floor(limit)))
+    return cores
+
+
+class RuntimeConfig:
+    def __init__(self, cores=None, server_workers=1, blas_threads=0, training_workers=0, request_threads=0,
+                 server_threads=0, batch_size=1):
+        """
+        Args:
+            cores (int): Cœurs disponibles (détectés si None)
+            server_workers (int): Processus serveur sur la machine
+            blas_threads (int): Threads BLAS/OpenMP par processus (0 : 1)
+            training_workers (int): Workers gensim (0 : cœurs disponibles, entraînement hors requêtes)
+            request_threads (int): Cascades simultanées par processus (0 : cœurs du processus)
+            server_threads (int): Threads du serveur waitress (0 : SERVER_THREADS_PER_SLOT par place d'inférence,
+                au moins 4)
+            batch_size (int): Taille maximale d'un lot d'inférence (1 : micro-batching désactivé)
+        """
+        self.cores = cores or available_cores()
+        self.server_workers = max(1, server_workers)
+        self.cores_per_worker = max(1, self.cores // self.server_workers)
+        self.blas_threads = blas_threads or 1
+        self.training_workers = training_workers or self.cores
+        self.request_threads = request_threads or self.cores_per_worker
+        # Requêtes d'inférence simultanées : une par cascade, ou de quoi remplir un lot par
+        # cascade quand les requêtes sont regroupées (sinon les lots ne dépassent pas request_threads)
+        self.inference_slots = self.request_threads * max(1, batch_size)
+        self.server_threads = server_threads or max(MIN_SERVER_THREADS, SERVER_THREADS_PER_SLOT * self.inference_slots)
+
+    def set_environment(self):
+        """Limites BLAS/OpenMP des bibliothèques chargées ensuite (variables déjà définies conservées)."""
+        for name in THREAD_ENV_VARS:
+            os.environ.setdefault(name, str(self.blas_threads))
+
+    def apply(self):
+        """Limite les bibliothèques déjà chargées (numpy, scipy, scikit-learn) à blas_threads threads."""
+        threadpool_limits(limits=self.blas_threads)
+
+    def stats(self):
+        return {
+            "cores": self.cores,
+            "cgroup_limit": cgroup_cpu_limit(),
+            "server_workers": self.server_workers,
+            "cores_per_worker": self.cores_per_worker,
+            "blas_threads": self.blas_threads,
+            "training_workers": self.training_workers,
+            "request_threads": self.request_threads,
+            "inference_slots": self.inference_slots,
+            "server_threads": self.server_threads,
+            "threadpools": [{"library": info["internal_api"], "num_threads": info["num_threads"]}
+                            for info in threadpool_info()]
+        }
+
+
+runtime = RuntimeConfig(None, server_workers, blas_threads, training_workers, request_threads, server_threads,
+                        batch_max_size)
+runtime.set_environment()
@@ -8,58 +8,39 @@ import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.naive_bayes import MultinomialNB
-from chatbot.data_processing import preprocess_text, vectorizer, load_data, word2vec_model, fasttext_model
+from chatbot.data_processing import preprocess_text, vectorizer, load_data, get_knowledge_base, word2vec_model, fasttext_model
 from chatbot.models import nb_classifier, knn_classifier
 from chatbot.embeddings_utils import get_document_vector_w2v, get_document_vector_fasttext
+from chatbot.candidate_queue import candidate_queue, predict_categories
+from chatbot.generation import bump_generation
+from chatbot.maintenance import maintenance, new_questions_log, ratings_log
+from chatbot.kb_store import DATA_PATH
 
 
 def integrate_candidates(candidates):
     """
-    Intègre les candidates dans data_option1.csv et nettoie new_questions.csv et ratings.csv.
+    Intègre les candidates dans la base servie (DATA_PATH) et nettoie new_questions.csv et ratings.csv.
     """
     try:
-        # Vérifier l'existence de data_option1.csv
-        data_path = 'data/data_option1.csv'
+        # Vérifier l'existence de la base servie
+        data_path = DATA_PATH
         if not os.path.exists(data_path):
-            raise FileNotFoundError("data_option1.csv introuvable")
+            raise FileNotFoundError(f"{data_path} introuvable")
 
-        # Charger data_option1.csv
-        data_option1 = pd.read_csv(data_path, encoding='utf-8')
+        # Filtrer uniquement les colonnes nécessaires
+        candidates = candidates[['category', 'question', 'answer', 'url']]
 
-        # Générer de nouveaux IDs
-        max_id = int(data_option1['id'].max()) if not data_option1.empty and not pd.isna(
-            data_option1['id']).all() else 0
-        candidates = candidates.copy()  # Créer une copie pour éviter de modifier l'original
-        candidates['id'] = range(max_id + 1, max_id + 1 + len(candidates))
+        # Ajouter les candidates au CSV et au magasin servi, sous le verrou d'écriture
+        # de la base partagé avec l'import en masse : identifiants attribués à la suite
+        # de la base, tout est annulé en cas d'erreur, les index abonnés sont notifiés
+        get_knowledge_base().append(candidates, data_path)
 
-        # S'assurer que les colonnes sont alignées
-        required_columns = ['id', 'category', 'question', 'answer', 'url']
+        # Nettoyer new_questions.csv et ratings.csv (verrouillés contre les ajouts)
+        new_questions_log.remove_questions(candidates['question'])
+        ratings_log.remove_questions(candidates['question'])
 
-        # Filtrer uniquement les colonnes nécessaires
-        candidates = candidates[required_columns]
-
-        # Ajouter les candidates à data_option1
-        updated_data = pd.concat([data_option1, candidates], ignore_index=True)
-
-        # Sauvegarder data_option1.csv
-        updated_data.to_csv(data_path, index=False, encoding='utf-8')
-
-        # Nettoyer new_questions.csv
-        new_questions_path = 'data/new_questions.csv'
-        if os.path.exists(new_questions_path):
-            new_questions = pd.read_csv(new_questions_path, encoding='utf-8')
-            new_questions = new_questions[~new_questions['question'].isin(
-                candidates['question'])]
-            new_questions.to_csv(new_questions_path,
-                                 index=False, encoding='utf-8')
-
-        # Nettoyer ratings.csv
-        ratings_path = 'data/ratings.csv'
-        if os.path.exists(ratings_path):
-            ratings = pd.read_csv(ratings_path, encoding='utf-8')
-            ratings = ratings[~ratings['question'].isin(
-                candidates['question'])]
-            ratings.to_csv(ratings_path, index=False, encoding='utf-8')
+        # Retirer les questions intégrées de la file des candidates
+        candidate_queue.remove(candidates['question'])
 
         print(f"{len(candidates)} candidates intégrées")
     except Exception as e:
@@ -169,40 +150,22 @@ def predict_category(question):
     Returns:
         tuple: (categorie prédite, probabilité/confiance)
     """
-    processed = preprocess_text(question)
-    question_tfidf = vectorizer.transform([processed])
-
-    # Utiliser Naive Bayes pour la prédiction avec probabilités
-    category = nb_classifier.predict(question_tfidf)[0]
-    proba = nb_classifier.predict_proba(question_tfidf).max()
-
-    # Si la probabilité est faible, essayer KNN
-    if proba < 0.6:
-        question_dense = question_tfidf.toarray()
-        distances, indices = knn_classifier.kneighbors(
-            question_dense, n_neighbors=1)
-        knn_category = knn_classifier.predict(question_dense)[0]
-        knn_confidence = 1.0 - distances[0][0]
-
-        # Utiliser la catégorie KNN si la confiance est meilleure
-        if knn_confidence > proba:
-            category = knn_category
-            proba = knn_confidence
-
-    return category, proba
+    # Naive Bayes, puis KNN si la probabilité est faible (voir predict_categories)
+    categories, confidences = predict_categories([preprocess_text(question)])
+    return categories[0], confidences[0]
 
 
 def update_models(categories=None):
     """
-    Met à jour le modèle de classification des catégories avec les données de data_option1.csv.
+    Met à jour le modèle de classification des catégories avec les données de la base servie (DATA_PATH).
     """
     try:
-        # Charger data_option1.csv
-        data_path = 'data/data_option1.csv'
+        # Charger la base servie
+        data_path = DATA_PATH
         if not os.path.exists(data_path):
-            raise FileNotFoundError("data_option1.csv introuvable")
+            raise FileNotFoundError(f"{data_path} introuvable")
 
-        data = pd.read_csv(data_path, encoding='utf-8')
+        data = pd.read_csv(data_path, encoding='utf-8', usecols=lambda column: column in ('question', 'category'))
 
         # Vérifier les colonnes nécessaires
         if not all(col in data.columns for col in ['question', 'category']):
@@ -228,8 +191,9 @@ def update_models(categories=None):
 
         # Journaliser
         unique_categories = data['category'].unique().tolist()
+        generation = bump_generation(rows=len(data), categories=len(unique_categories))
         print(
-            f"Modèle mis à jour avec {len(unique_categories)} catégories: {unique_categories}")
+            f"Modèle mis à jour avec {len(unique_categories)} catégories: {unique_categories} (génération {generation})")
         if categories:
             print(f"Catégories fournies: {set(categories)}")
 
@@ -238,46 +202,6 @@ def update_models(categories=None):
         raise
 
 
-def integrate_questions(validated_data):
-    """
-    Intègre les questions validées dans data_option1.csv
-
-    Args:
-        validated_data (DataFrame): DataFrame contenant les questions validées
-
-    Returns:
-        bool: True si l'intégration a réussi, False sinon
-    """
-    try:
-        # Vérifier que le DataFrame contient toutes les colonnes nécessaires
-        required_columns = ['question', 'answer', 'category', 'url']
-        for col in required_columns:
-            if col not in validated_data.columns:
-                print(f"Colonne manquante: {col}")
-                return False
-
-        # Charger le fichier data_option1.csv existant
-        data_file = 'data/data_option1.csv'
-        if os.path.exists(data_file):
-            existing_data = pd.read_csv(data_file, encoding='utf-8')
-            # Concaténer avec les nouvelles données
-            updated_data = pd.concat(
-                [existing_data, validated_data], ignore_index=True)
-        else:
-            updated_data = validated_data
-
-        # Enregistrer le fichier mis à jour
-        updated_data.to_csv(data_file, index=False, encoding='utf-8')
-
-        # Mettre à jour les modèles
-        update_models(validated_data)
-
-        return True
-    except Exception as e:
-        print(f"Erreur lors de l'intégration des questions: {e}")
-        return False
-
-
 def get_learning_status():
     """
     Obtient le statut actuel du système d'auto-apprentissage
@@ -286,24 +210,21 @@ def get_learning_status():
         dict: Dictionnaire contenant les informations sur le statut
     """
     try:
-        # Nombre de questions bien notées disponibles
-        num_well_rated = 0
+        # Nombre de questions bien notées disponibles (journal et lignes archivées)
+        num_well_rated = maintenance.archived('ratings').get('positive', 0)
         if os.path.exists('data/ratings.csv'):
-            ratings = pd.read_csv('data/ratings.csv', encoding='utf-8')
-            num_well_rated = len(ratings[ratings['rating'] == True])
+            ratings = pd.read_csv('data/ratings.csv', encoding='utf-8', usecols=['rating'])
+            num_well_rated += len(ratings[ratings['rating'] == True])
 
-        # Nombre total de questions dans la base
-        num_total_questions = 0
-        if os.path.exists('data/data_option1.csv'):
-            data = pd.read_csv('data/data_option1.csv', encoding='utf-8')
-            num_total_questions = len(data)
+        # Nombre total de questions dans la base (magasin servi, sans relire le CSV)
+        num_total_questions = len(get_knowledge_base())
 
         # Statistiques sur les nouvelles questions
-        num_new_questions = 0
+        num_new_questions = maintenance.archived('new_questions').get('rows', 0)
         if os.path.exists('data/new_questions.csv'):
             new_questions = pd.read_csv(
-                'data/new_questions.csv', encoding='utf-8')
-            num_new_questions = len(new_questions)
+                'data/new_questions.csv', encoding='utf-8', usecols=['question'])
+            num_new_questions += len(new_questions)
 
         return {
             "well_rated_available": num_well_rated,
@@ -0,0 +1,193 @@
+"""
+Module d'export des embeddings pour le service
+
+Le service ne lit que model.wv ; les modèles gensim complets embarquent en plus
+l'état d'entraînement et, pour FastText, une matrice de 2 millions de buckets de
+n-grammes dont seuls ceux des mots du vocabulaire ont été entraînés. L'export
+garde les vecteurs du vocabulaire et les buckets utiles, en float32 ou en int8
+(échelle par ligne), dans des .npy ouverts en mmap lecture seule.
+
+Usage (depuis backend/) :
+    python -m chatbot.serving_vectors [--quantize int8]
+"""
+import argparse
+import json
+import os
+import numpy as np
+from gensim.models.fasttext import ft_ngram_hashes
+
+SERVING_DIR = 'models/serving'
+EXPORT_VERSION = 1
+QUANTIZE_MODES = ('float32', 'int8')
+
+
+def _save_array(path, array):
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _quantize(matrix):
+    """Quantification symétrique int8 par ligne : matrix ≈ codes * scales[:, None]."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _write_matrix(path, matrix, quantize):
+    if quantize == 'int8':
+        codes, scales = _quantize(matrix)
+        _save_array(path + '.npy', codes)
+        _save_array(path + '.scales.npy', scales)
+    else:
+        _save_array(path + '.npy', np.asarray(matrix, dtype=np.float32))
+
+
+def _source_signature(model_path):
+    stat = os.stat(model_path)
+    return {"source": os.path.abspath(model_path), "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def export_dir(name, quantize, serving_dir=SERVING_DIR):
+    return os.path.join(serving_dir, f"{name}-{quantize}")
+
+
+def export_vectors(model, model_path, name, quantize='float32', serving_dir=SERVING_DIR):
+    """
+    Exporte model.wv au format de service
+
+    Args:
+        model: Modèle gensim Word2Vec ou FastText
+        model_path (str): Fichier du modèle complet (signature enregistrée dans le manifeste)
+        name (str): 'word2vec' ou 'fasttext'
+        quantize (str): 'float32' ou 'int8'
+        serving_dir (str): Répertoire des exports
+
+    Returns:
+        str: Répertoire de l'export
+    """
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Quantification inconnue: {quantize}")
+    wv = model.wv
+    out_dir = export_dir(name, quantize, serving_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'words.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(wv.index_to_key), f, ensure_ascii=False)
+    _write_matrix(os.path.join(out_dir, 'vectors'), wv.vectors, quantize)
+
+    manifest = {"version": EXPORT_VERSION, "quantize": quantize, "vector_size": int(wv.vector_size),
+                "bucket": int(getattr(wv, 'bucket', 0)), **_source_signature(model_path)}
+    if manifest["bucket"]:
+        # Seuls les buckets atteints par les n-grammes du vocabulaire ont été entraînés
+        buckets = np.unique(np.concatenate([
+            np.asarray(ft_ngram_hashes(word, wv.min_n, wv.max_n, wv.bucket), dtype=np.int64)
+            for word in wv.index_to_key]))
+        _save_array(os.path.join(out_dir, 'ngram_buckets.npy'), buckets)
+        _write_matrix(os.path.join(out_dir, 'ngrams'), wv.vectors_ngrams[buckets], quantize)
+        manifest.update({"min_n": int(wv.min_n), "max_n": int(wv.max_n), "ngram_rows": int(len(buckets))})
+
+    # Le manifeste est écrit en dernier : un export interrompu est considéré absent
+    tmp_path = os.path.join(out_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(out_dir, 'manifest.json'))
+    return out_dir
+
+
+class SlimVectors:
+    """
+    Vecteurs de mots en lecture seule, avec la même interface que model.wv pour
+    get_document_vector_* (word in wv, wv[word]) ; les mots hors vocabulaire
+    FastText sont reconstruits à partir des buckets de n-grammes conservés.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, 'words.json'), encoding='utf-8') as f:
+            self.index_to_key = json.load(f)
+        self.key_to_index = {word: i for i, word in enumerate(self.index_to_key)}
+        self.vector_size = self.manifest["vector_size"]
+        self.bucket = self.manifest["bucket"]
+        self.quantize = self.manifest["quantize"]
+        self.vectors, self.scales = self._load_matrix(os.path.join(path, 'vectors'))
+        if self.bucket:
+            self.min_n, self.max_n = self.manifest["min_n"], self.manifest["max_n"]
+            self.ngram_buckets = np.load(os.path.join(path, 'ngram_buckets.npy'), mmap_mode='r')
+            self.ngrams, self.ngram_scales = self._load_matrix(os.path.join(path, 'ngrams'))
+
+    def _load_matrix(self, path):
+        matrix = np.load(path + '.npy', mmap_mode='r')
+        scales = np.load(path + '.scales.npy', mmap_mode='r') if self.quantize == 'int8' else None
+        return matrix, scales
+
+    @staticmethod
+    def _rows(matrix, scales, rows):
+        values = np.asarray(matrix[rows], dtype=np.float32)
+        return values if scales is None else values * np.asarray(scales[rows])[:, None]
+
+    def __len__(self):
+        return len(self.index_to_key)
+
+    def __contains__(self, word):
+        # Comme gensim : avec des n-grammes, tout mot a un vecteur
+        return bool(self.bucket) or word in self.key_to_index
+
+    def __getitem__(self, word):
+        index = self.key_to_index.get(word)
+        if index is not None:
+            return self._rows(self.vectors, self.scales, [index])[0]
+        if not self.bucket:
+            raise KeyError(word)
+        hashes = np.asarray(ft_ngram_hashes(word, self.min_n, self.max_n, self.bucket), dtype=np.int64)
+        if len(hashes) == 0:
+            return np.zeros(self.vector_size, dtype=np.float32)
+        # Les buckets non conservés n'ont jamais été entraînés : contribution nulle
+        positions = np.minimum(np.searchsorted(self.ngram_buckets, hashes), len(self.ngram_buckets) - 1)
+        kept = positions[np.asarray(self.ngram_buckets[positions]) == hashes]
+        total = self._rows(self.ngrams, self.ngram_scales, kept).sum(axis=0)
+        return total / len(hashes)
+
+
+class ServingModel:
+    """Remplace un modèle gensim complet là où seuls model.wv et model.vector_size sont lus."""
+
+    def __init__(self, wv):
+        self.wv = wv
+        self.vector_size = wv.vector_size
+
+
+def load_serving_model(name, model_path, quantize, serving_dir=SERVING_DIR):
+    """
+    Charge l'export de service s'il existe et correspond au modèle complet actuel
+
+    Returns:
+        ServingModel|None: None si l'export est absent ou périmé
+    """
+    path = export_dir(name, quantize, serving_dir)
+    try:
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        fresh = manifest.get("version") == EXPORT_VERSION and all(
+            manifest.get(key) == value for key, value in _source_signature(model_path).items())
+    except (OSError, ValueError):
+        return None
+    return ServingModel(SlimVectors(path)) if fresh else None
+
+
+def main():
+    from gensim.models import Word2Vec, FastText
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, default='float32')
+    parser.add_argument('--models-dir', default='models')
+    args = parser.parse_args()
+    for name, loader in [('word2vec', Word2Vec.load), ('fasttext', FastText.load)]:
+        model_path = os.path.join(args.models_dir, f'{name}.model')
+        out_dir = export_vectors(loader(model_path), model_path, name, args.quantize)
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        print(f"{name}: {out_dir} ({size / 1024 / 1024:.1f} Mio)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Module de regroupement des calculs identiques simultanés (single-flight)
+
+Quand plusieurs requêtes demandent la même clé en même temps, seule la première
+exécute le calcul ; les autres attendent et reçoivent le même résultat.
+"""
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Exécute fn(*args, **kwargs) une seule fois par clé pour les appels concurrents
+
+        Args:
+            key (hashable): Clé de regroupement
+            fn (callable): Calcul à partager
+
+        Returns:
+            Le résultat de fn, partagé entre tous les appelants en attente
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        start = time.perf_counter()
+        call.done.wait()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                "computations": self.leaders,
+                "coalesced": self.followers,
+                "coalescing_ratio": self.followers / total if total else 0.0,
+                "wait_avg_ms": 1000 * self.wait_total / self.followers if self.followers else 0.0,
+                "wait_max_ms": 1000 * self.wait_max,
+                "in_flight": len(self._calls)
+            }
@@ -0,0 +1,261 @@
+"""
+Module de correction orthographique (index de suppressions, façon SymSpell)
+
+Le vocabulaire est celui des questions de la base et des raccourcis de
+config.shortcuts. Pour chaque mot, toutes les variantes obtenues en supprimant
+jusqu'à max_edit_distance caractères (sur ses prefix_length premiers caractères)
+sont précalculées dans un dictionnaire variante -> mots. Corriger un mot revient
+à générer ses propres suppressions et à lire ce dictionnaire : le nombre de
+candidats ne dépend pas de la taille du vocabulaire.
+
+Un mot absent des questions n'est pas forcément une faute. Sont valides, donc
+laissés tels quels sans être proposés comme corrections : les mots outils
+(stopwords NLTK), les mots courants de COMMON_WORDS et du lexique facultatif
+config.spelling_lexicon, les mots des réponses de la base, et tout mot dont la
+racine est celle d'un de ces mots ou un terme du vocabulaire TF-IDF (autres
+flexions). Un mot corrigé garde la casse du mot d'origine.
+"""
+import re
+import threading
+from chatbot.config import shortcuts, spelling_max_edit_distance, spelling_lexicon
+from chatbot.data_processing import kb, questions, responses, stemmer_fr, stop_words_fr, vectorizer
+
+WORD_RE = re.compile(r'[^\W\d_]+')
+CACHE_SIZE = 10000
+
+# Mots courants des requêtes absents des questions de la base : verbes usuels
+# conjugués, mots de liaison et noms ou adjectifs fréquents (les autres flexions
+# sont couvertes par leur racine)
+COMMON_WORDS = """
+    veux veut voulons voulez veulent voulu voudrais voudrait voudrions voudriez voudraient vouloir
+    peux peut pouvons pouvez peuvent pu pourrais pourrait pourrions pourriez pourraient pouvoir
+    dois doit devons devez doivent dû devrais devrait devrions devriez devraient devoir
+    fais fait faisons faites font faire ferai fera feront
+    vais va allons allez vont aller irai ira iront allé
+    sais sait savons savez savent su saurais saurait savoir
+    viens vient venons venez viennent venu venir reviens revient revenir
+    prends prend prenons prenez prennent pris prendre
+    mets met mettons mettez mettent mis mettre
+    dis dit disons dites disent dire
+    vois voit voyons voyez voient vu voir
+    obtiens obtient obtenons obtenez obtiennent obtenu obtenir
+    reçois reçoit recevons recevez reçoivent reçu recevoir
+    envoie envoies envoyons envoyez envoient envoyé envoyer
+    paie paye paies payons payez paient payé payer
+    cherche cherches cherchons cherchez cherchent cherché chercher
+    trouve trouves trouvons trouvez trouvent trouvé trouver
+    aime aimes aimons aimez aiment aimerais aimerait aimer
+    souhaite souhaites souhaitons souhaitez souhaitent souhaiterais souhaiter
+    demande demandes demandons demandez demandent demandé demander
+    comprends comprend comprenons comprenez comprennent compris comprendre
+    perdu perdue perdre oublié oubliée oublier
+    faut fallait falloir
+    besoin aide aider aidez merci bonjour bonsoir salut svp stp oui non
+    comment pourquoi quand combien quel quelle quels quelles lequel laquelle
+    où ici là alors donc mais car puis ensuite encore déjà toujours jamais
+    aussi très trop peu beaucoup plus moins bien mal vite tard tôt
+    aujourd hui demain hier maintenant bientôt
+    avant après pendant depuis entre chez sans sous vers contre selon
+    tout tous toute toutes chaque autre autres même mêmes
+    rien personne quelqu quelque quelques chose choses
+    jour jours semaine semaines mois année années an ans heure heures minute minutes
+    matin soir midi lundi mardi mercredi jeudi vendredi samedi dimanche
+    premier première deuxième dernier dernière prochain prochaine
+    bon bonne mauvais mauvaise nouveau nouvelle grand grande petit petite
+    absent absente présent présente possible impossible urgent urgente
+    problème question réponse information informations
+""".split()
+
+
+def _deletes(word, max_distance, prefix_length):
+    """Variantes de word (tronqué à prefix_length) avec 1 à max_distance suppressions."""
+    word = word[:prefix_length]
+    results = set()
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - results
+        results |= frontier
+    return results
+
+
+def edit_distance(a, b, max_distance):
+    """Distance de Damerau-Levenshtein (transpositions adjacentes), ou max_distance + 1 au-delà."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def keep_case(original, corrected):
+    """corrected avec la casse de original (tout en majuscules ou initiale majuscule)."""
+    if original.isupper() and len(original) > 1:
+        return corrected.upper()
+    if original[0].isupper():
+        return corrected[0].upper() + corrected[1:]
+    return corrected
+
+
+class SpellCorrector:
+    def __init__(self, max_edit_distance=2, prefix_length=7, min_word_length=4):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.min_word_length = min_word_length
+        self.enabled = max_edit_distance > 0
+        self._words = {}  # mot -> fréquence
+        self._known = set()  # mots valides jamais corrigés, hors vocabulaire de correction
+        self._stems = set()  # racines valides (termes TF-IDF, mots valides)
+        self._deletes = {}  # variante -> mots
+        self._cache = {}  # mot inconnu -> correction (ou lui-même)
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.corrected_queries = 0
+        self.corrected_words = 0
+
+    def add_text(self, texts):
+        """Ajoute les mots des textes au vocabulaire."""
+        with self._lock:
+            for text in texts:
+                for word in WORD_RE.findall(str(text).lower()):
+                    if word in self._words:
+                        self._words[word] += 1
+                        continue
+                    self._words[word] = 1
+                    for variant in _deletes(word, self.max_edit_distance, self.prefix_length) | {word[:self.prefix_length]}:
+                        self._deletes.setdefault(variant, []).append(word)
+            # Un mot inconnu peut désormais avoir une meilleure correction
+            self._cache.clear()
+
+    def add_known(self, texts, with_stems=False):
+        """
+        Ajoute les mots des textes aux mots valides (laissés tels quels, jamais proposés)
+
+        Args:
+            with_stems (bool): Ajoute aussi leurs racines (leurs autres flexions deviennent valides)
+        """
+        with self._lock:
+            for text in texts:
+                words = WORD_RE.findall(str(text).lower())
+                self._known.update(words)
+                if with_stems:
+                    self._stems.update(stemmer_fr.stem(word) for word in words)
+            self._cache.clear()
+
+    def add_stems(self, stems):
+        """Ajoute des racines valides : un mot dont la racine en fait partie n'est pas corrigé."""
+        with self._lock:
+            self._stems.update(stems)
+            self._cache.clear()
+
+    def is_valid(self, word):
+        """Mot du vocabulaire, mot valide connu ou flexion d'un terme TF-IDF."""
+        return word in self._words or word in self._known or stemmer_fr.stem(word) in self._stems
+
+    def _max_distance(self, word):
+        return 1 if len(word) <= 5 else self.max_edit_distance
+
+    def correct_word(self, word):
+        """
+        Mot du vocabulaire le plus proche (distance minimale puis fréquence maximale),
+        sinon word ; un mot valide (is_valid) est toujours gardé.
+        """
+        if word in self._words or len(word) < self.min_word_length:
+            return word
+        cached = self._cache.get(word)
+        if cached is not None:
+            return cached
+        best = word if self.is_valid(word) else self._closest(word)
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[word] = best
+        return best
+
+    def _closest(self, word):
+        max_distance = self._max_distance(word)
+        candidates = set()
+        for variant in _deletes(word, max_distance, self.prefix_length) | {word[:self.prefix_length]}:
+            candidates.update(self._deletes.get(variant, ()))
+        best, best_key = word, None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self._words[candidate])
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def correct(self, text):
+        """
+        Corrige les mots inconnus d'une requête, le reste du texte est conservé
+
+        Returns:
+            str: Requête corrigée (identique si rien n'a été corrigé)
+        """
+        if not self.enabled or text.startswith('/'):
+            return text
+        corrections = 0
+
+        def replace(match):
+            nonlocal corrections
+            word = match.group(0)
+            corrected = self.correct_word(word.lower())
+            if corrected == word.lower():
+                return word
+            corrections += 1
+            return keep_case(word, corrected)
+
+        corrected_text = WORD_RE.sub(replace, text)
+        with self._lock:
+            self.queries += 1
+            self.corrected_queries += corrections > 0
+            self.corrected_words += corrections
+        return corrected_text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "vocabulary": len(self._words),
+                "known_words": len(self._known),
+                "known_stems": len(self._stems),
+                "deletes": len(self._deletes),
+                "queries": self.queries,
+                "corrected_queries": self.corrected_queries,
+                "corrected_words": self.corrected_words
+            }
+
+
+spell_corrector = SpellCorrector(spelling_max_edit_distance)
+spell_corrector.add_text(questions)
+spell_corrector.add_text([command.lstrip('/').replace('_', ' ') for command in shortcuts])
+spell_corrector.add_text(shortcuts.values())
+spell_corrector.add_known(responses)
+spell_corrector.add_known(stop_words_fr, with_stems=True)
+spell_corrector.add_known(COMMON_WORDS, with_stems=True)
+if spelling_lexicon:
+    try:
+        with open(spelling_lexicon, encoding='utf-8') as f:
+            spell_corrector.add_known(f, with_stems=True)
+    except OSError as e:
+        print(f"Lexique orthographique {spelling_lexicon} illisible : {e}")
+spell_corrector.add_stems(term for term in vectorizer.vocabulary_ if ' ' not in term)
+
+
+def index_new_questions(start, stop):
+    spell_corrector.add_text(kb.questions[i] for i in range(start, stop))
+    spell_corrector.add_known(kb.responses[i] for i in range(start, stop))
+
+
+if kb is not None:
+    kb.add_listener(index_new_questions)
@@ -50,6 +50,7 @@ function App() {
     return localStorage.getItem("themeMode") || "light";
   });
   const [sessions, setSessions] = useState([]);
+  const [sessionsCursor, setSessionsCursor] = useState(null);
 
   // Sauvegarder le mode dans localStorage à chaque changement
   useEffect(() => {
@@ -60,13 +61,26 @@ function App() {
     fetchChatSessions();
   }, []);
 
+  // Liste paginée des sessions (résumés uniquement, messages chargés à la demande)
   const fetchChatSessions = () => {
     axios
-      .get(`${process.env.REACT_APP_API_URL}/get_sessions`)
+      .get(`${process.env.REACT_APP_API_URL}/sessions`, { params: { limit: 30 } })
       .then((response) => {
-        setSessions(
-          response.data.sort((a, b) => new Date(b.date) - new Date(a.date))
-        );
+        setSessions(response.data.sessions);
+        setSessionsCursor(response.data.next_cursor);
+      })
+      .catch((error) => console.error("Error fetching sessions:", error));
+  };
+
+  const fetchMoreSessions = () => {
+    if (sessionsCursor === null) return;
+    axios
+      .get(`${process.env.REACT_APP_API_URL}/sessions`, {
+        params: { limit: 30, cursor: sessionsCursor },
+      })
+      .then((response) => {
+        setSessions((prevSessions) => [...prevSessions, ...response.data.sessions]);
+        setSessionsCursor(response.data.next_cursor);
       })
       .catch((error) => console.error("Error fetching sessions:", error));
   };
@@ -411,6 +425,8 @@ function App() {
               sessions={sessions}
               setSessions={setSessions}
               fetchChatSessions={fetchChatSessions}
+              hasMoreSessions={sessionsCursor !== null}
+              fetchMoreSessions={fetchMoreSessions}
             />
             <div
               style={{
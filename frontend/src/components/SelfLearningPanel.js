@@ -25,7 +25,7 @@ import {
   Checkbox,
   FormControlLabel,
 } from "@mui/material";
-import { Check, School, Refresh } from "@mui/icons-material";
+import { Check, School, Refresh, TravelExplore } from "@mui/icons-material";
 
 const API_BASE_URL = process.env.REACT_APP_API_URL;
 
@@ -53,6 +53,9 @@ const SelfLearningPanel = () => {
   const [resultOpen, setResultOpen] = useState(false);
   const [integrationResult, setIntegrationResult] = useState(null);
   const [selectedCandidates, setSelectedCandidates] = useState({});
+  const [gaps, setGaps] = useState(null);
+  const [gapsOpen, setGapsOpen] = useState(false);
+  const [gapsLoading, setGapsLoading] = useState(false);
 
   useEffect(() => {
     fetchStatus();
@@ -92,6 +95,23 @@ const SelfLearningPanel = () => {
     }
   };
 
+  // Groupes de questions non résolues mal couverts par la base ; l'analyse des
+  // nouvelles questions tourne en arrière-plan (job) et le rapport suit
+  const fetchGaps = async () => {
+    setGapsLoading(true);
+    try {
+      const response = await axios.get(
+        `${API_BASE_URL}/api/self-learning/gaps`
+      );
+      setGaps(response.data);
+      setGapsOpen(true);
+    } catch (error) {
+      console.error("Error fetching knowledge-base gaps:", error);
+    } finally {
+      setGapsLoading(false);
+    }
+  };
+
   const handleCategoryChange = (index, newCategory) => {
     const updatedCandidates = [...candidates];
     updatedCandidates[index].category = newCategory;
@@ -250,6 +270,21 @@ const SelfLearningPanel = () => {
           Ce processus analyse les questions bien notées et propose leur
           intégration dans la base de connaissances du chatbot.
         </Typography>
+
+        <Button
+          variant="outlined"
+          color="primary"
+          startIcon={<TravelExplore />}
+          onClick={fetchGaps}
+          disabled={gapsLoading}
+          fullWidth
+        >
+          {gapsLoading ? (
+            <CircularProgress size={24} />
+          ) : (
+            "Sujets non couverts par la base"
+          )}
+        </Button>
       </CardContent>
 
       {/* Dialog pour afficher et valider les questions candidates */}
@@ -420,6 +455,98 @@ const SelfLearningPanel = () => {
         </DialogActions>
       </Dialog>
 
+      {/* Dialog des lacunes : plus grands groupes de questions mal couvertes */}
+      <Dialog
+        open={gapsOpen}
+        onClose={() => setGapsOpen(false)}
+        maxWidth="md"
+        fullWidth
+      >
+        <DialogTitle>Sujets non couverts par la base</DialogTitle>
+        <DialogContent>
+          {gaps?.job && gaps.job.status !== "done" && (
+            <Alert
+              severity={gaps.job.status === "error" ? "error" : "info"}
+              sx={{ mb: 2 }}
+            >
+              {gaps.job.status === "error"
+                ? `Erreur lors de l'analyse : ${gaps.job.error}`
+                : `Analyse des nouvelles questions en cours (${gaps.job.rows} traitées)...`}
+            </Alert>
+          )}
+          {!gaps?.report || gaps.report.gaps.length === 0 ? (
+            <DialogContentText>
+              {gaps?.report?.pending
+                ? `${gaps.report.pending} questions en attente : pas encore assez pour les regrouper.`
+                : "Aucun groupe de questions mal couvert pour le moment."}
+            </DialogContentText>
+          ) : (
+            <>
+              <DialogContentText sx={{ mb: 2 }}>
+                {gaps.report.questions} questions non résolues regroupées en{" "}
+                {gaps.report.clusters} sujets, dont{" "}
+                {gaps.report.uncovered_clusters} mal couverts par la base.
+              </DialogContentText>
+              <List sx={{ width: "100%" }}>
+                {gaps.report.gaps.map((gap) => (
+                  <Card key={gap.id} sx={{ mb: 2 }}>
+                    <CardContent>
+                      <Box
+                        sx={{
+                          display: "flex",
+                          justifyContent: "space-between",
+                          alignItems: "center",
+                          mb: 1,
+                        }}
+                      >
+                        <Typography variant="subtitle1" fontWeight="bold">
+                          {gap.size} questions ({Math.round(gap.share * 100)}%)
+                        </Typography>
+                        <Box>
+                          {gap.category && (
+                            <Chip
+                              label={gap.category}
+                              size="small"
+                              sx={{
+                                mr: 1,
+                                backgroundColor:
+                                  categoryColors[gap.category] || "#757575",
+                                color: "white",
+                              }}
+                            />
+                          )}
+                          <Chip
+                            label={`Couverture ${Math.round(
+                              gap.coverage * 100
+                            )}%`}
+                            color={gap.coverage < 0.5 ? "error" : "warning"}
+                            size="small"
+                          />
+                        </Box>
+                      </Box>
+                      <Divider sx={{ my: 1 }} />
+                      {gap.questions.map((question, index) => (
+                        <Typography key={index} variant="body2">
+                          • {question}
+                        </Typography>
+                      ))}
+                    </CardContent>
+                  </Card>
+                ))}
+              </List>
+            </>
+          )}
+        </DialogContent>
+        <DialogActions>
+          <Button onClick={fetchGaps} color="inherit" startIcon={<Refresh />}>
+            Actualiser
+          </Button>
+          <Button onClick={() => setGapsOpen(false)} color="primary">
+            Fermer
+          </Button>
+        </DialogActions>
+      </Dialog>
+
       {/* Dialog pour afficher le résultat de l'intégration */}
       <Dialog open={resultOpen} onClose={() => setResultOpen(false)}>
         <DialogTitle>Résultat de l'intégration</DialogTitle>
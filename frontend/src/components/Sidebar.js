@@ -54,7 +54,7 @@ export const shareChat = () => {
     });
 };
 
-function Sidebar({ open, toggleDrawer, sessions, setSessions }) {
+function Sidebar({ open, toggleDrawer, sessions, setSessions, hasMoreSessions, fetchMoreSessions }) {
   const navigate = useNavigate();
   const location = useLocation();
   const theme = useTheme();
@@ -96,6 +96,8 @@ function Sidebar({ open, toggleDrawer, sessions, setSessions }) {
         const newSession = {
           id: response.data.session_id,
           date: new Date().toISOString(),
+          first_message: null,
+          message_count: 0,
           messages: [],
         };
         setSessions([newSession, ...sessions]);
@@ -140,15 +142,15 @@ function Sidebar({ open, toggleDrawer, sessions, setSessions }) {
 
   // Extraction du premier message pour aperçu
   const getSessionPreview = (session) => {
-    if (session.messages && session.messages.length > 0) {
+    let firstMessage = session.first_message;
+    if (!firstMessage && session.messages && session.messages.length > 0) {
       const firstUserMessage = session.messages.find(msg => msg.user);
-      return firstUserMessage ? 
-        (firstUserMessage.user.length > 30 ? 
-          `${firstUserMessage.user.substring(0, 30)}...` : 
-          firstUserMessage.user) : 
-        "Nouvelle conversation";
+      firstMessage = firstUserMessage && firstUserMessage.user;
     }
-    return "Nouvelle conversation";
+    if (!firstMessage) {
+      return "Nouvelle conversation";
+    }
+    return firstMessage.length > 30 ? `${firstMessage.substring(0, 30)}...` : firstMessage;
   };
 
   const navigation = [
@@ -467,6 +469,13 @@ function Sidebar({ open, toggleDrawer, sessions, setSessions }) {
                     </Fade>
                   ))
                 )}
+                {open && hasMoreSessions && (
+                  <Box sx={{ textAlign: "center", py: 1 }}>
+                    <Button size="small" onClick={fetchMoreSessions}>
+                      Charger plus
+                    </Button>
+                  </Box>
+                )}
               </List>
             )}
           </Box>
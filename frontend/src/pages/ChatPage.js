@@ -39,9 +39,54 @@ import {
 import Slide from "@mui/material/Slide";
 import axios from "axios";
 
+// Lit /api/chat/stream (JSON lines) et renvoie l'événement final
+async function streamChat(payload, onPartial, signal) {
+  const res = await fetch(`${process.env.REACT_APP_API_URL}/api/chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+    signal,
+  });
+  if (res.status === 429 || res.status === 503) {
+    // Refus du contrôle d'admission : message du serveur, à réessayer plus tard
+    const body = await res.json().catch(() => ({}));
+    const error = new Error(body.message || `HTTP ${res.status}`);
+    error.status = res.status;
+    throw error;
+  }
+  if (!res.ok || !res.body) {
+    throw new Error(`HTTP ${res.status}`);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line);
+      if (event.event === "partial") {
+        onPartial(event.response);
+      } else if (event.event === "final") {
+        reader.cancel();
+        return event;
+      } else {
+        throw new Error(event.message || "Erreur de flux");
+      }
+    }
+  }
+  throw new Error("Flux interrompu avant la réponse finale");
+}
+
 function ChatPage({ sessions, setSessions }) {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
+  const [suggestions, setSuggestions] = useState([]);
+  const chosenSuggestionRef = useRef(null);
   const [voiceInput, setVoiceInput] = useState("");
   const [sessionId, setSessionId] = useState(
     new URLSearchParams(window.location.search).get("session_id")
@@ -53,6 +98,34 @@ function ChatPage({ sessions, setSessions }) {
   const [isLoading, setIsLoading] = useState(false);
   const chatBoxRef = useRef(null);
 
+  const streamControllerRef = useRef(null);
+
+  // Annule un éventuel flux en cours (démontage ou nouvel envoi)
+  useEffect(() => () => streamControllerRef.current?.abort(), []);
+
+  // Suggestions d'autocomplétion pendant la saisie (requête annulée à chaque frappe)
+  useEffect(() => {
+    const query = input.trim();
+    if (query.length < 2 || query.startsWith("/") || query === chosenSuggestionRef.current) {
+      setSuggestions([]);
+      return undefined;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      axios
+        .get(`${process.env.REACT_APP_API_URL}/api/autocomplete`, {
+          params: { q: query, limit: 5 },
+          signal: controller.signal,
+        })
+        .then((res) => setSuggestions(res.data.suggestions || []))
+        .catch(() => {});
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [input]);
+
   // Memoize handleSend for text input
   const handleSend = useCallback(async () => {
     if (!input.trim()) return;
@@ -60,30 +133,39 @@ function ChatPage({ sessions, setSessions }) {
     setMessages((prevMessages) => [...prevMessages, newMessage]);
     setIsLoading(true);
 
+    streamControllerRef.current?.abort();
+    const controller = new AbortController();
+    streamControllerRef.current = controller;
+
     try {
-      const response = await axios.post(
-        `${process.env.REACT_APP_API_URL}/api/chat`,
-        {
-          message: input,
-          session_id: sessionId,
-          source: "text",
-        }
+      // Réponses partielles (une par étape de la cascade) puis réponse finale
+      const final = await streamChat(
+        { message: input, session_id: sessionId, source: "text" },
+        (partial) =>
+          setMessages((prevMessages) => [
+            ...prevMessages.slice(0, -1),
+            { ...newMessage, bot: partial, partial: true },
+          ]),
+        controller.signal
       );
-      const updatedMessages = [...messages, response.data.chat_entry];
+      const updatedMessages = [...messages, final.chat_entry];
       setMessages(updatedMessages);
-      setSessionId(response.data.session_id);
+      setSessionId(final.session_id);
 
       setSessions((prevSessions) => {
         const updatedSessions = prevSessions.map((session) =>
-          session.id === response.data.session_id
+          session.id === final.session_id
             ? { ...session, messages: updatedMessages }
             : session
         );
         return updatedSessions;
       });
     } catch (error) {
+      if (error.name === "AbortError") return;
       console.error("Error sending message:", error);
-      setSnackbarMessage("Erreur lors de l'envoi du message");
+      setSnackbarMessage(
+        error.status ? error.message : "Erreur lors de l'envoi du message"
+      );
       setSnackbarOpen(true);
     } finally {
       setIsLoading(false);
@@ -131,7 +213,10 @@ function ChatPage({ sessions, setSessions }) {
       });
     } catch (error) {
       console.error("Error sending voice message:", error);
-      setSnackbarMessage("Erreur lors de l'envoi du message vocal");
+      setSnackbarMessage(
+        error.response?.data?.message ||
+          "Erreur lors de l'envoi du message vocal"
+      );
       setSnackbarOpen(true);
     } finally {
       setIsLoading(false);
@@ -291,23 +376,23 @@ function ChatPage({ sessions, setSessions }) {
   useEffect(() => {
     if (sessionId) {
       const session = sessions.find((s) => s.id === parseInt(sessionId));
-      if (session) {
+      if (session && session.messages) {
         setMessages(session.messages);
       } else {
+        // Les résumés de sessions ne contiennent pas les messages : chargement à la demande
         axios
-          .get(`${process.env.REACT_APP_API_URL}/get_sessions`)
+          .get(`${process.env.REACT_APP_API_URL}/sessions/${parseInt(sessionId)}/messages`)
           .then((response) => {
-            const session = response.data.find(
-              (s) => s.id === parseInt(sessionId)
+            const fetchedMessages = response.data.messages;
+            setMessages(fetchedMessages);
+            // Ne rien changer si la session n'est pas dans la page chargée (évite une boucle de rechargement)
+            setSessions((prevSessions) =>
+              prevSessions.some((s) => s.id === parseInt(sessionId))
+                ? prevSessions.map((s) =>
+                    s.id === parseInt(sessionId) ? { ...s, messages: fetchedMessages } : s
+                  )
+                : prevSessions
             );
-            if (session) {
-              setMessages(session.messages);
-              setSessions(
-                response.data.sort(
-                  (a, b) => new Date(b.date) - new Date(a.date)
-                )
-              );
-            }
           })
           .catch((error) => console.error("Error fetching session:", error));
       }
@@ -850,6 +935,37 @@ function ChatPage({ sessions, setSessions }) {
           </Box>
         )}
 
+      {/* Alternatives chips ("Vouliez-vous dire") */}
+      {messages.length > 0 &&
+        messages[messages.length - 1].bot?.alternatives?.length > 0 && (
+          <Box
+            sx={{
+              display: "flex",
+              flexWrap: "wrap",
+              alignItems: "center",
+              gap: 1,
+              px: 2,
+              pb: 2,
+            }}
+          >
+            <Typography variant="body2" color="text.secondary">
+              Vouliez-vous dire :
+            </Typography>
+            {messages[messages.length - 1].bot.alternatives.map(
+              (alternative, index) => (
+                <Chip
+                  key={index}
+                  label={alternative.question}
+                  onClick={() => sendShortcut(alternative.question)}
+                  size="medium"
+                  variant="outlined"
+                  sx={{ borderRadius: "16px", px: 1 }}
+                />
+              )
+            )}
+          </Box>
+        )}
+
       {/* Input Area */}
       <Box
         sx={{
@@ -859,6 +975,23 @@ function ChatPage({ sessions, setSessions }) {
           bgcolor: "background.paper",
         }}
       >
+        {suggestions.length > 0 && (
+          <Box sx={{ display: "flex", flexWrap: "wrap", gap: 1, mb: 1 }}>
+            {suggestions.map((suggestion) => (
+              <Chip
+                key={suggestion.question}
+                label={suggestion.question}
+                size="small"
+                variant="outlined"
+                onClick={() => {
+                  chosenSuggestionRef.current = suggestion.question;
+                  setInput(suggestion.question);
+                  setSuggestions([]);
+                }}
+              />
+            ))}
+          </Box>
+        )}
         <Box sx={{ display: "flex", alignItems: "center" }}>
           <IconButton size="medium" sx={{ color: "text.secondary" }}>
             <InsertEmoticon />
@@ -58,12 +58,17 @@ function EmbeddingsMetricsPage() {
   const { data, isLoading, error } = useQuery({
     queryKey: ["embeddingsMetrics"],
     queryFn: fetchEmbeddingsMetrics,
+    // Évaluation en arrière-plan (202) : interroger jusqu'à ce que le rapport soit prêt
+    refetchInterval: (query) =>
+      query.state.data?.status === "running" ? 2000 : false,
     onError: () => {
       toast.error("Erreur lors du chargement des métriques d'embeddings");
     },
   });
 
-  if (isLoading) {
+  const job = data?.status === "running" ? data.job : null;
+
+  if (isLoading || job) {
     return (
       <Container
         maxWidth="lg"
@@ -78,9 +83,15 @@ function EmbeddingsMetricsPage() {
         >
           <CircularProgress size={60} thickness={4} sx={{ mb: 3 }} />
           <Typography variant="h6" sx={{ fontWeight: 500 }}>
-            Chargement des métriques d'embeddings...
+            {job
+              ? `Évaluation en cours (${job.scored} / ${job.questions} questions)...`
+              : "Chargement des métriques d'embeddings..."}
           </Typography>
-          <LinearProgress sx={{ width: "50%", mt: 4, borderRadius: 1 }} />
+          <LinearProgress
+            variant={job ? "determinate" : "indeterminate"}
+            value={job ? job.progress * 100 : undefined}
+            sx={{ width: "50%", mt: 4, borderRadius: 1 }}
+          />
         </Box>
       </Container>
     );